@@ -0,0 +1,41 @@
+"""Count model calls saved by the analysis cache on a repetitive inbox.
+
+Usage: python -m benchmarks.bench_analysis_cache [email_count]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from gmail_mcp_agent.utils.analysis_cache import AnalysisCache
+from tests.fake_ollama import FakeOllamaServer
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+
+TEMPLATES = [
+    ("[CI] Build passed on main", "All checks have passed for the latest commit."),
+    ("Your weekly newsletter", "Here are this week's top stories from our team."),
+    ("Alert: disk usage above 90%", "The disk on host db-1 is above  90% usage."),
+    ("Can we schedule a call?", "Would you be free for a call sometime next week?"),
+]
+
+
+def run(count: int = 200) -> None:
+    emails = [TEMPLATES[i % len(TEMPLATES)] for i in range(count)]
+    with FakeOllamaServer(latency=0.01) as server, tempfile.TemporaryDirectory() as cache_dir:
+        path = os.path.join(cache_dir, 'analysis_cache.sqlite3')
+        for run_name in ('cold', 'restart'):
+            cache = AnalysisCache(path=path, max_entries=1000)
+            agent = OllamaAgent(host=server.host, timeout=30, cache=cache)
+            calls_before = server.requests
+            start = time.perf_counter()
+            for subject, snippet in emails:
+                agent.analyze_and_draft(subject.upper() if len(subject) % 2 else subject, snippet)
+            elapsed = time.perf_counter() - start
+            stats = cache.stats()
+            print(f"{run_name:8} emails={count} model_calls={server.requests - calls_before} "
+                  f"hits={stats['hits']} misses={stats['misses']} time={elapsed:.2f}s")
+            cache.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,41 @@
+"""Measure analysis throughput against a fake Ollama server per worker count.
+
+Usage: python -m benchmarks.bench_analysis_pipeline [email_count] [latency_seconds]
+"""
+import sys
+import time
+from datetime import datetime
+
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from tests.fake_ollama import FakeOllamaServer
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+
+
+def make_emails(count: int, offset: int = 0):
+    # No category keywords, so the rule classifier escalates every email to the model
+    return [{
+        'id': f"bench-{offset + i}",
+        'subject': f"Invoice {i} does not match the purchase order",
+        'sender': f"Sender {i} <sender{i}@example.com>",
+        'snippet': "The latest invoice lists a different total than we agreed on.",
+        'received_at': datetime.now(),
+    } for i in range(count)]
+
+
+def run(count: int = 50, latency: float = 0.05, worker_counts=(1, 2, 4, 8)) -> None:
+    with FakeOllamaServer(latency=latency) as server:
+        agent = OllamaAgent(host=server.host, timeout=30)
+        for workers in worker_counts:
+            model = EmailModel(ollama_agent=agent, analysis_workers=workers,
+                               store=EmailStore(Email))
+            start = time.perf_counter()
+            analyzed = sum(1 for _ in model.add_emails(make_emails(count)))
+            elapsed = time.perf_counter() - start
+            print(f"workers={workers:2} emails={analyzed} time={elapsed:.2f}s "
+                  f"throughput={analyzed / elapsed:.1f} emails/s")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 50, float(args[1]) if len(args) > 1 else 0.05)
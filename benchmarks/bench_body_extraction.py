@@ -0,0 +1,119 @@
+"""Memory, time and transfer of body extraction on large synthetic MIME messages.
+
+Each fixture is a Gmail payload tree: a reply carrying a long quoted
+history, an HTML-only newsletter, a short note with large attachments and
+a multi-megabyte plain-text dump. "whole" decodes every part of the message
+in full, as a fetch of the complete payload with its attachments would;
+"streamed" is BodyExtractor, which decodes only the chosen text part and
+stops at the quoted history or the token budget. Transfer is what
+GmailClient fetches from the fake service, with attachments left as ids.
+
+Usage: python -m benchmarks.bench_body_extraction [size_mb] [max_tokens]
+"""
+import base64
+import json
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+from gmail_mcp_agent.utils.body_extractor import TOKEN, BodyExtractor
+from tests.fake_gmail import FakeGmailService
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+
+WORDS = ("the release plan needs a final review before we ship it to customers next week "
+         "please check the numbers in the attached report and let me know").split()
+
+
+def encode(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+def prose(rng: random.Random, size: int, line: int = 12) -> str:
+    words, length = [], 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word + ('\n' if len(words) % line == line - 1 else ' '))
+        length += len(words[-1])
+    return ''.join(words)
+
+
+def text_part(mime_type: str, text: str):
+    return {'mimeType': mime_type, 'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="UTF-8"'}],
+            'body': {'size': len(text.encode()), 'data': encode(text)}}
+
+
+def fixtures(size: int):
+    rng = random.Random(5)
+    new_text = "Hi Sam,\n\nCould you review the release plan before Thursday? " + prose(rng, 600)
+    quoted = ''.join(f"> {line}\n" for line in prose(rng, size // 4).splitlines())
+    history = f"{new_text}\n\nOn Mon, Mar 4, 2024 at 9:12 AM Sam <sam@example.com> wrote:\n{quoted}"
+    html_history = (f"<div>{new_text.replace(chr(10), '<br>')}</div><div class=\"gmail_quote\">"
+                    f"<blockquote>{quoted.replace(chr(10), '<br>')}</blockquote></div>")
+    newsletter = ("<html><head><style>" + "p{margin:0}" * 2000 + "</style></head><body>"
+                  + ''.join(f"<p>{prose(rng, 400)}</p>" for _ in range(size // 400)) + "</body></html>")
+    attachment = base64.urlsafe_b64encode(rng.randbytes(size)).decode()
+    return {
+        'reply_with_history': {'mimeType': 'multipart/alternative',
+                               'parts': [text_part('text/plain', history), text_part('text/html', html_history)]},
+        'html_newsletter': text_part('text/html', newsletter),
+        'note_with_attachments': {'mimeType': 'multipart/mixed', 'parts': [
+            text_part('text/plain', "Report attached, see the summary on page two.\n\nThanks,\nRobin")] + [
+            {'mimeType': 'application/pdf', 'filename': f"report-{i}.pdf",
+             'body': {'size': size, 'data': attachment}} for i in range(3)]},
+        'plain_dump': text_part('text/plain', prose(rng, size * 2)),
+    }
+
+
+def decode_whole(payload) -> str:
+    """Decode every part in full and keep the first text part, stripping HTML with a regex."""
+    parts, stack, text = [], [payload], None
+    while stack:
+        part = stack.pop()
+        stack.extend(reversed(part.get('parts', [])))
+        data = part.get('body', {}).get('data')
+        if data is not None:
+            parts.append((part['mimeType'], base64.urlsafe_b64decode(data)))
+    for mime_type, data in parts:
+        if mime_type.startswith('text/') and text is None:
+            text = data.decode('utf-8', errors='replace')
+            if mime_type == 'text/html':
+                text = re.sub(r'<[^>]+>', ' ', text)
+    return text or ''
+
+
+def measure(extract, payload):
+    tracemalloc.start()
+    start = time.perf_counter()
+    text = extract(payload)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(TOKEN.findall(text)), elapsed, peak
+
+
+def run(size_mb: float = 2.0, max_tokens: int = 400) -> None:
+    size = int(size_mb * (1 << 20))
+    extractor = BodyExtractor(max_tokens=max_tokens)
+    service = FakeGmailService()
+    client = GmailClient(service=service, body_extractor=extractor)
+    print(f"part size ~{size_mb:g}MB, max_tokens={max_tokens}")
+    for name, payload in fixtures(size).items():
+        whole = measure(decode_whole, payload)
+        message = service.add_message("Sam <sam@example.com>", name, "", payload=payload)
+        streamed = measure(lambda p: extractor.extract(p, lambda attachment_id: service.attachments[attachment_id]),
+                           message['payload'])
+        service.reset_stats()
+        email = client.get_emails([message['id']])[0]
+        client.fetch_bodies([email])
+        print(f"{name}: message={len(json.dumps(payload)) / (1 << 20):.1f}MB "
+              f"fetched={service.stats['bytes'] / (1 << 20):.2f}MB in {service.stats['round_trips']} round trips")
+        for mode, (tokens, elapsed, peak) in (('whole', whole), ('streamed', streamed)):
+            print(f"  {mode:<8} tokens={tokens:<8} time={elapsed * 1000:7.1f}ms peak_memory={peak / (1 << 20):7.2f}MB")
+        print(f"  body starts: {email.get('body', '')[:60]!r}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(float(args[0]) if args else 2.0, int(args[1]) if len(args) > 1 else 400)
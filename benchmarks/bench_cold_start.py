@@ -0,0 +1,92 @@
+"""Cold-start time from a fresh interpreter to the end of the first poll.
+
+Each run starts a new Python process that imports the agent, builds the
+Gmail service and runs one fetch cycle against a mocked HTTP transport.
+The eager mode first imports the google/ollama/pydantic stack and builds
+the service with discovery.build, as the agent did at import time before.
+
+Usage: python -m benchmarks.bench_cold_start [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+eager = sys.argv[1] == 'eager'
+if eager:
+    import google.oauth2.credentials, google_auth_oauthlib.flow, google.auth.transport.requests
+    import googleapiclient.discovery, google_auth_httplib2, httplib2, ollama, pydantic
+from gmail_mcp_agent.presenter.email_presenter import EmailPresenter
+from gmail_mcp_agent.controller.email_controller import EmailController
+from gmail_mcp_agent.utils.gmail_client import GmailClient, build_gmail_service
+imported = time.perf_counter()
+
+from googleapiclient.http import HttpMockSequence
+http = HttpMockSequence([
+    ({'status': '200'}, json.dumps({'emailAddress': 'me@example.com', 'historyId': '1000'})),
+])
+if eager:
+    service = googleapiclient.discovery.build('gmail', 'v1', http=http)
+else:
+    service = build_gmail_service(http=http)
+built = time.perf_counter()
+
+controller = EmailController(gmail_client=GmailClient(service=service))
+EmailPresenter(controller=controller).process_new_emails()
+polled = time.perf_counter()
+controller.close()
+print(json.dumps({'import': imported - start, 'build': built - imported, 'first_poll': polled - start}))
+"""
+
+
+def run_once(mode: str, state_dir: str) -> dict:
+    env = dict(os.environ,
+               GMAIL_SYNC_STATE_FILE=os.path.join(state_dir, f"sync-{mode}.json"),
+               EMAIL_STORE_FILE=os.path.join(state_dir, f"emails-{mode}.sqlite3"),
+               ANALYSIS_CACHE_FILE=os.path.join(state_dir, f"cache-{mode}.sqlite3"))
+    # A fresh sync state every run, so each first poll starts history tracking
+    for name in ('sync', 'emails'):
+        path = env['GMAIL_SYNC_STATE_FILE' if name == 'sync' else 'EMAIL_STORE_FILE']
+        if os.path.exists(path):
+            os.remove(path)
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD, mode], env=env, capture_output=True, text=True,
+                            check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - start
+    return result
+
+
+def top_imports(count: int = 8) -> list:
+    """Slowest top-level imports of the agent, from ``-X importtime``."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import gmail_mcp_agent.main'],
+                            capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def run(runs: int = 5) -> None:
+    with tempfile.TemporaryDirectory() as state_dir:
+        for mode in ('eager', 'lazy'):
+            results = [run_once(mode, state_dir) for _ in range(runs)]
+            best = {key: min(r[key] for r in results) for key in results[0]}
+            print(f"{mode:5} import={best['import'] * 1000:6.0f}ms build={best['build'] * 1000:5.0f}ms "
+                  f"first_poll={best['first_poll'] * 1000:6.0f}ms process={best['process'] * 1000:6.0f}ms "
+                  f"(best of {runs})")
+    print("\nSlowest imports of gmail_mcp_agent.main (cumulative):")
+    for cumulative, name in top_imports():
+        print(f"{cumulative / 1000:8.1f}ms {name}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
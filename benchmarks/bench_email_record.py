@@ -0,0 +1,104 @@
+"""Memory and construction time of email records at scale.
+
+Compares the original pydantic Email model with the compact slotted record,
+both for emails arriving from Gmail (validated) and for emails loaded from
+the store (trusted rows with a stored analysis).
+
+Usage: python -m benchmarks.bench_email_record [max_records]
+"""
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict, Any
+
+from pydantic import BaseModel
+
+from gmail_mcp_agent.model.email import Email
+
+CATEGORIES = ("urgent", "meeting", "inquiry", "follow_up", "general")
+INTENTS = ("informational", "request for information", "schedule a meeting", "status update")
+
+
+class LegacyEmail(BaseModel):
+    """The original pydantic model from model/email_model.py."""
+    id: str
+    subject: str
+    sender: str
+    snippet: str
+    received_at: datetime = datetime.now()
+    is_processed: bool = False
+    response_template: str = ""
+    priority: int = 0
+    category: str = "general"
+    requires_attention: bool = False
+    intent: str = ""
+    ai_analysis: Dict[str, Any] = {}
+
+
+def gmail_data(i: int) -> Dict[str, Any]:
+    return {
+        'id': f"{i:016x}",
+        'subject': f"Subject {i}",
+        'sender': f"Sender {i} <sender{i}@example.com>",
+        'date': "Mon, 1 Jan 2024 00:00:00 +0000",
+        'snippet': "Short snippet of the email body.",
+        'received_at': datetime(2024, 1, 1) + timedelta(seconds=i),
+    }
+
+
+def stored_data(i: int) -> Dict[str, Any]:
+    category = CATEGORIES[i % 5]
+    # Build category and intent text per row, as a database read does
+    analysis = {'category': category, 'priority': i % 4, 'requires_attention': i % 4 == 3,
+                'intent': "".join(INTENTS[i % 4]), 'suggested_response': "Thank you for your email."}
+    data = gmail_data(i)
+    del data['date']
+    data.update(priority=i % 4, category="".join(category), requires_attention=i % 4 == 3,
+                intent="".join(INTENTS[i % 4]), response_template="Thank you for your email.",
+                ai_analysis=json.dumps(analysis))
+    return data
+
+
+def measure(build, rows) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = [build(row) for row in rows]
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return elapsed, memory
+
+
+def run(max_records: int = 1000000) -> None:
+    scenarios = (
+        ('gmail', gmail_data, (
+            ('pydantic', lambda data: LegacyEmail(**data)),
+            ('compact', Email.from_data),
+        )),
+        ('store', stored_data, (
+            ('pydantic', lambda data: LegacyEmail(**dict(data, ai_analysis=json.loads(data['ai_analysis'])))),
+            ('compact', lambda data: Email(**data)),
+        )),
+    )
+    # Powers of ten from 100000, always ending with max_records itself
+    counts = []
+    count = 100000
+    while count < max_records:
+        counts.append(count)
+        count *= 10
+    counts.append(max_records)
+    for count in counts:
+        for source, make, builders in scenarios:
+            rows = [make(i) for i in range(count)]
+            for name, build in builders:
+                elapsed, memory = measure(build, rows)
+                print(f"{source:5} {name:8} records={count:8} build={elapsed / count * 1e6:6.2f}us/record "
+                      f"memory={memory / count:6.0f}B/record ({memory / 1e6:7.1f}MB)")
+            del rows
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
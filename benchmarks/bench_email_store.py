@@ -0,0 +1,106 @@
+"""Per-call latency and memory of EmailModel storage as the mailbox grows.
+
+Compares the original list-backed scans with EmailStore at each size. A
+tenth of each mailbox (at least a thousand emails) is left unprocessed, so
+reads over the unprocessed backlog are measured at a realistic size.
+
+Usage: python -m benchmarks.bench_email_store [max_emails]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from gmail_mcp_agent.model.email_model import Email
+from gmail_mcp_agent.model.email_store import EmailStore
+
+UNPROCESSED_SHARE = 0.1
+MIN_UNPROCESSED = 1000
+
+
+def make_email(i: int) -> Email:
+    return Email(
+        id=f"msg-{i}",
+        subject=f"Subject {i}",
+        sender=f"sender{i}@example.com",
+        snippet="Short snippet of the email body.",
+        received_at=datetime(2024, 1, 1) + timedelta(seconds=i),
+        priority=i % 4,
+        category=("urgent", "meeting", "inquiry", "general")[i % 4],
+        requires_attention=i % 4 == 0,
+    )
+
+
+def unprocessed_count(count: int) -> int:
+    return min(count, max(MIN_UNPROCESSED, int(count * UNPROCESSED_SHARE)))
+
+
+def timed(fn, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench_list(count: int) -> dict:
+    """The original storage: one list, linear scans and a full sort per call."""
+    tracemalloc.start()
+    emails = [make_email(i) for i in range(count)]
+    for email in emails[:count - unprocessed_count(count)]:
+        email.is_processed = True
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    def mark(email_id):
+        for email in emails:
+            if email.id == email_id:
+                return
+
+    return {
+        'memory_mb': memory / 1e6,
+        'by_priority_us': timed(lambda: sorted([e for e in emails if not e.is_processed],
+                                               key=lambda x: x.priority, reverse=True)),
+        'attention_us': timed(lambda: [e for e in emails if e.requires_attention and not e.is_processed]),
+        'mark_us': timed(lambda: mark(f"msg-{count - 1}")),
+    }
+
+
+def bench_store(count: int) -> dict:
+    # Use a file so SQLite's page cache, not an in-memory database, holds the rows
+    path = os.path.join(tempfile.mkdtemp(), 'emails.sqlite3')
+    store = EmailStore(Email, path=path)
+    tracemalloc.start()
+    for i in range(count):
+        email = make_email(i)
+        if i < count - unprocessed_count(count):
+            email.is_processed = True
+        store.add(email)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    result = {
+        'memory_mb': memory / 1e6,
+        'by_priority_us': timed(store.get_by_priority),
+        'attention_us': timed(store.get_requiring_attention),
+        'mark_us': timed(lambda: store.mark_as_processed(f"msg-{count - 1}")),
+    }
+    store.close()
+    os.remove(path)
+    return result
+
+
+def run(max_emails: int = 100000) -> None:
+    size = 1000
+    while size <= max_emails:
+        for name, bench in (('list', bench_list), ('store', bench_store)):
+            result = bench(size)
+            print(f"{name:5} emails={size:7} unprocessed={unprocessed_count(size):6} memory={result['memory_mb']:8.1f}MB "
+                  f"by_priority={result['by_priority_us']:9.1f}us "
+                  f"attention={result['attention_us']:9.1f}us mark={result['mark_us']:9.1f}us")
+        size *= 10
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,93 @@
+"""Latency of the nearest-neighbor classifier and its agreement with LLM labels.
+
+Emails arrive in order; the ones the classifier escalates are labelled by
+the "LLM" and added to the index, as in the agent. LLM labels come from a
+recorded fixture's analyses, or from the synthetic corpus's ground truth.
+Embeddings come from the local hashing embedder, or from Ollama when
+EMBEDDING_MODEL names a model. Also compares one batched similarity search
+with a loop of single-query searches.
+
+Usage: python -m benchmarks.bench_embedding_classifier [email_count] [fixture.jsonl] [threshold]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+from gmail_mcp_agent.model.embedding_classifier import EmbeddingClassifier, HashingEmbedder, VectorIndex
+from gmail_mcp_agent.model.rule_classifier import CATEGORY_PRIORITY
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+from tests.replay import Fixture, make_corpus
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+def llm_labels(fixture: Fixture, synthetic: bool):
+    """Yield (subject, snippet, label) for every message with an LLM label."""
+    for message in fixture.messages:
+        if synthetic:
+            category = message['category']
+            label = {'category': category, 'priority': CATEGORY_PRIORITY[category],
+                     'requires_attention': category == 'urgent', 'intent': category}
+        else:
+            label = next((fixture.ollama_results.get((method, message['subject'], message['snippet']))
+                          for method in ('analyze_and_draft', 'analyze_email')
+                          if (method, message['subject'], message['snippet']) in fixture.ollama_results), None)
+            if not isinstance(label, dict):
+                continue
+        yield message['subject'], message['snippet'], label
+
+
+def search_speed(dim: int = 768, entries: int = 20000, queries: int = 256) -> None:
+    rng = np.random.default_rng(3)
+    index = VectorIndex(max_entries=entries)
+    for vector in rng.standard_normal((entries, dim), dtype=np.float32):
+        index.add(vector, {'category': 'general'})
+    batch = rng.standard_normal((queries, dim), dtype=np.float32)
+    start = time.perf_counter()
+    for query in batch:
+        index.search(query, 5)
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    index.search(batch, 5)
+    batched = time.perf_counter() - start
+    print(f"search over {entries} x {dim}: one at a time={single / queries * 1e3:.2f}ms/query "
+          f"batched={batched / queries * 1e3:.2f}ms/query")
+
+
+def run(count: int = 2000, fixture_path: str = None, threshold: float = 0.85) -> None:
+    fixture = Fixture.load(fixture_path) if fixture_path else make_corpus(count)
+    model = os.getenv('EMBEDDING_MODEL')
+    embed = OllamaAgent().embed if model and model != 'hashing' else HashingEmbedder()
+    classifier = EmbeddingClassifier(embed, name=model or '', threshold=threshold)
+
+    latencies, agreed, classified, labelled = [], 0, 0, 0
+    for subject, snippet, label in list(llm_labels(fixture, not fixture_path))[:count]:
+        labelled += 1
+        start = time.perf_counter()
+        analysis = classifier.classify(subject, snippet)
+        latencies.append(time.perf_counter() - start)
+        if analysis is None:
+            classifier.learn(subject, snippet, label)
+        else:
+            classified += 1
+            agreed += analysis['category'] == label['category']
+
+    llm_latencies = [latency for values in fixture.ollama_latencies.values() for latency in values]
+    print(f"source={'fixture ' + fixture_path if fixture_path else 'synthetic'} "
+          f"embedder={model or 'hashing'} threshold={threshold} emails={labelled}")
+    print(f"classified_by_neighbors={classified} ({classified / max(labelled, 1):.0%}) "
+          f"agreement_with_llm={agreed / max(classified, 1):.1%} indexed={len(classifier.index)}")
+    print(f"classify p50={percentile(latencies, 0.5) * 1e3:.2f}ms p95={percentile(latencies, 0.95) * 1e3:.2f}ms"
+          + (f" (recorded LLM p50={percentile(llm_latencies, 0.5) * 1e3:.0f}ms)" if llm_latencies else ""))
+    search_speed()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 2000, args[1] if len(args) > 1 else None,
+        float(args[2]) if len(args) > 2 else 0.85)
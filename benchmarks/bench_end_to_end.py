@@ -0,0 +1,105 @@
+"""End-to-end throughput, arrival-to-reply latency and memory of the agent.
+
+Replays a fixture (recorded with ``python -m tests.replay
+record``) or a synthetic inbox through the agent's polling cycle, which
+answers new emails as they are analyzed. Gmail and Ollama answer with recorded
+latencies where the fixture has them and log-normal ones otherwise.
+Arrivals are compressed so the inbox arrives within ``duration`` seconds,
+and the send quota is lifted so the quota does not mask pipeline changes.
+Each thread gets one reply, so an email's latency runs to the first reply
+sent in its thread after it arrived.
+
+Usage: python -m benchmarks.bench_end_to_end [email_count] [fixture.jsonl] [duration]
+"""
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from gmail_mcp_agent.controller.email_controller import EmailController
+from gmail_mcp_agent.controller.send_queue import SendQueue
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from tests.fake_gmail import FakeGmailService
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+from tests.replay import Fixture, LatencyModel, ReplayOllamaAgent, deliver_messages, make_corpus
+
+POLL_INTERVAL = 0.05
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+def run(count: int = 300, fixture_path: str = None, duration: float = 10.0) -> None:
+    fixture = Fixture.load(fixture_path) if fixture_path else make_corpus(count)
+    messages = fixture.messages[:count]
+    span = messages[-1]['received_at'] - messages[0]['received_at'] if len(messages) > 1 else 0
+    speed = span / duration if span > duration else 1.0
+
+    service = FakeGmailService(latency=LatencyModel(fixture.gmail_latencies, median=0.05, p95=0.2, seed=1))
+    agent = ReplayOllamaAgent(fixture, LatencyModel(fixture.ollama_latencies, median=0.1, p95=0.4, seed=2))
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        client = GmailClient(service=service)
+        store = EmailStore(Email, path=os.path.join(state_dir, 'emails.sqlite3'))
+        controller = EmailController(
+            model=EmailModel(ollama_agent=agent, store=store),
+            gmail_client=client,
+            history_sync=HistorySync(client, state_file=os.path.join(state_dir, 'state.json')),
+            send_queue=SendQueue(client, store, quota_units_per_second=1e6)
+        )
+        # Sync the empty mailbox so the run takes the incremental path
+        controller.fetch_new_emails()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        arrivals = {}
+        feeder = threading.Thread(target=lambda: arrivals.update(deliver_messages(service, messages, speed)))
+        start = time.time()
+        feeder.start()
+        cycles = 0
+        while (feeder.is_alive() or controller.model.count_emails() < len(messages)
+               or controller.model.store.count_unprocessed()):
+            controller.process_emails_by_priority()
+            for _ in controller.reply_as_analyzed(controller.stream_new_emails()):
+                pass
+            cycles += 1
+            if not controller.last_fetch_count:
+                time.sleep(POLL_INTERVAL)
+            if time.time() - start > duration * 10 + 60:
+                print("Timed out waiting for replies")
+                break
+        elapsed = time.time() - start
+        feeder.join()
+        controller.close()
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    waiting: Dict[str, List[Tuple[float, str]]] = {}
+    for message_id, arrived in arrivals.items():
+        waiting.setdefault(service.messages[message_id]['threadId'], []).append((arrived, message_id))
+    latencies = []
+    for sent in sorted(service.sent, key=lambda sent: sent['sent_at']):
+        pending = waiting.get(sent['response']['threadId'], [])
+        latencies.extend(sent['sent_at'] - arrived for arrived, _ in pending if arrived <= sent['sent_at'])
+        pending[:] = [entry for entry in pending if entry[0] > sent['sent_at']]
+
+    print(f"source={'fixture ' + fixture_path if fixture_path else 'synthetic'} emails={len(messages)} "
+          f"replies={len(service.sent)} threads={len(waiting)} arrival_window={duration:.0f}s cycles={cycles}")
+    print(f"throughput={len(latencies) / elapsed:.1f} emails/s "
+          f"arrival_to_reply p50={percentile(latencies, 0.5) * 1000:.0f}ms "
+          f"p95={percentile(latencies, 0.95) * 1000:.0f}ms max={max(latencies, default=0) * 1000:.0f}ms")
+    print(f"peak_rss={rss_after / 1024:.0f}MB (+{(rss_after - rss_before) / 1024:.0f}MB during run) "
+          f"gmail_round_trips={service.stats['round_trips']} "
+          f"llm_calls={agent.hits + agent.misses} (fixture hits={agent.hits}) "
+          f"rules={controller.model.rule_classifier.stats()['matched']}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 300, args[1] if len(args) > 1 else None,
+        float(args[2]) if len(args) > 2 else 10.0)
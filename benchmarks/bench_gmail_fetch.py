@@ -0,0 +1,55 @@
+"""Compare per-message and batched Gmail fetching against the fake service.
+
+Usage: python -m benchmarks.bench_gmail_fetch [message_count]
+"""
+import sys
+import time
+
+from tests.fake_gmail import FakeGmailService
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+
+
+def build_service(count: int, latency: float) -> FakeGmailService:
+    service = FakeGmailService(latency=latency)
+    body = "Lorem ipsum dolor sit amet. " * 400
+    for i in range(count):
+        service.add_message(f"Sender {i} <sender{i}@example.com>", f"Subject {i}", body[:200], body=body)
+    return service
+
+
+def fetch_per_message(service: FakeGmailService) -> int:
+    """The original strategy: one list call, then one full get per message."""
+    results = service.users().messages().list(userId='me', labelIds=['UNREAD'], maxResults=500).execute()
+    for message in results.get('messages', []):
+        service.users().messages().get(userId='me', id=message['id'], format='full').execute()
+    return len(results.get('messages', []))
+
+
+def fetch_batched(service: FakeGmailService) -> int:
+    """Batched metadata, then batched bodies of every message."""
+    client = GmailClient(service=service)
+    emails = client.get_unread_emails()
+    client.fetch_bodies(emails)
+    return len(emails)
+
+
+def fetch_batched_metadata(service: FakeGmailService) -> int:
+    """Batched, without message bodies (EMAIL_BODY_TOKENS=0)."""
+    client = GmailClient(service=service)
+    client.body_extractor = None
+    return len(client.get_unread_emails())
+
+
+def run(count: int, latency: float = 0.005) -> None:
+    for name, fetch in [('per-message', fetch_per_message), ('batched', fetch_batched),
+                        ('metadata', fetch_batched_metadata)]:
+        service = build_service(count, latency)
+        start = time.perf_counter()
+        fetched = fetch(service)
+        elapsed = time.perf_counter() - start
+        print(f"{name:12} messages={fetched:5} round_trips={service.stats['round_trips']:5} "
+              f"bytes={service.stats['bytes']:10} time={elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,44 @@
+"""Compare re-listing UNREAD with history-based incremental sync.
+
+Usage: python -m benchmarks.bench_history_sync
+"""
+import os
+import tempfile
+
+from tests.fake_gmail import FakeGmailService
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+
+
+def fill_inbox(service: FakeGmailService, count: int) -> None:
+    for i in range(count):
+        service.add_message(f"sender{i}@example.com", f"Subject {i}", f"Snippet {i}")
+
+
+def run(inbox_sizes=(100, 1000, 5000), new_per_poll: int = 5) -> None:
+    for inbox_size in inbox_sizes:
+        service = FakeGmailService()
+        fill_inbox(service, inbox_size)
+        client = GmailClient(service=service)
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            history_sync = HistorySync(client, state_file=os.path.join(state_dir, 'sync_state.json'))
+            history_sync.sync()
+            history_sync.commit()
+
+            fill_inbox(service, new_per_poll)
+            service.reset_stats()
+            client.get_unread_emails()
+            full = dict(service.stats)
+
+            service.reset_stats()
+            result = history_sync.sync()
+            incremental = dict(service.stats)
+
+        print(f"inbox={inbox_size:5} new={len(result['emails'])} "
+              f"relist: round_trips={full['round_trips']:4} bytes={full['bytes']:9} | "
+              f"history: round_trips={incremental['round_trips']:4} bytes={incremental['bytes']:9}")
+
+
+if __name__ == "__main__":
+    run()
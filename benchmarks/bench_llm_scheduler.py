@@ -0,0 +1,102 @@
+"""Time to reply per priority class when urgent emails arrive behind a burst.
+
+A burst of low-priority emails the rules cannot classify lands in the inbox
+just before a few urgent and meeting requests, all in one sync. The
+baseline analyzes them in arrival order and sends replies once the whole
+batch is analyzed; the scheduled run analyzes by estimated priority and
+deadline and sends each reply as soon as its email is analyzed.
+
+Usage: python -m benchmarks.bench_llm_scheduler [burst_size] [urgent_count] [llm_latency]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from gmail_mcp_agent.controller.email_controller import EmailController
+from gmail_mcp_agent.controller.send_queue import SendQueue
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from gmail_mcp_agent.model.llm_scheduler import LLMScheduler
+from tests.fake_gmail import FakeGmailService
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+from tests.replay import Fixture, LatencyModel, ReplayOllamaAgent
+
+WORKERS = 4
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+def inbox(burst: int, urgent: int):
+    """Get (class, sender, subject, snippet) in arrival order.
+
+    Snippets carry one keyword at most, too weak for the rules to classify
+    them but enough to estimate a priority.
+    """
+    messages = [('low', f"Person {i} <person{i}@example.com>", f"Thoughts on draft {i}",
+                 "Sharing a few notes from last week when you have a moment.") for i in range(burst)]
+    for i in range(urgent):
+        messages.append(('urgent', f"Ops {i} <ops{i}@example.com>", f"Checkout {i} failing",
+                         "Customers cannot pay, please look asap."))
+        messages.append(('meeting', f"Lead {i} <lead{i}@example.com>", f"Sync {i} on the launch",
+                         "Could we find a slot on the calendar this week?"))
+    return messages
+
+
+def run_mode(scheduled: bool, burst: int, urgent: int, llm_latency: float) -> None:
+    service = FakeGmailService(latency=0.01)
+    agent = ReplayOllamaAgent(Fixture(), LatencyModel(median=llm_latency, p95=llm_latency * 2, seed=2))
+    # Equal targets make the scheduler first in, first out
+    scheduler = LLMScheduler(WORKERS, None if scheduled else {priority: 600.0 for priority in range(4)})
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        client = GmailClient(service=service)
+        store = EmailStore(Email, path=os.path.join(state_dir, 'emails.sqlite3'))
+        controller = EmailController(
+            model=EmailModel(ollama_agent=agent, store=store, scheduler=scheduler),
+            gmail_client=client,
+            history_sync=HistorySync(client, state_file=os.path.join(state_dir, 'state.json')),
+            send_queue=SendQueue(client, store, quota_units_per_second=1e6)
+        )
+        # Sync the empty mailbox so the burst takes the incremental path
+        controller.fetch_new_emails()
+
+        classes = {}
+        for i, (name, sender, subject, snippet) in enumerate(inbox(burst, urgent)):
+            classes[f"burst-{i}"] = name
+            service.add_message(sender, subject, snippet, thread_id=f"burst-{i}")
+        start = time.time()
+        if scheduled:
+            for _ in controller.reply_as_analyzed(controller.stream_new_emails()):
+                pass
+        else:
+            controller.fetch_new_emails()
+            controller.process_emails_by_priority()
+        elapsed = time.time() - start
+        controller.close()
+
+    latencies = {}
+    for sent in service.sent:
+        latencies.setdefault(classes[sent['response']['threadId']], []).append(sent['sent_at'] - start)
+    print(f"{'scheduled' if scheduled else 'fifo, batch'}: replies={len(service.sent)} "
+          f"total={elapsed:.2f}s llm_calls={agent.misses}")
+    for name in ('urgent', 'meeting', 'low'):
+        values = latencies.get(name, [])
+        print(f"  {name:<8} n={len(values):<4} time_to_reply p50={percentile(values, 0.5) * 1000:.0f}ms "
+              f"p95={percentile(values, 0.95) * 1000:.0f}ms max={max(values, default=0) * 1000:.0f}ms")
+
+
+def run(burst: int = 200, urgent: int = 10, llm_latency: float = 0.05) -> None:
+    print(f"burst={burst} urgent={urgent} meeting={urgent} workers={WORKERS} llm_latency~{llm_latency * 1000:.0f}ms")
+    for scheduled in (False, True):
+        run_mode(scheduled, burst, urgent, llm_latency)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 200, int(args[1]) if len(args) > 1 else 10,
+        float(args[2]) if len(args) > 2 else 0.05)
@@ -0,0 +1,89 @@
+"""Instrumentation overhead, and the per-stage breakdown of one processing cycle.
+
+Usage: python -m benchmarks.bench_metrics [email_count]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from gmail_mcp_agent.controller.email_controller import EmailController
+from gmail_mcp_agent.controller.send_queue import SendQueue
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from tests.fake_gmail import FakeGmailService
+from tests.fake_ollama import FakeOllamaServer
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+from gmail_mcp_agent.utils.metrics import metrics
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+
+CALLS = 200000
+
+
+@metrics.timed('bench_call_seconds')
+def instrumented() -> None:
+    pass
+
+
+def plain() -> None:
+    pass
+
+
+def per_call(func) -> float:
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        func()
+    return (time.perf_counter() - start) / CALLS * 1e9
+
+
+def overhead() -> None:
+    baseline = per_call(plain)
+    metrics.disable()
+    disabled = per_call(instrumented)
+    metrics.enable()
+    enabled = per_call(instrumented)
+    print(f"plain call:            {baseline:6.0f} ns")
+    print(f"instrumented, off:     {disabled:6.0f} ns (+{disabled - baseline:.0f} ns)")
+    print(f"instrumented, on:      {enabled:6.0f} ns (+{enabled - baseline:.0f} ns)")
+
+
+def cycle(count: int, state_dir: str) -> None:
+    metrics.reset()
+    metrics.enable()
+    service = FakeGmailService(latency=0.02)
+    with FakeOllamaServer(latency=0.05, jitter=0.1, seed=1) as server:
+        client = GmailClient(service=service)
+        store = EmailStore(Email)
+        controller = EmailController(
+            model=EmailModel(ollama_agent=OllamaAgent(host=server.host, timeout=30), store=store),
+            gmail_client=client,
+            history_sync=HistorySync(client, state_file=os.path.join(state_dir, 'state.json')),
+            send_queue=SendQueue(client, store, quota_units_per_second=1e6)
+        )
+        # Start from a synced mailbox so the cycle takes the incremental path
+        controller.fetch_new_emails()
+        for i in range(count):
+            service.add_message(f"sender{i}@example.com", f"Project update {i}",
+                                f"Here is the weekly status for workstream {i}.")
+        controller.fetch_new_emails()
+        controller.process_emails_by_priority()
+        controller.close()
+
+    snapshot = metrics.to_dict()
+    print(f"\n{'histogram':28} {'labels':44} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, series in sorted(snapshot['histograms'].items()):
+        for entry in series:
+            labels = ",".join(f"{k}={v}" for k, v in entry['labels'].items())
+            print(f"{name:28} {labels:44} {entry['count']:6} "
+                  + " ".join(f"{entry[q] * 1000:8.1f}" for q in ('p50', 'p95', 'p99')))
+    for name, series in sorted(snapshot['counters'].items()):
+        for entry in series:
+            labels = ",".join(f"{k}={v}" for k, v in entry['labels'].items())
+            print(f"{name:28} {labels:44} {entry['value']:6.0f}")
+
+
+if __name__ == "__main__":
+    overhead()
+    with tempfile.TemporaryDirectory() as state_dir:
+        cycle(int(sys.argv[1]) if len(sys.argv) > 1 else 50, state_dir)
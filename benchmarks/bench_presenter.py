@@ -0,0 +1,81 @@
+"""Per-cycle status and summary rendering cost as the unprocessed backlog grows.
+
+Compares the original full regroup-and-render with the incremental presenter.
+
+Usage: python -m benchmarks.bench_presenter [max_backlog]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_email_store import make_email
+from gmail_mcp_agent.controller.email_controller import EmailController
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from gmail_mcp_agent.presenter.email_presenter import EmailPresenter
+from tests.fake_gmail import FakeGmailService
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+
+
+def legacy_cycle(presenter: EmailPresenter) -> str:
+    """The original rendering: full status scans, then regroup, sort and render every email."""
+    model = presenter.controller.model
+    unprocessed = model.get_unprocessed_emails()
+    attention_required = model.get_emails_requiring_attention()
+    status = f"Unprocessed: {len(unprocessed)} Requiring Attention: {len(attention_required)}"
+
+    summary = ["Email Summary:"]
+    categories = {}
+    for email in unprocessed:
+        categories.setdefault(email.category, []).append(email)
+    for category, emails in categories.items():
+        summary.append(f"\n{category.upper()} Emails:")
+        for email in sorted(emails, key=lambda x: x.priority, reverse=True):
+            summary.append(presenter.display_email(email))
+    return status + "\n".join(summary)
+
+
+def incremental_cycle(presenter: EmailPresenter) -> str:
+    return presenter.display_processing_status() + presenter.get_email_summary()
+
+
+def timed(fn, repeat: int = 5) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = fn()
+    return (time.perf_counter() - start) / repeat * 1000, len(output)
+
+
+def run(max_backlog: int = 100000) -> None:
+    with tempfile.TemporaryDirectory() as state_dir:
+        store = EmailStore(Email)
+        client = GmailClient(service=FakeGmailService())
+        controller = EmailController(
+            model=EmailModel(ollama_agent=OllamaAgent(), store=store),
+            gmail_client=client,
+            history_sync=HistorySync(client, state_file=os.path.join(state_dir, 'state.json'))
+        )
+        presenter = EmailPresenter(controller=controller, top_n=5)
+
+        size = 0
+        print(f"{'backlog':>8} {'legacy ms':>10} {'legacy chars':>13} {'incremental ms':>15} {'chars':>7}")
+        for target in sorted({backlog for backlog in (1000, 10000, max_backlog) if backlog <= max_backlog}):
+            while size < target:
+                store.add(make_email(size))
+                size += 1
+            legacy_ms, legacy_chars = timed(lambda: legacy_cycle(presenter))
+            # A cycle with one new and one replied email renders the changed categories again
+            def cycle():
+                store.add(make_email(size + 10 ** 9))
+                store.mark_as_processed(f"msg-{size + 10 ** 9}")
+                return incremental_cycle(presenter)
+            incremental_ms, incremental_chars = timed(cycle)
+            print(f"{target:8} {legacy_ms:10.1f} {legacy_chars:13} {incremental_ms:15.2f} {incremental_chars:7}")
+        controller.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
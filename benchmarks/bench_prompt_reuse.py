@@ -0,0 +1,94 @@
+"""Prompt evaluation and model reloads per LLM call, before and after prefix reuse.
+
+The fake server caches evaluated prompt tokens per slot and unloads the
+model once idle for ``keep_alive``, like Ollama. Emails arrive every few
+polling cycles, with idle cycles in between longer than ``keep_alive``.
+The "before" agent puts the email ahead of the instructions, as prompts
+were built before, and never warms the model; the "after" agent opens every
+chat with the same system prompt and instructions and calls ``keep_warm``
+at the start of each cycle, as the controller does.
+
+Usage: python -m benchmarks.bench_prompt_reuse [cycles] [emails_per_busy_cycle] [load_seconds]
+"""
+import sys
+import time
+
+from tests.fake_ollama import FakeOllamaServer
+from gmail_mcp_agent.utils.metrics import metrics
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+from tests.replay import make_corpus
+
+KEEP_ALIVE = '2s'
+CYCLE_INTERVAL = 1.2
+SYNC_SECONDS = 0.2
+# Emails arrive every BUSY_EVERY cycles
+BUSY_EVERY = 3
+
+
+class EmailFirstAgent(OllamaAgent):
+    """The earlier prompt layout: one message with the email ahead of the instructions, no warm-up."""
+
+    def _messages(self, instructions, prompt):
+        return [{'role': 'system', 'content': self.system_prompt},
+                {'role': 'user', 'content': f"{prompt}\n\n{instructions}"}]
+
+    def keep_warm(self) -> None:
+        pass
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+def histogram(name: str, operation: str):
+    series = metrics.to_dict()['histograms'].get(name, [])
+    return next(((h['count'], h['sum']) for h in series if h['labels'].get('operation') == operation), (0, 0.0))
+
+
+def run_mode(agent_class, cycles: int, per_cycle: int, load: float) -> None:
+    messages = make_corpus(cycles * per_cycle).messages
+    metrics.reset()
+    with FakeOllamaServer(latency=0.01, token_latency=0.01, prompt_token_latency=0.001, load_latency=load,
+                          prompt_cache=True, parallel=1) as server:
+        agent = agent_class(host=server.host, timeout=30, keep_alive=KEEP_ALIVE)
+        first, rest = [], []
+        for cycle in range(cycles):
+            start = time.monotonic()
+            agent.keep_warm()
+            # Gmail is synced while the model loads
+            time.sleep(SYNC_SECONDS)
+            if cycle % BUSY_EVERY == 0:
+                for i in range(per_cycle):
+                    message = messages[cycle * per_cycle + i]
+                    call_start = time.perf_counter()
+                    agent.analyze_and_draft(message['subject'], message['snippet'])
+                    (rest if i else first).append(time.perf_counter() - call_start)
+            time.sleep(max(0.0, start + CYCLE_INTERVAL - time.monotonic()))
+        # Let a warm-up still in flight finish before reading the counters
+        time.sleep(load)
+
+        calls, prompt_eval = histogram('ollama_prompt_eval_seconds', 'analyze_and_draft')
+        loaded_in_calls, load_time = histogram('ollama_load_seconds', 'analyze_and_draft')
+        tokens = sum(c['value'] for c in metrics.to_dict()['counters'].get('ollama_tokens_total', [])
+                     if c['labels'] == {'kind': 'prompt', 'operation': 'analyze_and_draft'})
+        print(f"{'after' if agent_class is OllamaAgent else 'before'}: calls={calls} "
+              f"prompt_tokens/call={tokens / max(calls, 1):.0f} "
+              f"prompt_eval/call={prompt_eval / max(calls, 1) * 1000:.1f}ms "
+              f"calls_waiting_for_load={loaded_in_calls} ({load_time:.1f}s) model_loads={server.loads}")
+        print(f"  first email of a cycle p50={percentile(first, 0.5) * 1000:.0f}ms "
+              f"max={max(first, default=0) * 1000:.0f}ms; others p50={percentile(rest, 0.5) * 1000:.0f}ms")
+
+
+def run(cycles: int = 7, per_cycle: int = 5, load: float = 1.0) -> None:
+    metrics.enable()
+    print(f"cycles={cycles} every {CYCLE_INTERVAL}s, {per_cycle} emails every {BUSY_EVERY} cycles, "
+          f"keep_alive={KEEP_ALIVE} model_load={load}s")
+    for agent_class in (EmailFirstAgent, OllamaAgent):
+        run_mode(agent_class, cycles, per_cycle, load)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 7, int(args[1]) if len(args) > 1 else 5,
+        float(args[2]) if len(args) > 2 else 1.0)
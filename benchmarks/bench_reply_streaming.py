@@ -0,0 +1,48 @@
+"""Tail latency of reply generation, buffered versus streamed with a budget.
+
+The fake server lets a share of replies ramble on for hundreds of tokens.
+The buffered mode is the plain generate call the agent made before; the
+streamed mode caps each reply with a token budget and a deadline.
+
+Usage: python -m benchmarks.bench_reply_streaming [email_count] [ramble_share]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.fake_ollama import FakeOllamaServer
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(count: int = 100, ramble: float = 0.1) -> None:
+    email_data = {'category': 'inquiry', 'priority': 1, 'subject': 'Question about the report',
+                  'snippet': 'Could you send me the latest figures before Friday?'}
+    for stream in (False, True):
+        with FakeOllamaServer(latency=0.02, token_latency=0.002, ramble=ramble, ramble_tokens=800,
+                              seed=1) as server:
+            agent = OllamaAgent(host=server.host, timeout=30, stream_replies=stream, reply_tokens=128,
+                                reply_deadline=1.0)
+
+            def draft(_):
+                start = time.perf_counter()
+                reply = agent.generate_response(email_data)
+                return time.perf_counter() - start, len(reply.split())
+
+            with ThreadPoolExecutor(4) as pool:
+                results = list(pool.map(draft, range(count)))
+            latencies = [latency for latency, _ in results]
+            name = 'streamed' if stream else 'buffered'
+            print(f"{name}: p50={percentile(latencies, 0.5) * 1000:.0f}ms "
+                  f"p95={percentile(latencies, 0.95) * 1000:.0f}ms p99={percentile(latencies, 0.99) * 1000:.0f}ms "
+                  f"max={max(latencies) * 1000:.0f}ms eval_tokens={server.eval_tokens} "
+                  f"longest_reply={max(words for _, words in results)} words")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 100, float(args[1]) if len(args) > 1 else 0.1)
@@ -0,0 +1,56 @@
+"""Measure how many LLM calls the rule classifier avoids and what it costs.
+
+Usage: python -m benchmarks.bench_rule_classifier [email_count] [threshold]
+"""
+import random
+import sys
+import time
+
+from gmail_mcp_agent.model.rule_classifier import RuleClassifier
+
+CATEGORY_KEYWORDS = {
+    "urgent": ["urgent", "asap", "immediately", "important", "priority"],
+    "inquiry": ["question", "inquiry", "help", "how to", "what is"],
+    "meeting": ["meeting", "schedule", "calendar", "appointment", "call"],
+    "follow_up": ["follow up", "follow-up", "reminder", "checking in"]
+}
+
+# (subject, snippet, sender) templates per expected label
+CORPUS_TEMPLATES = [
+    ("URGENT: production is down", "Please look at this immediately, customers are affected.", "ops@example.com"),
+    ("Meeting to schedule Q3 planning", "Can we find a slot on the calendar for a meeting?", "pm@example.com"),
+    ("Question about the API", "I have a question: how to paginate results?", "dev@example.org"),
+    ("Friendly reminder: follow up on the contract", "Just checking in on the contract.", "legal@example.com"),
+    ("Your weekly digest", "Top stories this week from our blog.", "newsletter@news.example.com"),
+    ("[CI] Build #{n} passed", "All checks passed on main.", "notifications@ci.example.com"),
+    ("Thoughts on the draft", "I read the draft and had some ideas to share.", "colleague@example.com"),
+    ("Lunch on Friday?", "Are you around on Friday for lunch and a quick call?", "friend@example.net"),
+]
+
+
+def make_corpus(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(count):
+        subject, snippet, sender = rng.choice(CORPUS_TEMPLATES)
+        corpus.append((subject.format(n=n), snippet, f"Sender <{sender}>"))
+    return corpus
+
+
+def run(count: int = 100000, threshold: float = 0.75) -> None:
+    classifier = RuleClassifier(CATEGORY_KEYWORDS, threshold=threshold)
+    corpus = make_corpus(count)
+    start = time.perf_counter()
+    for subject, snippet, sender in corpus:
+        classifier.classify(subject, snippet, sender)
+    elapsed = time.perf_counter() - start
+    stats = classifier.stats()
+    print(f"emails={count} threshold={threshold} classified_by_rules={stats['matched']} "
+          f"escalated_to_llm={stats['escalated']} "
+          f"llm_call_reduction={stats['matched'] / count:.0%} "
+          f"per_email={elapsed / count * 1e6:.1f}us")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 100000, float(args[1]) if len(args) > 1 else 0.75)
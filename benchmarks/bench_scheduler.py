@@ -0,0 +1,87 @@
+"""Arrival-to-reply latency with push notifications versus adaptive polling.
+
+Usage: python -m benchmarks.bench_scheduler [email_count]
+"""
+import base64
+import email
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from gmail_mcp_agent.controller.email_controller import EmailController
+from gmail_mcp_agent.controller.scheduler import Scheduler, AdaptiveBackoff, QueueNotificationSource
+from gmail_mcp_agent.controller.send_queue import SendQueue
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from tests.fake_gmail import FakeGmailService
+from tests.fake_ollama import FakeOllamaServer
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+
+
+def sent_subject(sent) -> str:
+    return email.message_from_bytes(base64.urlsafe_b64decode(sent['body']['raw']))['subject']
+
+
+def run_mode(push: bool, count: int, server: FakeOllamaServer, state_dir: str) -> None:
+    source = QueueNotificationSource() if push else None
+    service = FakeGmailService(on_notify=source.notify if source else None)
+    client = GmailClient(service=service)
+    store = EmailStore(Email)
+    controller = EmailController(
+        model=EmailModel(ollama_agent=OllamaAgent(host=server.host, timeout=30), store=store),
+        gmail_client=client,
+        history_sync=HistorySync(client, state_file=os.path.join(state_dir, f"state-{push}.json")),
+        # Lift the send quota so only scheduling latency is measured
+        send_queue=SendQueue(client, store, quota_units_per_second=1e6)
+    )
+
+    def run_cycle() -> int:
+        controller.fetch_new_emails()
+        controller.process_emails_by_priority()
+        return controller.last_fetch_count
+
+    scheduler = Scheduler(
+        run_cycle,
+        source=source,
+        backoff=AdaptiveBackoff(min_interval=0.2, max_interval=2.0),
+        renew_watch=(lambda: client.watch('projects/bench/topics/gmail')) if push else None
+    )
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    time.sleep(0.1)
+
+    arrivals = {}
+    rng = random.Random(1)
+    for i in range(count):
+        # Bursts separated by idle gaps
+        time.sleep(rng.choice([0.05, 0.05, 0.05, 1.5]))
+        arrivals[f"Re: Question {i}"] = time.time()
+        service.add_message(f"sender{i}@example.com", f"Question {i}", "Can you take a look at this?")
+
+    deadline = time.time() + 10
+    while len(service.sent) < count and time.time() < deadline:
+        time.sleep(0.05)
+    scheduler.stop()
+    thread.join()
+
+    latencies = sorted(s['sent_at'] - arrivals[sent_subject(s)] for s in service.sent)
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{'push' if push else 'poll':4} replies={len(latencies)} cycles={scheduler.cycles} "
+          f"api_round_trips={service.stats['round_trips']} p50={p50 * 1000:.0f}ms p95={p95 * 1000:.0f}ms "
+          f"max={latencies[-1] * 1000:.0f}ms")
+
+
+def run(count: int = 30) -> None:
+    with FakeOllamaServer(latency=0.02) as server, tempfile.TemporaryDirectory() as state_dir:
+        for push in (False, True):
+            run_mode(push, count, server, state_dir)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
@@ -0,0 +1,75 @@
+"""Send throughput and duplicate replies under injected throttling.
+
+Usage: python -m benchmarks.bench_send_queue [reply_count]
+"""
+import sys
+import time
+from collections import Counter
+
+from gmail_mcp_agent.controller.send_queue import SendQueue
+from gmail_mcp_agent.model.email_model import Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from tests.fake_gmail import FakeGmailService
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+
+# The fake allows this many sends per second, standing in for the per-user quota
+SENDS_PER_SECOND = 40
+
+
+def make_replies(count: int):
+    return [{'email_id': f"msg-{i}", 'to': f"sender{i}@example.com",
+             'subject': f"Re: Subject {i}", 'body': "Thank you for your email."} for i in range(count)]
+
+
+def make_service(**kwargs) -> FakeGmailService:
+    return FakeGmailService(latency=0.05, send_rate_limit=SENDS_PER_SECOND, seed=3, **kwargs)
+
+
+def sequential(service: FakeGmailService, replies) -> dict:
+    """The original loop: one send at a time, and the first error aborts the batch."""
+    client = GmailClient(service=service)
+    sent = 0
+    try:
+        for reply in replies:
+            client.send_email(reply['to'], reply['subject'], reply['body'])
+            sent += 1
+    except Exception as e:
+        return {'sent': sent, 'aborted': str(e)}
+    return {'sent': sent, 'aborted': None}
+
+
+def queued(service: FakeGmailService, replies, workers: int) -> dict:
+    queue = SendQueue(GmailClient(service=service), EmailStore(Email), workers=workers,
+                      quota_units_per_second=SENDS_PER_SECOND * SendQueue.SEND_QUOTA_UNITS,
+                      base_delay=0.05, max_delay=1.0)
+    results = list(queue.send_all(replies))
+    # Replaying the batch must not send anything again
+    list(queue.send_all(replies))
+    queue.close()
+    return {'sent': sum(r['sent'] for r in results), 'aborted': None, 'retries': queue.retries}
+
+
+def run(count: int = 200) -> None:
+    replies = make_replies(count)
+    scenarios = [
+        ('sequential, clean', lambda s: sequential(s, replies), {}),
+        ('sequential, 5% 503s', lambda s: sequential(s, replies), {'send_error_rate': 0.05}),
+        ('queue x1, clean', lambda s: queued(s, replies, 1), {}),
+        ('queue x8, clean', lambda s: queued(s, replies, 8), {}),
+        ('queue x8, 5% 503s + 5% lost', lambda s: queued(s, replies, 8),
+         {'send_error_rate': 0.05, 'lost_response_rate': 0.05}),
+    ]
+    for name, send, faults in scenarios:
+        service = make_service(**faults)
+        start = time.perf_counter()
+        result = send(service)
+        elapsed = time.perf_counter() - start
+        # Only queued sends carry a Message-ID to detect duplicates by
+        duplicates = sum(n - 1 for n in Counter(s['message_id'] for s in service.sent if s['message_id']).values() if n > 1)
+        print(f"{name:30} sent={result['sent']:4}/{count} retries={result.get('retries', 0):3} "
+              f"duplicates={duplicates} throughput={result['sent'] / elapsed:6.1f}/s"
+              + (f" aborted: {result['aborted']}" if result['aborted'] else ""))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,35 @@
+"""Compare the two-call analyze+draft path with the single JSON generation.
+
+Usage: python -m benchmarks.bench_single_call [email_count]
+"""
+import sys
+import time
+
+from benchmarks.bench_analysis_pipeline import make_emails
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from tests.fake_ollama import FakeOllamaServer
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+
+
+def run(count: int = 20) -> None:
+    for single_call in (False, True):
+        with FakeOllamaServer(latency=0.02, token_latency=0.0005) as server:
+            agent = OllamaAgent(host=server.host, timeout=30)
+            model = EmailModel(ollama_agent=agent, analysis_workers=1, single_call=single_call,
+                               store=EmailStore(Email))
+            latencies = []
+            for email_data in make_emails(count):
+                start = time.perf_counter()
+                model.add_email(email_data)
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            name = 'one-call' if single_call else 'two-call'
+            print(f"{name}: calls={server.requests} prompt_tokens={server.prompt_tokens} "
+                  f"eval_tokens={server.eval_tokens} "
+                  f"p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+                  f"max={latencies[-1] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
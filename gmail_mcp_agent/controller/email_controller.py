@@ -1,84 +1,219 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from gmail_mcp_agent.model.email_model import EmailModel, Email
 from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+from gmail_mcp_agent.controller.send_queue import SendQueue
+from gmail_mcp_agent.utils.metrics import metrics
+import os
 from datetime import datetime
 
 class EmailController:
-    def __init__(self):
-        self.model = EmailModel()
-        self.gmail_client = GmailClient()
+    def __init__(self, model: Optional[EmailModel] = None, gmail_client: Optional[GmailClient] = None,
+                 history_sync: Optional[HistorySync] = None, send_queue: Optional[SendQueue] = None):
+        self.model = model or EmailModel()
+        self.gmail_client = gmail_client or GmailClient()
+        self.history_sync = history_sync or HistorySync(self.gmail_client)
+        self.send_queue = send_queue or SendQueue(
+            self.gmail_client,
+            self.model.store,
+            workers=int(os.getenv('GMAIL_SEND_WORKERS', '4'))
+        )
         self.start_time = datetime.now()
+        self.last_fetch_count = 0
+        metrics.gauge('email_backlog', self.model.store.count_unprocessed)
+        metrics.gauge('analysis_queue_depth', lambda: self.model.scheduler.pending)
+        metrics.gauge('send_queue_depth', lambda: self.send_queue.pending)
     
+    @metrics.timed('controller_call_seconds', call='fetch_new_emails')
     def fetch_new_emails(self) -> List[Email]:
-        """Fetch new unread emails from Gmail."""
-        unread_emails = self.gmail_client.get_unread_emails()
+        """Fetch unread emails added to Gmail since the last sync."""
+        return list(self.stream_new_emails())
+    
+    def stream_new_emails(self) -> Iterator[Email]:
+        """Fetch new emails, yielding each one as soon as it has been analyzed."""
+        # Reload the model in the background while Gmail is synced
+        self.model.keep_warm()
+        self.model.compact()
+        with metrics.timer('pipeline_stage_seconds', stage='sync'):
+            sync_result = self.history_sync.sync(since=self.start_time)
+        metrics.inc('emails_synced_total', len(sync_result['emails']))
         new_emails = []
         
-        for email_data in unread_emails:
+        for email_data in sync_result['emails']:
             # Add received_at timestamp if not present
             if 'received_at' not in email_data:
                 email_data['received_at'] = datetime.now()
             
-            # Only process emails received after script start
-            if email_data['received_at'] > self.start_time:
-                email = self.model.add_email(email_data)
-                new_emails.append(email)
+            # A full resync lists the UNREAD label, so only pick up emails
+            # received after script start
+            if sync_result['full_resync'] and email_data['received_at'] <= self.start_time:
+                continue
+            
+            if self.model.get_email(email_data['id']) is None:
+                new_emails.append(email_data)
         
-        return new_emails
+        # Only the latest email of each thread is analyzed, so only its body is fetched
+        threads: Dict[str, Dict[str, Any]] = {}
+        for email_data in new_emails:
+            thread_id = email_data.get('thread_id') or email_data['id']
+            latest = threads.get(thread_id)
+            if latest is None or email_data['received_at'] >= latest['received_at']:
+                threads[thread_id] = email_data
+        with metrics.timer('pipeline_stage_seconds', stage='bodies'):
+            self.gmail_client.fetch_bodies(list(threads.values()))
+        
+        self.last_fetch_count = len(new_emails)
+        yield from self.model.add_emails(new_emails)
+        # Only now that every new email is stored may the sync move past them
+        self.history_sync.commit()
     
     def process_email(self, email: Email) -> Dict[str, Any]:
         """Process an email and generate a response."""
-        # Use the email's category for response template
-        response_template = self.model.get_response_template(email.category)
+        return next(self.send_replies([email]))
+    
+    def _build_reply(self, email: Email) -> Dict[str, Any]:
+        """Build the reply to send for an email from its drafted response."""
+        # Fall back to the category's template for emails without a draft
+        template = self.model.get_response_template(email.category)
+        response_template = email.response_template or template
         
         # Extract email address from sender string (e.g., "John Doe <john@example.com>")
         sender_email = email.sender.split('<')[-1].strip('>')
         
-        # Customize response based on email category
-        if email.category == "urgent":
-            response_template = f"URGENT: {response_template}"
-        elif email.category == "meeting":
-            response_template = f"RE: Meeting: {response_template}"
-        
-        # Send response
-        response = self.gmail_client.send_email(
-            to=sender_email,
-            subject=f"Re: {email.subject}",
-            body=response_template
-        )
+        # Customize template responses based on category; drafted replies are sent as written
+        if response_template == template:
+            if email.category == "urgent":
+                response_template = f"URGENT: {response_template}"
+            elif email.category == "meeting":
+                response_template = f"RE: Meeting: {response_template}"
+        
+        # Keep the thread's subject, which mail clients also thread by
+        subject = email.subject if email.subject.lower().startswith('re:') else f"Re: {email.subject}"
+        
+        return {
+            'email_id': email.id,
+            'thread_id': email.thread_id,
+            'to': sender_email,
+            'subject': subject,
+            'body': response_template,
+            'in_reply_to': email.message_id or None,
+            'references': ' '.join(filter(None, (email.reference_ids, email.message_id))) or None
+        }
+    
+    def send_replies(self, emails: List[Email]) -> Iterator[Dict[str, Any]]:
+        """Send replies to emails through the send queue, yielding results as they complete.
+        
+        Emails of the same thread get a single reply, to the latest one, in
+        the order their threads first appear. Emails are marked as processed
+        only once their reply is sent; failed ones stay unprocessed and are
+        retried on the next cycle. Threads from no-reply senders get none.
+        """
+        threads: Dict[str, List[Email]] = {}
+        for email in emails:
+            threads.setdefault(email.thread_id, []).append(email)
+        latest_emails = [max(members, key=lambda email: email.received_at) for members in threads.values()]
+        latest_emails = [email for email in latest_emails if not self._skip_reply(email, threads[email.thread_id])]
+        emails_by_id = {email.id: email for email in latest_emails}
+        
+        for send_result in self.send_queue.send_all([self._build_reply(email) for email in latest_emails]):
+            email = emails_by_id[send_result['email_id']]
+            yield self._finish_reply(email, threads[email.thread_id], send_result)
+    
+    def reply_as_analyzed(self, emails: Iterable[Email]) -> Iterator[Dict[str, Any]]:
+        """Reply to emails while they are still being analyzed, e.g. from ``stream_new_emails``.
+        
+        A thread's reply is queued as soon as its latest email arrives, so
+        urgent emails analyzed first are answered without waiting for the
+        rest of the batch. Threads from no-reply senders get none. Yields
+        results as they complete.
+        """
+        threads: Dict[str, List[Email]] = {}
+        emails_by_id: Dict[str, Email] = {}
         
-        # Mark email as processed
-        self.model.mark_as_processed(email.id)
+        def replies():
+            for email in emails:
+                threads.setdefault(email.thread_id, []).append(email)
+                # Earlier emails of a thread arrive first, carrying the id of the latest
+                if 'thread_latest' not in email.ai_analysis and not self._skip_reply(
+                        email, threads[email.thread_id]):
+                    emails_by_id[email.id] = email
+                    yield self._build_reply(email)
+        
+        for send_result in self.send_queue.send_all(replies()):
+            email = emails_by_id[send_result['email_id']]
+            yield self._finish_reply(email, threads[email.thread_id], send_result)
+    
+    def _skip_reply(self, email: Email, members: List[Email]) -> bool:
+        """Skip replying to a thread whose latest email comes from a no-reply sender.
+        
+        Its emails are marked processed, except those requiring attention,
+        which stay listed for the user.
+        """
+        if not self.model.rule_classifier.is_no_reply(email.sender):
+            return False
+        metrics.inc('replies_skipped_total', reason='no_reply')
+        for member in members:
+            if not member.requires_attention:
+                self.model.mark_as_processed(member.id)
+        return True
+    
+    def _finish_reply(self, email: Email, members: List[Email], send_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Mark a thread's emails processed once its reply is sent, and describe the result."""
+        if send_result['sent']:
+            # Mark the thread's emails as processed
+            for member in members:
+                self.model.mark_as_processed(member.id)
+                if metrics.enabled and not send_result['duplicate']:
+                    metrics.observe('reply_latency_seconds',
+                                    (datetime.now() - member.received_at).total_seconds(),
+                                    category=member.category)
+        else:
+            print(f"Error sending reply to email {email.id}: {send_result['error']}")
         
         return {
             'email_id': email.id,
-            'response_sent': True,
+            'thread_id': email.thread_id,
+            'thread_size': len(members),
+            'response_sent': send_result['sent'],
             'template_used': email.category,
             'priority': email.priority,
-            'requires_attention': email.requires_attention
+            'requires_attention': email.requires_attention,
+            'attempts': send_result['attempts'],
+            'error': send_result['error']
         }
     
     def get_processing_status(self) -> Dict[str, Any]:
         """Get the current processing status."""
-        unprocessed = self.model.get_unprocessed_emails()
-        attention_required = self.model.get_emails_requiring_attention()
+        summary = self.model.get_summary()
+        cache = self.model.ollama_agent.cache
+        
+        total = self.model.count_emails()
         
         return {
-            'total_emails': len(self.model.emails),
-            'unprocessed_count': len(unprocessed),
-            'processed_count': len(self.model.emails) - len(unprocessed),
-            'attention_required': len(attention_required),
+            'total_emails': total,
+            'unprocessed_count': summary['unprocessed'],
+            'processed_count': total - summary['unprocessed'],
+            'attention_required': summary['attention_required'],
             'start_time': self.start_time.isoformat(),
-            'last_check_time': self.model.last_check_time.isoformat()
+            'last_check_time': self.model.last_check_time.isoformat(),
+            'analysis_cache': cache.stats() if cache is not None else None,
+            'rule_classifier': self.model.rule_classifier.stats(),
+            'embedding_classifier': (self.model.embedding_classifier.stats()
+                                     if self.model.embedding_classifier is not None else None)
         }
     
+    @metrics.timed('controller_call_seconds', call='process_emails_by_priority')
     def process_emails_by_priority(self) -> List[Dict[str, Any]]:
-        """Process emails in order of priority."""
-        results = []
-        priority_emails = self.model.get_emails_by_priority()
+        """Process emails in order of priority.
         
-        for email in priority_emails:
-            result = self.process_email(email)
-            results.append(result)
+        Replies are queued highest priority first and sent concurrently.
+        """
+        return list(self.send_replies(self.model.get_emails_by_priority()))
+    
+    def close(self, cancel: bool = False) -> None:
+        """Finish in-flight sends and save model state.
         
-        return results 
\ No newline at end of file
+        With ``cancel``, queued sends and LLM jobs are dropped instead of run.
+        """
+        self.send_queue.close(cancel=cancel)
+        self.model.close(cancel=cancel) 
\ No newline at end of file
@@ -0,0 +1,187 @@
+import base64
+import hmac
+import json
+import queue
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+class NotificationSource:
+    """Source of Gmail push notifications for the scheduler."""
+
+    def wait(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Block until a notification arrives or ``timeout`` seconds pass."""
+        raise NotImplementedError
+
+    def wake(self) -> None:
+        """Unblock a pending ``wait`` call, e.g. on shutdown."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class QueueNotificationSource(NotificationSource):
+    """In-process notification source; call ``notify`` to deliver one."""
+
+    def __init__(self):
+        self.queue: queue.Queue = queue.Queue()
+
+    def notify(self, notification: Optional[Dict[str, Any]] = None) -> None:
+        self.queue.put(notification or {})
+
+    def wait(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            notification = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        # Several notifications queued up during a cycle only need one more cycle
+        while True:
+            try:
+                notification = self.queue.get_nowait() or notification
+            except queue.Empty:
+                return notification
+
+    def wake(self) -> None:
+        self.queue.put({})
+
+
+class HttpNotificationSource(QueueNotificationSource):
+    """Receive Cloud Pub/Sub push deliveries of Gmail watch notifications.
+
+    Pub/Sub only pushes to public HTTPS endpoints, so the server runs behind
+    a TLS-terminating proxy that forwards to ``http://<host>:<port>/``. With
+    a ``token``, deliveries must carry it as the ``token`` query parameter of
+    the subscription's endpoint, e.g. ``https://<proxy>/?token=<token>``.
+    """
+
+    def __init__(self, port: int = 8085, host: str = '127.0.0.1', token: Optional[str] = None):
+        super().__init__()
+        self.token = token
+        from http.server import ThreadingHTTPServer
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        from http.server import BaseHTTPRequestHandler
+        source = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if source.token is not None:
+                    token = parse_qs(urlsplit(self.path).query).get('token', [''])[0]
+                    if not hmac.compare_digest(token.encode(), source.token.encode()):
+                        self.send_response(403)
+                        self.end_headers()
+                        return
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    envelope = json.loads(self.rfile.read(length) or b'{}')
+                    data = envelope.get('message', {}).get('data', '')
+                    notification = json.loads(base64.b64decode(data)) if data else {}
+                except (ValueError, TypeError) as e:
+                    print(f"Error decoding push notification: {e}")
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                source.notify(notification)
+                # Any 2xx acknowledges the Pub/Sub message
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class AdaptiveBackoff:
+    """Polling interval that tightens while mail flows and backs off when idle."""
+
+    def __init__(self, min_interval: float = 10.0, max_interval: float = 300.0, factor: float = 2.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.interval = min_interval
+
+    def record(self, new_emails: int) -> float:
+        """Update the interval after a cycle that found ``new_emails`` and return it."""
+        if new_emails:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.factor)
+        return self.interval
+
+
+class Scheduler:
+    """Run processing cycles when mail arrives.
+
+    With a notification source, cycles run as soon as a push notification
+    arrives and the adaptive poll only guards against missed notifications.
+    Without one, the adaptive poll drives every cycle. ``stop`` lets the
+    running cycle finish before ``run`` returns.
+    """
+
+    # Renew the Gmail watch this long before it expires
+    WATCH_RENEW_MARGIN = 3600
+
+    def __init__(self, run_cycle: Callable[[], int], source: Optional[NotificationSource] = None,
+                 backoff: Optional[AdaptiveBackoff] = None,
+                 renew_watch: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.run_cycle = run_cycle
+        self.source = source
+        self.backoff = backoff or AdaptiveBackoff()
+        self.renew_watch = renew_watch
+        self.cycles = 0
+        self._watch_expiration = 0.0
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        """Run cycles until ``stop`` is called."""
+        while not self._stop.is_set():
+            self._ensure_watch()
+            try:
+                new_emails = self.run_cycle()
+            except Exception as e:
+                print(f"Error during processing cycle: {e}")
+                new_emails = 0
+            self.cycles += 1
+            interval = self.backoff.record(new_emails)
+            if self._stop.is_set():
+                break
+
+            if self.source is not None:
+                self.source.wait(interval)
+            else:
+                self._stop.wait(interval)
+
+        if self.source is not None:
+            self.source.close()
+
+    def stop(self) -> None:
+        """Ask the scheduler to stop once the in-flight cycle has finished."""
+        self._stop.set()
+        if self.source is not None:
+            self.source.wake()
+
+    def _ensure_watch(self) -> None:
+        if self.renew_watch is None or time.time() < self._watch_expiration - self.WATCH_RENEW_MARGIN:
+            return
+        try:
+            response = self.renew_watch()
+            self._watch_expiration = int(response['expiration']) / 1000
+        except Exception as e:
+            print(f"Error renewing Gmail watch: {e}")
@@ -0,0 +1,189 @@
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, Optional
+from gmail_mcp_agent.model.email_store import EmailStore
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.metrics import metrics
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate`` tokens per second up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Block until ``tokens`` are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SendQueue:
+    """Send replies concurrently within Gmail's per-user quota.
+
+    Every send takes ``SEND_QUOTA_UNITS`` from a token bucket refilled at the
+    per-user quota rate. Throttling and server errors are retried with
+    exponential backoff and full jitter. Sent replies are recorded in the
+    store so an email is never answered twice. Each reply carries a
+    deterministic Message-ID, so after an ambiguous failure (a 5xx or
+    transport error, where the send may have gone through) the Sent folder
+    is checked before retrying. Attempts are recorded in the store before
+    sending, so a later cycle checks the Sent folder first too.
+    """
+
+    # Quota cost of messages.send and the default per-user quota per second
+    SEND_QUOTA_UNITS = 100
+    USER_QUOTA_UNITS_PER_SECOND = 250
+    RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+    RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+    def __init__(self, gmail_client: GmailClient, store: EmailStore, workers: int = 4,
+                 quota_units_per_second: float = USER_QUOTA_UNITS_PER_SECOND,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 32.0):
+        self.gmail_client = gmail_client
+        self.store = store
+        # A single-send burst keeps any one-second window within the quota
+        self.bucket = TokenBucket(quota_units_per_second, self.SEND_QUOTA_UNITS)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gmail-send')
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def send_all(self, replies: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Send replies, yielding a result for each as it completes.
+        
+        Each reply is a dict with ``email_id``, ``to``, ``subject`` and ``body``,
+        and optionally the ``thread_id`` to reply in and the ``in_reply_to``
+        and ``references`` headers. ``replies`` may be a
+        generator that is still producing: each reply is queued as soon as
+        it is produced.
+        """
+        done: queue.Queue = queue.Queue()
+
+        def feed():
+            count = 0
+            try:
+                for reply in replies:
+                    with self._lock:
+                        self.pending += 1
+                    self._executor.submit(self._send, reply).add_done_callback(
+                        lambda future: (self._finished(future), done.put(future)))
+                    count += 1
+            except Exception as e:
+                done.put(e)
+            done.put(count)
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        received = 0
+        total = None
+        while total is None or received < total:
+            item = done.get()
+            if isinstance(item, Exception):
+                feeder.join()
+                raise item
+            if isinstance(item, int):
+                total = item
+                continue
+            received += 1
+            yield item.result()
+
+    def close(self, cancel: bool = False) -> None:
+        """Finish queued sends, or cancel them when ``cancel`` is set, and release the worker threads."""
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+    def _finished(self, future) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    @metrics.timed('pipeline_stage_seconds', stage='send')
+    def _send(self, reply: Dict[str, Any]) -> Dict[str, Any]:
+        email_id = reply['email_id']
+        result = {'email_id': email_id, 'sent': False, 'duplicate': False, 'attempts': 0, 'error': None}
+
+        with self._lock:
+            if email_id in self._in_flight:
+                result.update(duplicate=True, error='reply already in flight')
+                return result
+            self._in_flight.add(email_id)
+
+        try:
+            sent_id = self.store.get_reply(email_id)
+            if sent_id is not None:
+                result.update(sent=True, duplicate=True, message_id=sent_id)
+                return result
+
+            message_id = f"<reply-{email_id}@gmail-mcp-agent>"
+            # A send attempted by an earlier cycle may have gone through
+            ambiguous = self.store.has_reply_attempt(email_id)
+            if not ambiguous:
+                self.store.record_reply_attempt(email_id)
+            failures = 0
+            while True:
+                try:
+                    if ambiguous:
+                        sent_id = self.gmail_client.find_sent_message(message_id)
+                        if sent_id is not None:
+                            break
+                    self.bucket.acquire(self.SEND_QUOTA_UNITS)
+                    result['attempts'] += 1
+                    response = self.gmail_client.send_email(
+                        to=reply['to'], subject=reply['subject'], body=reply['body'], message_id=message_id,
+                        thread_id=reply.get('thread_id'), in_reply_to=reply.get('in_reply_to'),
+                        references=reply.get('references'))
+                    sent_id = response['id']
+                    break
+                except Exception as e:
+                    # Sent folder lookups fail and are retried like sends
+                    failures += 1
+                    status = self._status(e)
+                    if not self._is_retryable(e, status) or failures > self.max_retries:
+                        metrics.inc('gmail_send_failures_total', status=status)
+                        result['error'] = str(e)
+                        return result
+                    # Throttling rejects the send outright; server and transport errors may not have
+                    ambiguous = ambiguous or status is None or status >= 500
+                    with self._lock:
+                        self.retries += 1
+                    metrics.inc('gmail_send_retries_total', status=status)
+                    time.sleep(self._backoff(failures))
+
+            self.store.record_reply(email_id, sent_id)
+            result.update(sent=True, message_id=sent_id)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.discard(email_id)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _status(self, error: Exception) -> Optional[int]:
+        return getattr(getattr(error, 'resp', None), 'status', None)
+
+    def _is_retryable(self, error: Exception, status: Optional[int]) -> bool:
+        if status is None:
+            # Transport errors (timeouts, dropped connections) have no status
+            return isinstance(error, (OSError, TimeoutError))
+        if status == 403:
+            return any(reason in str(error) for reason in self.RATE_LIMIT_REASONS)
+        return status in self.RETRYABLE_STATUSES
@@ -1,34 +1,107 @@
-import time
+import os
+import signal
+import sys
 from datetime import datetime
+from dotenv import load_dotenv
 from gmail_mcp_agent.presenter.email_presenter import EmailPresenter
+from gmail_mcp_agent.controller.scheduler import Scheduler, AdaptiveBackoff, HttpNotificationSource
+from gmail_mcp_agent.utils.metrics import metrics, MetricsServer
 
 def main():
-    presenter = EmailPresenter()
+    load_dotenv()
+    output_format = os.getenv('PRESENTER_FORMAT', 'text')
+    # In jsonl mode stdout only carries JSON records: diagnostics printed
+    # anywhere else (Gmail, Ollama, sync, sending) go to stderr
+    output = sys.stdout
+    if output_format == 'jsonl':
+        sys.stdout = sys.stderr
+    
+    def emit(text: str) -> None:
+        print(text, file=output, flush=True)
+    
+    presenter = EmailPresenter(output_format=output_format)
     
     print("Gmail MCP Agent Started")
     print(f"Start Time: {datetime.now().isoformat()}")
     print("Press Ctrl+C to exit")
     
-    try:
-        while True:
-            print("\n" + "="*50)
-            print(presenter.display_processing_status())
-            
-            # Process new emails
+    # Metrics are only recorded when they can be read back
+    metrics_port = os.getenv('METRICS_PORT')
+    metrics_file = os.getenv('METRICS_JSON_FILE')
+    metrics_server = None
+    if metrics_port or metrics_file:
+        metrics.enable()
+    if metrics_port:
+        metrics_server = MetricsServer(metrics, port=int(metrics_port))
+        print(f"Serving metrics on {metrics_server.url}")
+    
+    def run_cycle() -> int:
+        if not presenter.jsonl:
+            emit("\n" + "="*50)
+        emit(presenter.display_processing_status())
+        
+        # Process new emails
+        with metrics.timer('cycle_seconds'):
             status_messages = presenter.process_new_emails()
-            for message in status_messages:
-                print(message)
-            
-            # Display email summary
-            print("\n" + presenter.get_email_summary())
-            
-            # Wait for 1 minute before next check
-            print("\nWaiting for 1 minute before next check...")
-            time.sleep(60)
-            
+        for message in status_messages:
+            emit(message)
+        
+        # Display email summary
+        emit(presenter.get_email_summary() if presenter.jsonl else "\n" + presenter.get_email_summary())
+        if metrics_file:
+            metrics.dump_json(metrics_file)
+        return presenter.controller.last_fetch_count
+    
+    # Push mode: Gmail publishes to a Pub/Sub topic whose push subscription
+    # targets the local notification endpoint
+    topic = os.getenv('GMAIL_PUBSUB_TOPIC')
+    source = None
+    renew_watch = None
+    if topic:
+        source = HttpNotificationSource(
+            port=int(os.getenv('GMAIL_PUSH_PORT', '8085')),
+            host=os.getenv('GMAIL_PUSH_HOST', '127.0.0.1'),
+            token=os.getenv('GMAIL_PUSH_TOKEN')
+        )
+        renew_watch = lambda: presenter.controller.gmail_client.watch(topic)
+        print(f"Listening for Gmail push notifications on {source.url}")
+    
+    scheduler = Scheduler(
+        run_cycle,
+        source=source,
+        backoff=AdaptiveBackoff(
+            min_interval=float(os.getenv('POLL_MIN_INTERVAL', '10')),
+            max_interval=float(os.getenv('POLL_MAX_INTERVAL', '300'))
+        ),
+        renew_watch=renew_watch
+    )
+    
+    def shutdown(signum, frame):
+        print("\nShutting down Gmail MCP Agent, finishing in-flight work...")
+        scheduler.stop()
+        # A second Ctrl+C skips queued work: only requests already running are awaited
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+    
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    
+    forced = False
+    try:
+        scheduler.run()
     except KeyboardInterrupt:
-        print("\nShutting down Gmail MCP Agent...")
+        forced = True
+    finally:
+        if topic:
+            try:
+                presenter.controller.gmail_client.stop_watch()
+            except Exception as e:
+                print(f"Error stopping Gmail watch: {e}")
+        presenter.controller.close(cancel=forced)
+        if metrics_file:
+            metrics.dump_json(metrics_file)
+        if metrics_server is not None:
+            metrics_server.close()
         print(f"End Time: {datetime.now().isoformat()}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
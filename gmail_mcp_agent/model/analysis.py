@@ -0,0 +1,76 @@
+from datetime import datetime
+from typing import Any, Optional
+from pydantic import BaseModel, ValidationInfo, field_validator
+
+CATEGORIES = ("urgent", "meeting", "inquiry", "follow_up", "general")
+BOOLEAN_TEXT = {"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}
+
+
+def _strict(info: ValidationInfo) -> bool:
+    return bool(info.context and info.context.get("strict"))
+
+
+class EmailAnalysis(BaseModel):
+    """Structured analysis returned by the model, validated at the LLM boundary.
+
+    Unusable values are replaced by the defaults, unless validated with
+    ``context={'strict': True}``, where they fail validation instead.
+    """
+    category: str = "general"
+    priority: int = 0
+    requires_attention: bool = False
+    intent: str = "unknown"
+    suggested_response: str = "Thank you for your email."
+    reply: str = ""
+
+    @field_validator("category", mode="before")
+    @classmethod
+    def _normalize_category(cls, value: Any, info: ValidationInfo) -> str:
+        category = str(value or "").strip().lower().replace("-", "_").replace(" ", "_")
+        if category in CATEGORIES:
+            return category
+        if _strict(info):
+            raise ValueError(f"unknown category {value!r}")
+        return "general"
+
+    @field_validator("priority", mode="before")
+    @classmethod
+    def _clamp_priority(cls, value: Any, info: ValidationInfo) -> int:
+        try:
+            return min(3, max(0, int(float(value))))
+        except (TypeError, ValueError, OverflowError):
+            # Non-numbers, NaN and infinities
+            if _strict(info):
+                raise ValueError(f"invalid priority {value!r}")
+            return 0
+
+    @field_validator("requires_attention", mode="before")
+    @classmethod
+    def _coerce_bool(cls, value: Any, info: ValidationInfo) -> bool:
+        if isinstance(value, str):
+            if _strict(info) and value.strip().lower() not in BOOLEAN_TEXT:
+                raise ValueError(f"invalid boolean {value!r}")
+            return BOOLEAN_TEXT.get(value.strip().lower(), False)
+        if _strict(info) and not isinstance(value, (bool, int)):
+            raise ValueError(f"invalid boolean {value!r}")
+        return bool(value)
+
+    @field_validator("intent", "suggested_response", "reply", mode="before")
+    @classmethod
+    def _coerce_text(cls, value: Any, info: ValidationInfo) -> str:
+        if _strict(info) and isinstance(value, (dict, list)):
+            raise ValueError(f"invalid text {value!r}")
+        return "" if value is None else str(value).strip()
+
+
+class EmailRecord(BaseModel):
+    """Email data arriving from Gmail, validated once at the API boundary."""
+    id: str
+    thread_id: Optional[str] = None
+    sender: str
+    subject: str
+    snippet: str
+    received_at: Optional[datetime] = None
+    # RFC 822 Message-ID and References headers, which replies are threaded by
+    message_id: Optional[str] = None
+    reference_ids: Optional[str] = None
@@ -1,16 +1,84 @@
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+import json
+import sys
+from typing import Dict, Any, Optional, Union
 from datetime import datetime
 
-class Email(BaseModel):
-    id: str
-    sender: str
-    subject: str
-    snippet: str
-    received_at: datetime
-    is_processed: bool = False
-    category: str = "general"
-    priority: int = 1
-    requires_attention: bool = False
-    intent: Optional[str] = None
-    ai_analysis: Dict[str, Any] = {} 
\ No newline at end of file
+class Email:
+    """Compact in-memory email record.
+
+    Uses ``__slots__`` instead of a per-instance dict, interns the category
+    and intent strings shared by many emails, and keeps the analysis payload
+    as its JSON text until ``ai_analysis`` is first read. Construction does
+    no validation: use ``from_data`` for untrusted input.
+    """
+
+    __slots__ = ('id', 'thread_id', 'subject', 'sender', 'snippet', 'received_at', 'is_processed', 'response_template',
+                 'priority', 'category', 'requires_attention', 'intent', 'message_id', 'reference_ids',
+                 '_analysis', '_analysis_json')
+
+    def __init__(self, id: str, subject: str, sender: str, snippet: str, received_at: Optional[datetime] = None,
+                 is_processed: bool = False, response_template: str = "", priority: int = 0,
+                 category: str = "general", requires_attention: bool = False, intent: Optional[str] = "",
+                 ai_analysis: Union[Dict[str, Any], str, None] = None, thread_id: str = "",
+                 message_id: str = "", reference_ids: str = ""):
+        self.id = id
+        # A message without a thread is a thread of its own
+        self.thread_id = thread_id or id
+        # RFC 822 headers a reply needs to thread in the sender's mail client
+        self.message_id = message_id
+        self.reference_ids = reference_ids
+        self.subject = subject
+        self.sender = sender
+        self.snippet = snippet
+        self.received_at = received_at if received_at is not None else datetime.now()
+        self.is_processed = is_processed
+        self.response_template = response_template
+        self.priority = int(priority)
+        self.category = sys.intern(category)
+        self.requires_attention = requires_attention
+        self.intent = sys.intern(intent or "")
+        # Stored analyses arrive as JSON text and are only parsed when read
+        if isinstance(ai_analysis, str):
+            self._analysis = None
+            self._analysis_json = ai_analysis
+        else:
+            self._analysis = ai_analysis
+            self._analysis_json = None
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> 'Email':
+        """Validate email data from Gmail and build a record from it."""
+        # Imported here so pydantic loads with the first email, not at startup
+        from .analysis import EmailRecord
+        record = EmailRecord.model_validate(data)
+        return cls(record.id, record.subject, record.sender, record.snippet, record.received_at,
+                   thread_id=record.thread_id or "", message_id=record.message_id or "",
+                   reference_ids=record.reference_ids or "")
+
+    @property
+    def ai_analysis(self) -> Dict[str, Any]:
+        if self._analysis is None:
+            self._analysis = json.loads(self._analysis_json) if self._analysis_json else {}
+            self._analysis_json = None
+        return self._analysis
+
+    @ai_analysis.setter
+    def ai_analysis(self, value: Dict[str, Any]) -> None:
+        self._analysis = value
+        self._analysis_json = None
+
+    def analysis_json(self) -> str:
+        """Get the analysis as JSON text, without parsing it if it was never read."""
+        if self._analysis is None:
+            return self._analysis_json or '{}'
+        return json.dumps(self._analysis, default=str)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the email's fields as a plain dict."""
+        data = {field: getattr(self, field) for field in self.__slots__ if not field.startswith('_')}
+        data['ai_analysis'] = self.ai_analysis
+        return data
+
+    def __repr__(self) -> str:
+        return (f"Email(id={self.id!r}, subject={self.subject!r}, category={self.category!r}, "
+                f"priority={self.priority}, is_processed={self.is_processed})")
@@ -1,29 +1,62 @@
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+from typing import List, Dict, Any, Iterator, Optional
 from datetime import datetime
+import os
+import queue
 import re
+import sys
+import time
+from concurrent.futures import CancelledError
 from .email import Email
+from .llm_scheduler import LLMScheduler
+from .rule_classifier import RuleClassifier
+from .email_store import EmailStore
 from ..utils.ollama_agent import OllamaAgent
-
-class Email(BaseModel):
-    id: str
-    subject: str
-    sender: str
-    snippet: str
-    received_at: datetime = datetime.now()
-    is_processed: bool = False
-    response_template: str = ""
-    priority: int = 0
-    category: str = "general"
-    requires_attention: bool = False
-    intent: str = ""
-    ai_analysis: Dict[str, Any] = {}
+from ..utils.analysis_cache import AnalysisCache
+from ..utils.metrics import metrics
 
 class EmailModel:
-    def __init__(self):
-        self.emails: List[Email] = []
+    # Earlier messages of a thread passed to the LLM with its latest message, and their length
+    THREAD_CONTEXT_MESSAGES = 3
+    THREAD_CONTEXT_CHARS = 200
+    # Threads with this many new messages in one sync are scheduled a priority higher
+    ACTIVE_THREAD_SIZE = 3
+    
+    def __init__(self, ollama_agent: Optional[OllamaAgent] = None, analysis_workers: Optional[int] = None,
+                 single_call: Optional[bool] = None, store: Optional[EmailStore] = None, embedding_classifier=None,
+                 scheduler: Optional[LLMScheduler] = None):
+        self.store = store or EmailStore(
+            Email,
+            path=os.getenv('EMAIL_STORE_FILE', 'emails.sqlite3'),
+            retention_days=float(os.getenv('EMAIL_RETENTION_DAYS', '30'))
+        )
         self.last_check_time: datetime = datetime.now()
-        self.ollama_agent = OllamaAgent(model_name="gemma3:4b")
+        self.ollama_agent = ollama_agent or OllamaAgent(
+            model_name="gemma3:4b",
+            timeout=float(os.getenv('OLLAMA_TIMEOUT', '120')),
+            cache=AnalysisCache(
+                path=os.getenv('ANALYSIS_CACHE_FILE', 'analysis_cache.sqlite3'),
+                max_entries=int(os.getenv('ANALYSIS_CACHE_SIZE', '5000'))
+            )
+        )
+        # Analyze and draft the reply in one generation instead of two; with
+        # OLLAMA_SINGLE_CALL=0 the reply gets its own, streamed generation
+        if single_call is None:
+            single_call = os.getenv('OLLAMA_SINGLE_CALL', '1').lower() not in ('0', 'false', 'no')
+        self.single_call = single_call
+        # Emails close to ones the LLM already labelled are classified from their
+        # neighbors; NumPy is only imported when this is configured
+        if embedding_classifier is None and os.getenv('EMBEDDING_MODEL'):
+            from .embedding_classifier import EmbeddingClassifier
+            embedding_classifier = EmbeddingClassifier.from_env(self.ollama_agent)
+        self.embedding_classifier = embedding_classifier
+        # Earlier messages of a thread, compacted, keyed by the id of its latest message
+        self._thread_context: Dict[str, str] = {}
+        # Extracted bodies of emails awaiting analysis, which is all they are kept for
+        self._bodies: Dict[str, str] = {}
+        # LLM work runs by estimated priority and deadline instead of arrival order
+        self.scheduler = scheduler or LLMScheduler(
+            workers=analysis_workers or int(os.getenv('OLLAMA_WORKERS', '4'))
+        )
         self.response_templates = {
             "default": "Thank you for your email. I will get back to you soon.",
             "urgent": "I understand this is urgent. I will prioritize your request and respond as soon as possible.",
@@ -39,51 +72,258 @@ class EmailModel:
             "meeting": ["meeting", "schedule", "calendar", "appointment", "call"],
             "follow_up": ["follow up", "follow-up", "reminder", "checking in"]
         }
+        
+        # Obvious emails are classified from keywords and senders without the LLM
+        self.rule_classifier = RuleClassifier(
+            self.category_keywords,
+            threshold=float(os.getenv('RULE_CONFIDENCE_THRESHOLD', '0.75'))
+        )
     
     def add_email(self, email_data: Dict[str, Any]) -> Email:
         """Add a new email to the model."""
-        email = Email(**email_data)
-        # Only process emails received after the last check
-        if email.received_at > self.last_check_time:
-            self.emails.append(email)
-            self._analyze_email(email)
+        # Emails already known to the model are not analyzed again
+        known = self.store.get(email_data['id'])
+        if known is not None:
+            return known
+        
+        email = Email.from_data(email_data)
+        if email_data.get('body'):
+            self._bodies[email.id] = email_data['body']
+        try:
+            if self._analyze_email(email):
+                self._draft_reply(email)
+        finally:
+            self._bodies.pop(email.id, None)
+        self.store.add(email)
         return email
     
-    def _analyze_email(self, email: Email) -> None:
-        """Analyze email content using Ollama."""
-        # Get AI analysis
-        analysis = self.ollama_agent.analyze_email(email.subject, email.snippet)
+    def add_emails(self, emails_data: List[Dict[str, Any]]) -> Iterator[Email]:
+        """Add new emails, analyzing them concurrently.
         
-        # Update email with AI analysis
-        email.category = analysis['category']
-        email.priority = analysis['priority']
-        email.requires_attention = analysis['requires_attention']
-        email.intent = analysis['intent']
-        email.ai_analysis = analysis
+        Emails of the same thread are analyzed once, through the latest one
+        with the earlier ones as context, and share its analysis. Threads are
+        scheduled by a priority estimated from sender, keywords and thread
+        activity. Yields each email as soon as its analysis (and draft)
+        completes.
+        """
+        threads: Dict[str, List[Email]] = {}
+        bodies: Dict[str, str] = {}
+        seen = set()
+        for email_data in emails_data:
+            if email_data['id'] not in seen and email_data['id'] not in self.store:
+                seen.add(email_data['id'])
+                email = Email.from_data(email_data)
+                threads.setdefault(email.thread_id, []).append(email)
+                if email_data.get('body'):
+                    bodies[email.id] = email_data['body']
+        
+        done: queue.Queue = queue.Queue()
+        for members in threads.values():
+            members.sort(key=lambda email: email.received_at)
+            latest = members[-1]
+            if len(members) > 1:
+                self._thread_context[latest.id] = self._compact_thread(members[:-1])
+                metrics.inc('emails_coalesced_total', len(members) - 1)
+            if latest.id in bodies:
+                self._bodies[latest.id] = bodies[latest.id]
+            self._schedule(latest, self.estimate_priority(latest, len(members)), done)
+        
+        # Emails are stored once analyzed; the controller only commits the sync after the
+        # whole batch is stored, so a restart lists the unstored ones again and analyzes them
+        for _ in range(len(threads)):
+            email, error = done.get()
+            if error is not None:
+                print(f"Error analyzing email {email.id}: {error}")
+            self._thread_context.pop(email.id, None)
+            self._bodies.pop(email.id, None)
+            for earlier in threads[email.thread_id][:-1]:
+                self._copy_analysis(email, earlier)
+                self.store.add(earlier)
+                yield earlier
+            self.store.add(email)
+            yield email
+    
+    def get_email(self, email_id: str) -> Optional[Email]:
+        """Get an email by id, or None if it is unknown."""
+        return self.store.get(email_id)
+    
+    def count_emails(self) -> int:
+        """Get the number of stored emails."""
+        return self.store.count()
+    
+    def compact(self) -> int:
+        """Drop processed emails past the retention period."""
+        return self.store.compact()
+    
+    def estimate_priority(self, email: Email, thread_size: int = 1) -> int:
+        """Cheaply estimate an email's priority before it is analyzed."""
+        priority = self.rule_classifier.estimate_priority(email.subject, email.snippet, email.sender)
+        if thread_size >= self.ACTIVE_THREAD_SIZE:
+            priority += 1
+        return min(3, priority)
+    
+    def keep_warm(self) -> None:
+        """Load the Ollama model ahead of the next analysis if it may have been unloaded."""
+        self.ollama_agent.keep_warm()
+    
+    def close(self, cancel: bool = False) -> None:
+        """Finish (or, with ``cancel``, drop) scheduled LLM work and save the embedding index."""
+        self.scheduler.close(cancel=cancel)
+        if self.embedding_classifier is not None:
+            self.embedding_classifier.save()
+    
+    def _schedule(self, email: Email, priority: int, done: queue.Queue) -> None:
+        """Schedule an email's analysis, then its draft, putting ``(email, error)`` on ``done``."""
+        submitted = time.monotonic()
+        deadline = self.scheduler.deadline_for(priority, submitted)
         
-        # Generate response using Ollama
+        def analyzed(future):
+            error = self._error_of(future)
+            if error is not None or not future.result():
+                done.put((email, error))
+                return
+            # Drafting is a job of its own, due by the sooner of the estimated
+            # and the analyzed priority's deadlines
+            draft_deadline = min(deadline, self.scheduler.deadline_for(email.priority, submitted))
+            try:
+                draft = self.scheduler.submit(self._draft_reply, email, priority=email.priority,
+                                              deadline=draft_deadline)
+            except Exception as e:
+                done.put((email, e))
+                return
+            draft.add_done_callback(lambda draft: done.put((email, self._error_of(draft))))
+        
+        self.scheduler.submit(self._analyze_email, email, priority=priority, deadline=deadline) \
+            .add_done_callback(analyzed)
+    
+    @staticmethod
+    def _error_of(future) -> Optional[BaseException]:
+        """Get a finished job's exception, counting a job cancelled on close as failed."""
+        if future.cancelled():
+            return CancelledError()
+        return future.exception()
+    
+    @metrics.timed('pipeline_stage_seconds', stage='analyze')
+    def _analyze_email(self, email: Email) -> bool:
+        """Analyze email content using rules, escalating to Ollama when unsure.
+        
+        Returns whether the reply still has to be drafted with ``_draft_reply``.
+        """
+        analysis = self.rule_classifier.classify(email.subject, email.snippet, email.sender)
+        if analysis is not None:
+            analysis['suggested_response'] = self.get_response_template(analysis['category'])
+            self._apply_analysis(email, analysis)
+            email.response_template = analysis['suggested_response']
+            metrics.inc('emails_analyzed_total', source='rules')
+            return False
+        content = self._content(email)
+        
+        if self.embedding_classifier is not None:
+            analysis = self._classify_by_neighbors(email.subject, content)
+            if analysis is not None:
+                analysis['suggested_response'] = self.get_response_template(analysis['category'])
+                self._apply_analysis(email, analysis)
+                email.response_template = analysis['suggested_response']
+                metrics.inc('emails_analyzed_total', source='embedding')
+                return False
+        metrics.inc('emails_analyzed_total', source='llm')
+        
+        if self.single_call:
+            analysis = self.ollama_agent.analyze_and_draft(email.subject, content)
+            self._apply_analysis(email, analysis)
+            self._learn(email.subject, content, analysis)
+            email.response_template = analysis['reply']
+            return False
+        
+        # Get AI analysis
+        analysis = self.ollama_agent.analyze_email(email.subject, content)
+        self._apply_analysis(email, analysis)
+        self._learn(email.subject, content, analysis)
+        return True
+    
+    @metrics.timed('pipeline_stage_seconds', stage='draft')
+    def _draft_reply(self, email: Email) -> None:
+        """Generate an analyzed email's reply using Ollama."""
         email.response_template = self.ollama_agent.generate_response({
             'category': email.category,
             'priority': email.priority,
             'subject': email.subject,
-            'snippet': email.snippet
+            'snippet': self._content(email)
         })
     
+    def _content(self, email: Email) -> str:
+        """Get the body (or the snippet), followed by the thread's earlier messages when there are any."""
+        content = self._bodies.get(email.id) or email.snippet
+        context = self._thread_context.get(email.id)
+        return f"{content}\n\n{context}" if context else content
+    
+    def _classify_by_neighbors(self, subject: str, content: str) -> Optional[Dict[str, Any]]:
+        """Classify from similar LLM-labelled emails, or None to use the LLM."""
+        try:
+            return self.embedding_classifier.classify(subject, content)
+        except Exception as e:
+            print(f"Error in embedding classification: {e}")
+            return None
+    
+    def _learn(self, subject: str, content: str, analysis: Dict[str, Any]) -> None:
+        """Add an LLM analysis to the embedding index, unless it is the fallback."""
+        if self.embedding_classifier is None or analysis.get('intent') == 'unknown':
+            return
+        try:
+            self.embedding_classifier.learn(subject, content, analysis)
+        except Exception as e:
+            print(f"Error adding email to the vector index: {e}")
+    
+    def _apply_analysis(self, email: Email, analysis: Dict[str, Any]) -> None:
+        """Update email with AI analysis."""
+        email.category = sys.intern(analysis['category'])
+        email.priority = int(analysis['priority'])
+        email.requires_attention = analysis['requires_attention']
+        email.intent = sys.intern(analysis['intent'] or '')
+        email.ai_analysis = analysis
+    
+    def _copy_analysis(self, source: Email, target: Email) -> None:
+        """Give an earlier message of a thread the analysis of its latest one."""
+        target.category = source.category
+        target.priority = source.priority
+        target.requires_attention = source.requires_attention
+        target.intent = source.intent
+        target.response_template = source.response_template
+        target.ai_analysis = dict(source.ai_analysis, thread_latest=source.id)
+    
+    def _compact_thread(self, earlier: List[Email]) -> str:
+        """Summarize a thread's earlier messages as short quoted lines, oldest first."""
+        lines = ["Earlier in this thread:"]
+        skipped = len(earlier) - self.THREAD_CONTEXT_MESSAGES
+        if skipped > 0:
+            lines.append(f"({skipped} earlier messages omitted)")
+        for email in earlier[-self.THREAD_CONTEXT_MESSAGES:]:
+            name = email.sender.split('<')[0].strip().strip('"') or email.sender
+            text = ' '.join(email.snippet.split())
+            if len(text) > self.THREAD_CONTEXT_CHARS:
+                text = text[:self.THREAD_CONTEXT_CHARS].rsplit(' ', 1)[0] + '...'
+            lines.append(f"- {name}: {text}")
+        return "\n".join(lines)
+    
     def get_unprocessed_emails(self) -> List[Email]:
         """Get all unprocessed emails."""
-        return [email for email in self.emails if not email.is_processed]
+        return self.store.get_unprocessed()
     
     def get_emails_by_priority(self) -> List[Email]:
         """Get unprocessed emails sorted by priority."""
-        unprocessed = self.get_unprocessed_emails()
-        return sorted(unprocessed, key=lambda x: x.priority, reverse=True)
+        return self.store.get_by_priority()
+    
+    def get_summary(self) -> Dict[str, Any]:
+        """Get unprocessed email counts per category and priority."""
+        return self.store.summary()
+    
+    def get_top_emails(self, category: str, limit: int, offset: int = 0) -> List[Email]:
+        """Get one page of a category's unprocessed emails, highest priority first."""
+        return self.store.get_top(category, limit, offset)
     
     def mark_as_processed(self, email_id: str) -> None:
         """Mark an email as processed."""
-        for email in self.emails:
-            if email.id == email_id:
-                email.is_processed = True
-                break
+        self.store.mark_as_processed(email_id)
     
     def get_response_template(self, template_type: str = "default") -> str:
         """Get a response template based on type."""
@@ -95,5 +335,4 @@ class EmailModel:
     
     def get_emails_requiring_attention(self) -> List[Email]:
         """Get emails that require immediate attention."""
-        return [email for email in self.emails 
-                if email.requires_attention and not email.is_processed] 
\ No newline at end of file
+        return self.store.get_requiring_attention() 
\ No newline at end of file
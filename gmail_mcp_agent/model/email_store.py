@@ -0,0 +1,274 @@
+import bisect
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, Type
+
+COLUMNS = ('id', 'subject', 'sender', 'snippet', 'received_at', 'is_processed', 'response_template',
+           'priority', 'category', 'requires_attention', 'intent', 'ai_analysis', 'thread_id', 'message_id',
+           'reference_ids')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    id TEXT PRIMARY KEY,
+    subject TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    snippet TEXT NOT NULL,
+    received_at TEXT NOT NULL,
+    is_processed INTEGER NOT NULL DEFAULT 0,
+    response_template TEXT NOT NULL DEFAULT '',
+    priority INTEGER NOT NULL DEFAULT 0,
+    category TEXT NOT NULL DEFAULT 'general',
+    requires_attention INTEGER NOT NULL DEFAULT 0,
+    intent TEXT NOT NULL DEFAULT '',
+    ai_analysis TEXT NOT NULL DEFAULT '{}',
+    processed_at REAL,
+    thread_id TEXT NOT NULL DEFAULT '',
+    message_id TEXT NOT NULL DEFAULT '',
+    reference_ids TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_emails_processed_priority ON emails (is_processed, priority);
+CREATE INDEX IF NOT EXISTS idx_emails_category_priority ON emails (category, priority);
+CREATE INDEX IF NOT EXISTS idx_emails_processed_at ON emails (processed_at);
+CREATE TABLE IF NOT EXISTS replies (
+    email_id TEXT PRIMARY KEY,
+    message_id TEXT,
+    sent_at REAL NOT NULL
+);
+"""
+
+
+class EmailStore:
+    """SQLite-backed email storage.
+
+    Only unprocessed emails are kept in memory, indexed by id; processed
+    emails live on disk until compaction removes them after
+    ``retention_days``. Priority orderings of the unprocessed emails (overall,
+    per category and of those requiring attention) and per-category counts
+    are kept up to date as emails change, so reads never sort or rescan the
+    backlog. Reply markers outlive compaction so a reply is never sent twice;
+    a marker without a message id records a send attempt whose outcome is
+    unknown.
+    """
+
+    COMPACT_INTERVAL = 3600
+
+    def __init__(self, email_class: Type, path: str = ':memory:', retention_days: Optional[float] = 30):
+        self.email_class = email_class
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # WAL keeps each per-email commit cheap without risking corruption
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._migrate()
+        self._unprocessed: Dict[str, Any] = {}
+        # Sorted (-priority, received_at, id) entries: all unprocessed emails, those requiring
+        # attention and each category's; plus counts per (category, priority)
+        self._ordered: List[tuple] = []
+        self._attention: List[tuple] = []
+        self._categories: Dict[str, List[tuple]] = {}
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._placements: Dict[str, tuple] = {}
+        self._total = self._db.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+        self._last_compaction = 0.0
+        for row in self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM emails WHERE is_processed = 0"):
+            self._track(self._from_row(row))
+
+    def __contains__(self, email_id: str) -> bool:
+        with self._lock:
+            if email_id in self._unprocessed:
+                return True
+            return self._db.execute("SELECT 1 FROM emails WHERE id = ?", (email_id,)).fetchone() is not None
+
+    def get(self, email_id: str) -> Optional[Any]:
+        """Get an email by id, or None if it is unknown."""
+        with self._lock:
+            email = self._unprocessed.get(email_id)
+            if email is not None:
+                return email
+            row = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM emails WHERE id = ?", (email_id,)).fetchone()
+            return self._from_row(row) if row else None
+
+    def add(self, email: Any) -> None:
+        """Store a new email."""
+        with self._lock, self._db:
+            inserted = self._db.execute(
+                f"INSERT OR IGNORE INTO emails ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                self._to_row(email)
+            ).rowcount
+            self._total += inserted
+            if inserted and not email.is_processed:
+                self._track(email)
+
+    def save(self, email: Any) -> None:
+        """Persist changes to an email, such as its analysis."""
+        with self._lock, self._db:
+            self._db.execute(
+                f"UPDATE emails SET {', '.join(f'{c} = ?' for c in COLUMNS[1:])} WHERE id = ?",
+                self._to_row(email)[1:] + (email.id,)
+            )
+            if not email.is_processed:
+                self._track(email)
+
+    def mark_as_processed(self, email_id: str) -> None:
+        with self._lock, self._db:
+            email = self._unprocessed.pop(email_id, None)
+            self._unplace(email_id)
+            if email is not None:
+                email.is_processed = True
+            self._db.execute(
+                "UPDATE emails SET is_processed = 1, processed_at = ? WHERE id = ?", (time.time(), email_id))
+
+    def get_unprocessed(self) -> List[Any]:
+        with self._lock:
+            return list(self._unprocessed.values())
+
+    def get_by_priority(self) -> List[Any]:
+        """Get unprocessed emails, highest priority first, oldest first within a priority."""
+        with self._lock:
+            return [self._unprocessed[entry[2]] for entry in self._ordered]
+
+    def get_requiring_attention(self) -> List[Any]:
+        """Get unprocessed emails requiring attention, highest priority first."""
+        with self._lock:
+            return [self._unprocessed[entry[2]] for entry in self._attention]
+
+    def get_top(self, category: str, limit: int, offset: int = 0) -> List[Any]:
+        """Get one page of a category's unprocessed emails, highest priority first."""
+        with self._lock:
+            entries = self._categories.get(category, [])[offset:offset + limit]
+            return [self._unprocessed[entry[2]] for entry in entries]
+
+    def summary(self) -> Dict[str, Any]:
+        """Get unprocessed counts per category and priority, without scanning emails."""
+        with self._lock:
+            categories: Dict[str, Dict[str, Any]] = {}
+            for (category, priority), count in self._counts.items():
+                entry = categories.setdefault(category, {'count': 0, 'by_priority': {}})
+                entry['count'] += count
+                entry['by_priority'][priority] = count
+            return {
+                'unprocessed': len(self._unprocessed),
+                'attention_required': len(self._attention),
+                'categories': categories
+            }
+
+    def get_reply(self, email_id: str) -> Optional[str]:
+        """Get the sent message id of the reply to an email, or None if none was sent."""
+        with self._lock:
+            row = self._db.execute("SELECT message_id FROM replies WHERE email_id = ?", (email_id,)).fetchone()
+            return row[0] if row else None
+
+    def has_reply_attempt(self, email_id: str) -> bool:
+        """Whether a reply to an email was attempted (or sent) before."""
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM replies WHERE email_id = ?", (email_id,)).fetchone() is not None
+
+    def record_reply_attempt(self, email_id: str) -> None:
+        """Record that a reply is about to be sent, before its outcome is known."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO replies (email_id, message_id, sent_at) VALUES (?, NULL, ?)",
+                (email_id, time.time())
+            )
+
+    def record_reply(self, email_id: str, message_id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO replies (email_id, message_id, sent_at) VALUES (?, ?, ?)",
+                (email_id, message_id, time.time())
+            )
+
+    def count(self) -> int:
+        return self._total
+
+    def count_unprocessed(self) -> int:
+        return len(self._unprocessed)
+
+    def compact(self, force: bool = False) -> int:
+        """Delete processed emails older than the retention period.
+
+        Reply markers are kept: a compacted email that Gmail returns again
+        (after a history resync, say) must still not be answered twice.
+        Runs at most once per ``COMPACT_INTERVAL`` seconds unless forced and
+        returns the number of emails removed.
+        """
+        now = time.time()
+        if self.retention_days is None or (not force and now - self._last_compaction < self.COMPACT_INTERVAL):
+            return 0
+        with self._lock, self._db:
+            self._last_compaction = now
+            cutoff = now - self.retention_days * 86400
+            removed = self._db.execute(
+                "DELETE FROM emails WHERE is_processed = 1 AND processed_at < ?", (cutoff,)
+            ).rowcount
+            self._total -= removed
+            return removed
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _migrate(self) -> None:
+        """Add columns introduced after a store file was created."""
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(emails)")}
+        for column in ('thread_id', 'message_id', 'reference_ids'):
+            if column not in columns:
+                with self._db:
+                    self._db.execute(f"ALTER TABLE emails ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+
+    def _track(self, email: Any) -> None:
+        self._unprocessed[email.id] = email
+        self._place(email)
+
+    def _place(self, email: Any) -> None:
+        placement = (email.category, bool(email.requires_attention),
+                     (-email.priority, email.received_at.isoformat(), email.id))
+        if self._placements.get(email.id) == placement:
+            return
+        self._unplace(email.id)
+        category, requires_attention, entry = placement
+        bisect.insort(self._ordered, entry)
+        bisect.insort(self._categories.setdefault(category, []), entry)
+        if requires_attention:
+            bisect.insort(self._attention, entry)
+        key = (category, -entry[0])
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._placements[email.id] = placement
+
+    def _unplace(self, email_id: str) -> None:
+        placement = self._placements.pop(email_id, None)
+        if placement is None:
+            return
+        category, requires_attention, entry = placement
+        del self._ordered[bisect.bisect_left(self._ordered, entry)]
+        if requires_attention:
+            del self._attention[bisect.bisect_left(self._attention, entry)]
+        entries = self._categories[category]
+        del entries[bisect.bisect_left(entries, entry)]
+        if not entries:
+            del self._categories[category]
+        key = (category, -entry[0])
+        self._counts[key] -= 1
+        if not self._counts[key]:
+            del self._counts[key]
+
+    def _to_row(self, email: Any) -> tuple:
+        return (
+            email.id, email.subject, email.sender, email.snippet, email.received_at.isoformat(),
+            int(email.is_processed), email.response_template, email.priority, email.category,
+            int(email.requires_attention), email.intent or '', email.analysis_json(), email.thread_id,
+            email.message_id, email.reference_ids
+        )
+
+    def _from_row(self, row: tuple) -> Any:
+        data = dict(zip(COLUMNS, row))
+        data['received_at'] = datetime.fromisoformat(data['received_at'])
+        data['is_processed'] = bool(data['is_processed'])
+        data['requires_attention'] = bool(data['requires_attention'])
+        return self.email_class(**data)
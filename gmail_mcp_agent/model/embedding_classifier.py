@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+
+import numpy as np
+
+Embedder = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+class VectorIndex:
+    """Unit-length embeddings of labelled emails in one NumPy matrix.
+
+    Cosine similarity against every entry is a single matrix product, for
+    one query or a batch of them. Once ``max_entries`` are stored, new
+    entries overwrite the oldest ones.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self.model = ""
+        self._vectors: Optional[np.ndarray] = None
+        self._labels: List[Dict[str, Any]] = []
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, vector: Sequence[float], label: Dict[str, Any]) -> None:
+        """Store one labelled embedding."""
+        vector = self._normalize(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                if self._vectors is not None:
+                    print(f"Embedding size changed from {self._vectors.shape[1]} to {vector.shape[0]}, "
+                          f"clearing the vector index")
+                self._vectors = np.empty((min(1024, self.max_entries), vector.shape[0]), dtype=np.float32)
+                self._labels, self._size, self._next = [], 0, 0
+            if self._next == len(self._vectors) and len(self._vectors) < self.max_entries:
+                grown = np.empty((min(2 * len(self._vectors), self.max_entries), self._vectors.shape[1]),
+                                 dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+            slot = self._next % len(self._vectors)
+            self._vectors[slot] = vector
+            if slot < len(self._labels):
+                self._labels[slot] = label
+            else:
+                self._labels.append(label)
+            self._next = slot + 1
+            self._size = max(self._size, self._next)
+
+    def search(self, queries: Sequence[Sequence[float]], k: int = 5) -> List[List[Tuple[float, Dict[str, Any]]]]:
+        """Get the ``k`` most similar entries for each query, most similar first."""
+        queries = self._normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        with self._lock:
+            if not self._size or queries.shape[1] != self._vectors.shape[1]:
+                return [[] for _ in queries]
+            similarities = queries @ self._vectors[:self._size].T
+            labels = self._labels
+        k = min(k, similarities.shape[1])
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(similarities, top):
+            ordered = candidates[np.argsort(-row[candidates])]
+            results.append([(float(row[i]), labels[i]) for i in ordered])
+        return results
+
+    def save(self, path: str) -> None:
+        """Write the index to ``path``, replacing it atomically."""
+        with self._lock:
+            vectors = self._vectors[:self._size] if self._vectors is not None else np.empty((0, 0), np.float32)
+            meta = json.dumps({'model': self.model, 'next': self._next, 'labels': self._labels[:self._size]})
+            tmp_file = f"{path}.tmp"
+            with open(tmp_file, 'wb') as f:
+                np.savez(f, vectors=vectors, meta=np.array(meta))
+            os.replace(tmp_file, path)
+
+    def load(self, path: str) -> None:
+        """Replace the contents with an index saved by ``save``."""
+        with np.load(path, allow_pickle=False) as data:
+            vectors = data['vectors']
+            meta = json.loads(str(data['meta']))
+        with self._lock:
+            self.model = meta['model']
+            self._labels = meta['labels']
+            self._size = len(self._labels)
+            self._next = meta['next']
+            self._vectors = None
+            if self._size:
+                self._vectors = np.empty((max(self._size, min(1024, self.max_entries)), vectors.shape[1]),
+                                         dtype=np.float32)
+                self._vectors[:self._size] = vectors
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class HashingEmbedder:
+    """Local embedder that hashes words and word pairs into a fixed-size vector.
+
+    Needs no model and costs microseconds, but only captures shared wording.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"[a-z0-9']+", text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'little')
+                vectors[row, digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        return vectors
+
+
+class EmbeddingClassifier:
+    """Classify emails from their nearest neighbors among LLM-labelled emails.
+
+    Subject and snippet are embedded once. When the closest neighbor is at
+    least ``threshold`` similar and the ``neighbors`` nearest mostly agree,
+    category, priority and attention are taken from them; otherwise the
+    email is left for the LLM, whose labels are then added with ``learn``.
+    The index is saved to ``path`` every ``save_every`` new labels and on
+    ``save``.
+    """
+
+    # Share of the neighbors' similarity that must back the chosen category
+    MIN_AGREEMENT = 0.6
+    # Embeddings of escalated emails kept until the LLM labels them
+    MAX_PENDING = 256
+
+    def __init__(self, embed: Embedder, name: str = "", path: Optional[str] = None, neighbors: int = 5,
+                 threshold: float = 0.85, min_examples: int = 20, save_every: int = 25,
+                 max_entries: int = 20000):
+        self.embed = embed
+        self.name = name or getattr(embed, 'name', '')
+        self.path = path
+        self.neighbors = neighbors
+        self.threshold = threshold
+        self.min_examples = min_examples
+        self.save_every = save_every
+        self.matched = 0
+        self.escalated = 0
+        self.index = VectorIndex(max_entries)
+        self._unsaved = 0
+        self._pending: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                self.index.load(path)
+            except Exception as e:
+                print(f"Error loading vector index, starting empty: {e}")
+            if self.index.model != self.name:
+                # Embeddings from another model are not comparable
+                self.index = VectorIndex(max_entries)
+        self.index.model = self.name
+
+    @classmethod
+    def from_env(cls, ollama_agent: Any, path: Optional[str] = None) -> 'EmbeddingClassifier':
+        """Build the classifier configured by ``EMBEDDING_*`` variables.
+
+        ``EMBEDDING_MODEL=hashing`` uses the local ``HashingEmbedder``; any
+        other value names an Ollama embedding model.
+        """
+        model = os.getenv('EMBEDDING_MODEL', 'hashing')
+        embed = HashingEmbedder() if model == 'hashing' else ollama_agent.embed
+        return cls(
+            embed,
+            name=model if model != 'hashing' else '',
+            path=path or os.getenv('EMBEDDING_INDEX_FILE', 'embedding_index.npz'),
+            neighbors=int(os.getenv('EMBEDDING_NEIGHBORS', '5')),
+            threshold=float(os.getenv('EMBEDDING_THRESHOLD', '0.85'))
+        )
+
+    def classify(self, subject: str, snippet: str) -> Optional[Dict[str, Any]]:
+        """Return an analysis dict from the nearest neighbors, or None to escalate."""
+        text = self._text(subject, snippet)
+        vector = np.asarray(self.embed([text])[0], dtype=np.float32)
+        analysis = None
+        if len(self.index) >= self.min_examples:
+            analysis = self._vote(self.index.search(vector, self.neighbors)[0])
+
+        with self._lock:
+            if analysis is not None:
+                self.matched += 1
+                return analysis
+            self.escalated += 1
+            self._pending[text] = vector
+            while len(self._pending) > self.MAX_PENDING:
+                self._pending.popitem(last=False)
+            return None
+
+    def learn(self, subject: str, snippet: str, analysis: Dict[str, Any]) -> None:
+        """Add an email labelled by the LLM to the index."""
+        text = self._text(subject, snippet)
+        with self._lock:
+            vector = self._pending.pop(text, None)
+        if vector is None:
+            vector = np.asarray(self.embed([text])[0], dtype=np.float32)
+        self.index.add(vector, {
+            'category': analysis['category'],
+            'priority': int(analysis['priority']),
+            'requires_attention': bool(analysis['requires_attention']),
+            'intent': analysis.get('intent') or ''
+        })
+        with self._lock:
+            self._unsaved += 1
+            due = self._unsaved >= self.save_every
+        if due:
+            self.save()
+
+    def save(self) -> None:
+        """Persist labels added since the last save."""
+        with self._lock:
+            if not self.path or not self._unsaved:
+                return
+            self._unsaved = 0
+        try:
+            self.index.save(self.path)
+        except Exception as e:
+            print(f"Error saving vector index: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Get how many emails were classified from neighbors versus escalated."""
+        with self._lock:
+            return {'matched': self.matched, 'escalated': self.escalated, 'indexed': len(self.index)}
+
+    def _vote(self, neighbors: List[Tuple[float, Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        if not neighbors or neighbors[0][0] < self.threshold:
+            return None
+        weights: Dict[str, float] = {}
+        for similarity, label in neighbors:
+            weights[label['category']] = weights.get(label['category'], 0.0) + max(similarity, 0.0)
+        category = max(weights, key=weights.get)
+        agreement = weights[category] / (sum(weights.values()) or 1)
+        if agreement < self.MIN_AGREEMENT:
+            return None
+
+        backing = [(max(similarity, 0.0), label) for similarity, label in neighbors if label['category'] == category]
+        total = sum(weight for weight, _ in backing) or 1
+        return {
+            'category': category,
+            'priority': int(round(sum(weight * label['priority'] for weight, label in backing) / total)),
+            'requires_attention': sum(weight for weight, label in backing if label['requires_attention']) > total / 2,
+            'intent': backing[0][1]['intent'],
+            'confidence': agreement,
+            'similarity': neighbors[0][0],
+            'source': 'embedding'
+        }
+
+    @staticmethod
+    def _text(subject: str, snippet: str) -> str:
+        return f"{subject}\n{snippet}"
@@ -0,0 +1,100 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+from ..utils.metrics import metrics
+
+_STOP = object()
+
+
+class LLMScheduler:
+    """Run LLM jobs on a fixed pool of worker threads, earliest deadline first.
+
+    A job's deadline is its submit time plus the target latency of its
+    priority class (0-3), unless an explicit deadline is given, e.g. when
+    the draft of an analyzed email inherits the email's deadline. Every
+    deadline is a fixed offset from submission, so a waiting job eventually
+    gets ahead of any newly submitted one: low priorities age instead of
+    starving behind a stream of urgent work.
+    """
+
+    # Target seconds from submission to start, per priority class
+    TARGETS = {3: 30.0, 2: 120.0, 1: 600.0, 0: 1800.0}
+
+    def __init__(self, workers: int = 4, targets: Optional[Dict[int, float]] = None):
+        self.workers = max(1, workers)
+        self.targets = dict(targets or self.TARGETS)
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._threads = [threading.Thread(target=self._work, daemon=True, name=f"llm-{i}")
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs queued or running."""
+        with self._condition:
+            return len(self._heap) + self._running
+
+    def deadline_for(self, priority: int, submitted: Optional[float] = None) -> float:
+        """Get the deadline of a job of ``priority`` submitted at ``submitted`` (default now)."""
+        target = self.targets.get(min(3, max(0, int(priority))), self.targets[0])
+        return (time.monotonic() if submitted is None else submitted) + target
+
+    def submit(self, fn: Callable[..., Any], *args: Any, priority: int = 1,
+               deadline: Optional[float] = None) -> Future:
+        """Queue ``fn(*args)`` and return a future for its result."""
+        future: Future = Future()
+        submitted = time.monotonic()
+        deadline = self.deadline_for(priority, submitted) if deadline is None else deadline
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("scheduler is closed")
+            heapq.heappush(self._heap, (deadline, next(self._seq), submitted, priority, future, fn, args))
+            self._condition.notify()
+        return future
+
+    def close(self, cancel: bool = False) -> None:
+        """Finish queued jobs, or cancel them when ``cancel`` is set, and stop the workers.
+
+        Running jobs always finish.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            if cancel:
+                for job in self._heap:
+                    job[4].cancel()
+                self._heap.clear()
+            for _ in self._threads:
+                heapq.heappush(self._heap, (float('inf'), next(self._seq), 0.0, 0, None, _STOP, ()))
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                _, _, submitted, priority, future, fn, args = heapq.heappop(self._heap)
+                if fn is _STOP:
+                    return
+                self._running += 1
+            metrics.observe('llm_queue_wait_seconds', time.monotonic() - submitted, priority=priority)
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args))
+                    except Exception as e:
+                        future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._running -= 1
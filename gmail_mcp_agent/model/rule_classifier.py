@@ -0,0 +1,111 @@
+import re
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+# Automated senders, which nobody reads replies to
+NO_REPLY_SENDER_PATTERN = r'\b(no-?reply|do-?not-?reply|notifications?|mailer-daemon|newsletters?)@'
+
+# (sender pattern, category, priority, confidence)
+DEFAULT_SENDER_RULES: List[Tuple[str, str, int, float]] = [
+    (NO_REPLY_SENDER_PATTERN, 'general', 0, 0.9),
+]
+
+CATEGORY_PRIORITY = {'urgent': 3, 'meeting': 2, 'inquiry': 1, 'follow_up': 1, 'general': 0}
+
+
+class RuleClassifier:
+    """Classify obvious emails from keywords and sender rules without the LLM.
+
+    All category keywords are compiled into a single alternation with one
+    named group per category, so an email is scanned once. Subject matches
+    count double. Confidence is the top category's share of the total score
+    (with one point of doubt added), and results below ``threshold`` are
+    left for the LLM.
+    """
+
+    def __init__(self, category_keywords: Dict[str, List[str]],
+                 sender_rules: Optional[List[Tuple[str, str, int, float]]] = None,
+                 threshold: float = 0.75):
+        self.threshold = threshold
+        self.matched = 0
+        self.escalated = 0
+        self._lock = threading.Lock()
+        self._keyword_pattern = re.compile(
+            "|".join(
+                f"(?P<{category}>{'|'.join(self._keyword_regex(k) for k in sorted(keywords, key=len, reverse=True))})"
+                for category, keywords in category_keywords.items() if keywords
+            ),
+            re.IGNORECASE
+        )
+        self._no_reply_pattern = re.compile(NO_REPLY_SENDER_PATTERN, re.IGNORECASE)
+        self._sender_rules = [
+            (re.compile(pattern, re.IGNORECASE), category, priority, confidence)
+            for pattern, category, priority, confidence in (sender_rules or DEFAULT_SENDER_RULES)
+        ]
+
+    def classify(self, subject: str, snippet: str, sender: str = "") -> Optional[Dict[str, Any]]:
+        """Return an analysis dict for a confident match, or None to escalate."""
+        candidates = [self._classify_keywords(subject, snippet), self._classify_sender(sender)]
+        candidates = [c for c in candidates if c is not None]
+        best = max(candidates, key=lambda c: c['confidence'], default=None)
+
+        with self._lock:
+            if best is not None and best['confidence'] >= self.threshold:
+                self.matched += 1
+                return best
+            self.escalated += 1
+            return None
+
+    def estimate_priority(self, subject: str, snippet: str, sender: str = "") -> int:
+        """Guess a priority (0-3) for scheduling, however weak the evidence.
+        
+        Sender rules win, then the best keyword category; emails with
+        neither get 1.
+        """
+        sender_match = self._classify_sender(sender)
+        if sender_match is not None:
+            return sender_match['priority']
+        keywords = self._classify_keywords(subject, snippet)
+        return keywords['priority'] if keywords is not None else 1
+
+    def is_no_reply(self, sender: str) -> bool:
+        """Whether the sender is an automated address that must not be auto-replied to."""
+        return self._no_reply_pattern.search(sender) is not None
+
+    def stats(self) -> Dict[str, int]:
+        """Get how many emails were classified by rules versus escalated."""
+        with self._lock:
+            return {'matched': self.matched, 'escalated': self.escalated}
+
+    def _classify_keywords(self, subject: str, snippet: str) -> Optional[Dict[str, Any]]:
+        scores: Dict[str, int] = {}
+        for text, weight in ((subject, 2), (snippet, 1)):
+            for match in self._keyword_pattern.finditer(text):
+                scores[match.lastgroup] = scores.get(match.lastgroup, 0) + weight
+        if not scores:
+            return None
+
+        category = max(scores, key=scores.get)
+        confidence = scores[category] / (sum(scores.values()) + 1)
+        return self._analysis(category, CATEGORY_PRIORITY.get(category, 0), confidence,
+                              f"matched {category} keywords")
+
+    def _classify_sender(self, sender: str) -> Optional[Dict[str, Any]]:
+        for pattern, category, priority, confidence in self._sender_rules:
+            if pattern.search(sender):
+                return self._analysis(category, priority, confidence, "automated notification")
+        return None
+
+    def _analysis(self, category: str, priority: int, confidence: float, intent: str) -> Dict[str, Any]:
+        return {
+            'category': category,
+            'priority': priority,
+            'requires_attention': category == 'urgent',
+            'intent': intent,
+            'confidence': confidence,
+            'source': 'rules'
+        }
+
+    @staticmethod
+    def _keyword_regex(keyword: str) -> str:
+        return r'\b' + r'[\s-]+'.join(re.escape(word) for word in re.split(r'[\s-]+', keyword)) + r'\b'
@@ -1,10 +1,26 @@
-from typing import List, Dict, Any
+import json
+import os
+from typing import List, Dict, Any, Optional
 from gmail_mcp_agent.model.email_model import Email
 from gmail_mcp_agent.controller.email_controller import EmailController
 
 class EmailPresenter:
-    def __init__(self):
-        self.controller = EmailController()
+    def __init__(self, controller: Optional[EmailController] = None, top_n: Optional[int] = None,
+                 output_format: Optional[str] = None):
+        self.controller = controller or EmailController()
+        # Emails listed per category and page in the summary
+        self.top_n = top_n or int(os.getenv('SUMMARY_TOP_N', '5'))
+        # 'text' for people, 'jsonl' for one JSON object per line
+        self.output_format = output_format or os.getenv('PRESENTER_FORMAT', 'text')
+        # Changes since the last summary, and what each category showed then
+        self._added: Dict[str, int] = {}
+        self._replied = 0
+        self._failed = 0
+        self._rendered: Dict[str, tuple] = {}
+    
+    @property
+    def jsonl(self) -> bool:
+        return self.output_format == 'jsonl'
     
     def display_email(self, email: Email) -> str:
         """Format email for display."""
@@ -22,9 +38,37 @@ class EmailPresenter:
         AI Analysis: {email.ai_analysis.get('suggested_response', 'No AI analysis available')}
         """
     
+    def email_record(self, email: Email) -> Dict[str, Any]:
+        """Format email as a JSON-serializable record."""
+        return {
+            'id': email.id,
+            'sender': email.sender,
+            'subject': email.subject,
+            'category': email.category,
+            'priority': email.priority,
+            'requires_attention': email.requires_attention,
+            'intent': email.intent,
+            'received_at': email.received_at.isoformat()
+        }
+    
     def display_processing_status(self) -> str:
         """Format processing status for display."""
         status = self.controller.get_processing_status()
+        if self.jsonl:
+            return json.dumps({'event': 'status', **status}, default=str)
+        rules = status['rule_classifier']
+        cache = status['analysis_cache']
+        cache_line = (
+            f"- Analysis Cache: {cache['hits']} hits / {cache['misses']} misses "
+            f"({cache['hit_rate']:.0%} model calls saved)"
+            if cache else "- Analysis Cache: disabled"
+        )
+        neighbors = status['embedding_classifier']
+        neighbors_line = (
+            f"- Nearest Neighbors: {neighbors['matched']} classified / {neighbors['escalated']} sent to LLM "
+            f"({neighbors['indexed']} indexed)"
+            if neighbors else "- Nearest Neighbors: disabled"
+        )
         return f"""
         Email Processing Status:
         - Total Emails: {status['total_emails']}
@@ -33,21 +77,45 @@ class EmailPresenter:
         - Requiring Attention: {status['attention_required']}
         - Start Time: {status['start_time']}
         - Last Check: {status['last_check_time']}
+        - Rule Fast Path: {rules['matched']} classified / {rules['escalated']} sent to LLM
+        {neighbors_line}
+        {cache_line}
         """
     
     def process_new_emails(self) -> List[str]:
         """Process new emails and return status messages."""
-        new_emails = self.controller.fetch_new_emails()
         status_messages = []
+        # Retry replies that failed in earlier cycles, then answer new emails
+        # as their analyses complete, most urgent first
+        results = self.controller.process_emails_by_priority()
+        new_emails = []
         
-        if not new_emails:
-            status_messages.append("No new emails to process.")
-            return status_messages
+        def analyzed():
+            for email in self.controller.stream_new_emails():
+                new_emails.append(email)
+                self._added[email.category] = self._added.get(email.category, 0) + 1
+                yield email
         
-        # Process emails by priority
-        results = self.controller.process_emails_by_priority()
+        results.extend(self.controller.reply_as_analyzed(analyzed()))
+        if not new_emails and not results:
+            if not self.jsonl:
+                status_messages.append("No new emails to process.")
+            return status_messages
         
         for result in results:
+            if result['response_sent']:
+                self._replied += 1
+            else:
+                self._failed += 1
+            if self.jsonl:
+                status_messages.append(json.dumps({'event': 'reply', **result}, default=str))
+                continue
+            if not result['response_sent']:
+                status_messages.append(
+                    f"Failed to send reply (Priority: {result['priority']}, "
+                    f"Category: {result['template_used']}, Error: {result['error']})"
+                )
+                continue
             status_messages.append(
                 f"Processed email (Priority: {result['priority']}, "
                 f"Category: {result['template_used']}, "
@@ -57,25 +125,59 @@ class EmailPresenter:
         
         return status_messages
     
-    def get_email_summary(self) -> str:
-        """Get a summary of all emails."""
-        unprocessed = self.controller.model.get_unprocessed_emails()
-        if not unprocessed:
+    def get_email_summary(self, page: int = 0) -> str:
+        """Get a summary of unprocessed emails.
+        
+        Shows counts per category and priority and one page of the top
+        emails in each category. Categories whose counts and page are
+        unchanged since the last summary collapse to one line, so the cost
+        does not grow with the backlog.
+        """
+        summary = self.controller.model.get_summary()
+        offset = page * self.top_n
+        changes = {'added': sum(self._added.values()), 'replied': self._replied, 'failed': self._failed}
+        self._added, self._replied, self._failed = {}, 0, 0
+        
+        if self.jsonl:
+            lines = [json.dumps({'event': 'summary', 'unprocessed': summary['unprocessed'],
+                                 'attention_required': summary['attention_required'], **changes})]
+        elif not summary['unprocessed']:
+            self._rendered = {}
             return "No unprocessed emails."
-            
-        summary = ["Email Summary:"]
+        else:
+            lines = [f"Email Summary: {summary['unprocessed']} unprocessed "
+                     f"(+{changes['added']} new, {changes['replied']} replied, "
+                     f"{changes['failed']} failed since last summary)"]
         
-        # Group emails by category
-        categories = {}
-        for email in unprocessed:
-            if email.category not in categories:
-                categories[email.category] = []
-            categories[email.category].append(email)
+        # Categories by their most urgent email
+        categories = sorted(summary['categories'].items(), key=lambda item: -max(item[1]['by_priority']))
+        rendered = {}
+        for category, counts in categories:
+            top = self.controller.model.get_top_emails(category, self.top_n, offset)
+            state = (counts['count'], page, tuple(email.id for email in top))
+            rendered[category] = state
+            changed = self._rendered.get(category) != state
+            lines.append(self._format_category(category, counts, top, offset, changed))
+        self._rendered = rendered
         
-        # Display emails by category
-        for category, emails in categories.items():
-            summary.append(f"\n{category.upper()} Emails:")
-            for email in sorted(emails, key=lambda x: x.priority, reverse=True):
-                summary.append(self.display_email(email))
+        return "\n".join(lines)
+    
+    def _format_category(self, category: str, counts: Dict[str, Any], top: List[Email],
+                         offset: int, changed: bool) -> str:
+        """Format one category of the summary."""
+        if self.jsonl:
+            record = {'event': 'category', 'category': category, 'count': counts['count'],
+                      'by_priority': counts['by_priority'], 'offset': offset, 'changed': changed}
+            if changed:
+                record['emails'] = [self.email_record(email) for email in top]
+            return json.dumps(record)
         
-        return "\n".join(summary) 
\ No newline at end of file
+        priorities = ", ".join(f"P{priority}: {count}"
+                               for priority, count in sorted(counts['by_priority'].items(), reverse=True))
+        header = f"\n{category.upper()} Emails: {counts['count']} ({priorities})"
+        if not changed:
+            return f"{header} - unchanged"
+        if not top:
+            return f"{header} - no emails on this page"
+        shown = f" - showing {offset + 1}-{offset + len(top)} of {counts['count']}"
+        return "\n".join([header + shown] + [self.display_email(email) for email in top])
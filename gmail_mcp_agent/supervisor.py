@@ -0,0 +1,293 @@
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from dotenv import load_dotenv
+from gmail_mcp_agent.controller.email_controller import EmailController
+from gmail_mcp_agent.controller.scheduler import AdaptiveBackoff
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from gmail_mcp_agent.utils.analysis_cache import AnalysisCache
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+from gmail_mcp_agent.utils.llm_broker import LLMBroker, RemoteOllamaAgent
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+
+
+def load_accounts(path: str) -> List[Dict[str, Any]]:
+    """Load account definitions from a JSON file.
+
+    Each account needs a ``name`` and may set ``credentials_file``,
+    ``token_file`` and ``state_dir`` (default ``accounts/<name>``).
+    """
+    with open(path) as f:
+        accounts = json.load(f)['accounts']
+    for account in accounts:
+        account.setdefault('state_dir', os.path.join('accounts', account['name']))
+        account.setdefault('token_file', os.path.join(account['state_dir'], 'token.json'))
+    return accounts
+
+
+def shard_accounts(accounts: List[Dict[str, Any]], workers: int) -> List[List[Dict[str, Any]]]:
+    """Split accounts round-robin across ``workers`` shards."""
+    return [accounts[i::workers] for i in range(workers) if accounts[i::workers]]
+
+
+def build_controller(account: Dict[str, Any], ollama_agent: OllamaAgent, analysis_workers: int) -> EmailController:
+    """Build an EmailController whose credentials and state are private to one account."""
+    state_dir = account['state_dir']
+    os.makedirs(state_dir, exist_ok=True)
+    # Workers run headless, so a missing token fails setup instead of waiting on a browser
+    gmail_client = GmailClient(credentials_file=account.get('credentials_file'), token_file=account['token_file'],
+                               interactive=False)
+    embedding_classifier = None
+    if os.getenv('EMBEDDING_MODEL'):
+        from gmail_mcp_agent.model.embedding_classifier import EmbeddingClassifier
+        embedding_classifier = EmbeddingClassifier.from_env(
+            ollama_agent, path=os.path.join(state_dir, 'embedding_index.npz'))
+    model = EmailModel(
+        ollama_agent=ollama_agent,
+        analysis_workers=analysis_workers,
+        store=EmailStore(Email, path=os.path.join(state_dir, 'emails.sqlite3')),
+        embedding_classifier=embedding_classifier
+    )
+    return EmailController(
+        model=model,
+        gmail_client=gmail_client,
+        history_sync=HistorySync(gmail_client, state_file=os.path.join(state_dir, 'sync_state.json'))
+    )
+
+
+def run_worker(worker_index: int, accounts: List[Dict[str, Any]], request_queue, response_queue,
+               status_queue, stop_event, options: Dict[str, Any]) -> None:
+    """Worker process: poll each account in the shard with its own adaptive interval."""
+    # The supervisor coordinates shutdown through stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    agent = RemoteOllamaAgent(worker_index, request_queue, response_queue, timeout=options['llm_timeout'])
+    shard = []
+    for account in accounts:
+        status = {'account': account['name'], 'worker': worker_index, 'pid': os.getpid(),
+                  'last_success': None, 'last_error': None, 'errors': 0, 'processed': 0}
+        try:
+            controller = build_controller(account, agent, options['analysis_workers'])
+        except Exception as e:
+            status.update(last_error=f"setup failed: {e}", errors=1)
+            status_queue.put(status)
+            continue
+        backoff = AdaptiveBackoff(options['min_interval'], options['max_interval'])
+        shard.append({'controller': controller, 'backoff': backoff, 'next_run': 0.0, 'status': status})
+
+    if not shard:
+        # Exit non-zero so the supervisor restarts the worker, retrying setup
+        sys.exit(1)
+
+    while shard and not stop_event.is_set():
+        now = time.time()
+        for entry in shard:
+            if entry['next_run'] > now or stop_event.is_set():
+                continue
+            controller, status = entry['controller'], entry['status']
+            new_emails = 0
+            try:
+                results = controller.process_emails_by_priority()
+                results.extend(controller.reply_as_analyzed(controller.stream_new_emails()))
+                new_emails = controller.last_fetch_count
+                status['processed'] += sum(r['thread_size'] for r in results if r['response_sent'])
+                status['last_success'] = time.time()
+            except Exception as e:
+                status['errors'] += 1
+                status['last_error'] = str(e)
+            status['unprocessed'] = controller.model.store.count_unprocessed()
+            status['last_cycle'] = time.time()
+            entry['next_run'] = time.time() + entry['backoff'].record(new_emails)
+            status_queue.put(dict(status))
+        next_run = min(entry['next_run'] for entry in shard)
+        stop_event.wait(max(0.0, next_run - time.time()))
+
+    for entry in shard:
+        entry['controller'].close()
+
+
+class Supervisor:
+    """Run the agent for many mailboxes across a pool of worker processes.
+
+    Accounts are sharded across ``workers`` processes. Each account keeps its
+    own credentials, sync state and email store. All workers send LLM work
+    through one LLMBroker in the supervisor process, which bounds the load on
+    the local Ollama instance.
+    """
+
+    # Minimum seconds between restarts of a crashed worker
+    RESTART_DELAY = 5.0
+
+    def __init__(self, accounts: List[Dict[str, Any]], workers: int = 4, llm_concurrency: int = 4,
+                 min_interval: float = 10.0, max_interval: float = 300.0, report_interval: float = 60.0):
+        self.accounts = accounts
+        self.shards = shard_accounts(accounts, max(1, workers))
+        self.llm_concurrency = llm_concurrency
+        self.report_interval = report_interval
+        self.options = {
+            'min_interval': min_interval,
+            'max_interval': max_interval,
+            'analysis_workers': llm_concurrency,
+            'llm_timeout': float(os.getenv('OLLAMA_TIMEOUT', '120')) * 2
+        }
+        self.health: Dict[str, Dict[str, Any]] = {
+            account['name']: {'account': account['name'], 'last_success': None, 'last_error': None,
+                              'errors': 0, 'processed': 0}
+            for account in accounts
+        }
+        self._context = multiprocessing.get_context('spawn')
+        self._stop = self._context.Event()
+        self._request_queue = self._context.Queue()
+        self._response_queues = [self._context.Queue() for _ in self.shards]
+        self._status_queue = self._context.Queue()
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * len(self.shards)
+        self._started_at = [0.0] * len(self.shards)
+        self._started = time.time()
+        self.broker = None
+
+    def run(self) -> None:
+        """Start the broker and workers, then report health until stopped."""
+        agent = OllamaAgent(
+            model_name="gemma3:4b",
+            timeout=float(os.getenv('OLLAMA_TIMEOUT', '120')),
+            cache=AnalysisCache(
+                path=os.getenv('ANALYSIS_CACHE_FILE', 'analysis_cache.sqlite3'),
+                max_entries=int(os.getenv('ANALYSIS_CACHE_SIZE', '5000'))
+            )
+        )
+        # Load the model while the workers start and sync their mailboxes
+        agent.keep_warm()
+        self.broker = LLMBroker(agent, self._request_queue, self._response_queues, self.llm_concurrency).start()
+
+        try:
+            next_report = time.time() + self.report_interval
+            while not self._stop.is_set():
+                self._restart_dead_workers()
+                self._drain_status(timeout=1.0)
+                if time.time() >= next_report:
+                    print(self.format_report())
+                    next_report = time.time() + self.report_interval
+        finally:
+            self._shutdown()
+
+    def stop(self) -> None:
+        """Ask workers to finish their current cycle and exit."""
+        self._stop.set()
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Get per-account health: ``ok``, ``failing`` or ``pending``, and lag in seconds."""
+        now = time.time()
+        rows = []
+        for name, status in self.health.items():
+            last_success = status['last_success']
+            if status.get('last_error') and (last_success is None or status.get('last_cycle', 0) > last_success):
+                state = 'failing'
+            elif last_success is None:
+                state = 'pending'
+            else:
+                state = 'ok'
+            rows.append({
+                'account': name,
+                'state': state,
+                'lag_seconds': now - (last_success or self._started),
+                'unprocessed': status.get('unprocessed', 0),
+                'processed': status['processed'],
+                'errors': status['errors'],
+                'last_error': status['last_error'],
+            })
+        return rows
+
+    def format_report(self) -> str:
+        lines = [f"Supervisor report {datetime.now().isoformat()} "
+                 f"(LLM queue depth: {self.broker.queue_depth()}, LLM requests served: {self.broker.served})"]
+        for row in self.report():
+            line = (f"- {row['account']}: {row['state'].upper()} lag={row['lag_seconds']:.0f}s "
+                    f"unprocessed={row['unprocessed']} processed={row['processed']} errors={row['errors']}")
+            if row['state'] == 'failing':
+                line += f" last_error={row['last_error']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _restart_dead_workers(self) -> None:
+        for index, shard in enumerate(self.shards):
+            process = self._processes[index]
+            # A clean exit means the shard had nothing left to run
+            if process is not None and (process.is_alive() or process.exitcode == 0):
+                continue
+            if process is not None:
+                if time.time() - self._started_at[index] < self.RESTART_DELAY:
+                    continue
+                print(f"Worker {index} exited with code {process.exitcode}, restarting.")
+                # The dead worker may have died holding its queue's read lock, so the new one
+                # gets a fresh queue; the broker answers on whichever is current, and late
+                # answers to the dead worker's requests are dropped by their ids
+                self._response_queues[index].cancel_join_thread()
+                self._response_queues[index] = self._context.Queue()
+            process = self._context.Process(
+                target=run_worker,
+                args=(index, shard, self._request_queue, self._response_queues[index],
+                      self._status_queue, self._stop, self.options),
+                name=f"gmail-agent-worker-{index}",
+                daemon=True
+            )
+            process.start()
+            self._processes[index] = process
+            self._started_at[index] = time.time()
+
+    def _drain_status(self, timeout: float) -> None:
+        try:
+            status = self._status_queue.get(timeout=timeout)
+            while True:
+                self.health[status['account']].update(status)
+                status = self._status_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _shutdown(self) -> None:
+        self._stop.set()
+        for process in self._processes:
+            if process is not None:
+                process.join()
+        self._drain_status(timeout=0.1)
+        if self.broker is not None:
+            self.broker.stop()
+        print(self.format_report() if self.broker else "Supervisor stopped.")
+
+
+def main():
+    load_dotenv()
+
+    accounts_file = sys.argv[1] if len(sys.argv) > 1 else os.getenv('ACCOUNTS_FILE', 'accounts.json')
+    accounts = load_accounts(accounts_file)
+    supervisor = Supervisor(
+        accounts,
+        workers=int(os.getenv('SUPERVISOR_WORKERS', str(os.cpu_count() or 4))),
+        llm_concurrency=int(os.getenv('OLLAMA_WORKERS', '4')),
+        min_interval=float(os.getenv('POLL_MIN_INTERVAL', '10')),
+        max_interval=float(os.getenv('POLL_MAX_INTERVAL', '300')),
+        report_interval=float(os.getenv('SUPERVISOR_REPORT_INTERVAL', '60'))
+    )
+
+    print(f"Gmail MCP Supervisor started for {len(accounts)} accounts "
+          f"across {len(supervisor.shards)} worker processes")
+    print("Press Ctrl+C to exit")
+
+    def shutdown(signum, frame):
+        print("\nShutting down, waiting for workers to finish their current cycle...")
+        supervisor.stop()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
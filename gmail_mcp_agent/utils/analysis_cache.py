@@ -0,0 +1,115 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+
+class AnalysisCache:
+    """Bounded LRU/TTL cache of LLM analyses keyed on normalized email content.
+
+    Entries are written through to an optional SQLite file so a restarted
+    agent starts warm. The file holds the same entries as memory: evicted
+    and expired entries are deleted from both.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 5000, ttl: Optional[float] = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        # Analysis workers share the cache
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache "
+                "(key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._load()
+
+    @staticmethod
+    def make_key(model: str, template: str, subject: str, snippet: str) -> str:
+        """Hash the inputs after folding case and collapsing whitespace."""
+        parts = [" ".join(part.casefold().split()) for part in (model, template, subject, snippet)]
+        return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached analysis, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry[0]):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store an analysis, evicting the least recently used entries over the bound."""
+        stored_at = time.time()
+        with self._lock:
+            self._entries[key] = (stored_at, dict(value))
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO analysis_cache (key, stored_at, value) VALUES (?, ?, ?)",
+                        (key, stored_at, json.dumps(value))
+                    )
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters; every hit is a model call saved."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _is_expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _remove(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+
+    def _load(self) -> None:
+        """Warm the cache with the most recent unexpired entries on disk."""
+        if self.ttl is not None:
+            with self._db:
+                self._db.execute("DELETE FROM analysis_cache WHERE stored_at < ?", (time.time() - self.ttl,))
+        rows = self._db.execute(
+            "SELECT key, stored_at, value FROM analysis_cache ORDER BY stored_at DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for key, stored_at, value in reversed(rows):
+            self._entries[key] = (stored_at, json.loads(value))
+        with self._db:
+            self._db.execute(
+                "DELETE FROM analysis_cache WHERE key NOT IN "
+                "(SELECT key FROM analysis_cache ORDER BY stored_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
@@ -0,0 +1,224 @@
+import base64
+import codecs
+import os
+import re
+from html.parser import HTMLParser
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+from .metrics import metrics
+
+# Approximate LLM tokens: words and single punctuation marks
+TOKEN = re.compile(r"\w+|[^\w\s]")
+# Lines that start the quoted history of a reply, or a signature
+QUOTE_START = re.compile(
+    r"^\s*(On\s.*\bwrote:|-{2,}\s*Original Message\s*-{2,}|_{20,}|-- ?|Sent from my \w+.*)\s*$",
+    re.IGNORECASE
+)
+
+
+class _HTMLText(HTMLParser):
+    """Visible text of an HTML body, fed in chunks, without scripts, styles or quoted replies."""
+
+    SKIPPED = {'script', 'style', 'head', 'title', 'blockquote'}
+    VOID = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr'}
+    BLOCKS = {'br', 'p', 'div', 'tr', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'ul', 'ol'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in self.VOID:
+            if tag == 'br' and not self._skipping:
+                self.parts.append('\n')
+            return
+        if self._skipping:
+            self._skipping += 1
+        elif tag in self.SKIPPED or 'gmail_quote' in (dict(attrs).get('class') or ''):
+            self._skipping = 1
+        elif tag in self.BLOCKS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.VOID:
+            return
+        if self._skipping:
+            self._skipping -= 1
+        elif tag in self.BLOCKS:
+            self.parts.append('\n')
+
+    def handle_data(self, data: str) -> None:
+        if not self._skipping:
+            # Line breaks in HTML source are spaces; blocks start new lines
+            self.parts.append(re.sub(r'\s+', ' ', data))
+
+    def take(self) -> str:
+        text = ''.join(self.parts)
+        self.parts = []
+        return text
+
+
+class _Collector:
+    """Keep the lines of a body up to a token budget, stopping at quoted history."""
+
+    # Longer runs without a line break are split, so a buffered line stays small
+    MAX_LINE = 4096
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self.tokens = 0
+        self.lines: List[str] = []
+        self.done = False
+        self.truncated = False
+        self._partial = ''
+        self._previous = ''
+
+    def feed(self, text: str, final: bool = False) -> None:
+        lines = (self._partial + text).split('\n')
+        self._partial = '' if final else lines.pop()
+        if len(self._partial) > self.MAX_LINE:
+            cut = self._partial.rfind(' ', 0, self.MAX_LINE) + 1 or self.MAX_LINE
+            lines.append(self._partial[:cut])
+            self._partial = self._partial[cut:]
+        for line in lines:
+            if self.done:
+                return
+            self._add(line.rstrip('\r'))
+
+    def _add(self, line: str) -> None:
+        line = ' '.join(line.split())
+        # Gmail wraps long "On <date>, <sender> wrote:" headers onto two lines
+        if QUOTE_START.match(line) or (line.endswith('wrote:') and self._previous.startswith('On ')):
+            if self._previous.startswith('On ') and self.lines and self.lines[-1] == self._previous:
+                self.lines.pop()
+            self.done = True
+            return
+        self._previous = line
+        if line.startswith('>') or (not line and (not self.lines or not self.lines[-1])):
+            return
+        tokens = TOKEN.findall(line)
+        if self.tokens + len(tokens) > self.max_tokens:
+            # Cut the line at the last whole token within the budget
+            keep = self.max_tokens - self.tokens
+            if keep:
+                self.lines.append(line[:[match.end() for match in TOKEN.finditer(line)][keep - 1]])
+            self.tokens = self.max_tokens
+            self.done = self.truncated = True
+            return
+        self.tokens += len(tokens)
+        self.lines.append(line)
+
+    def text(self) -> str:
+        return '\n'.join(self.lines).strip()
+
+
+class BodyExtractor:
+    """Extract the text an LLM should read from a Gmail message payload.
+
+    Takes the first text/plain part, else the first text/html part, never
+    touching attachments. The part's base64 data is decoded ``chunk_size``
+    characters at a time through an incremental charset decoder (and HTML
+    parser), and decoding stops once quoted history starts or the text
+    reaches ``max_tokens``, so the work and memory per message do not grow
+    with its size. Text parts Gmail only returns as an attachment id are
+    fetched with ``fetch_attachment`` when at most ``max_part_bytes``.
+    """
+
+    def __init__(self, max_tokens: int = 400, max_part_bytes: int = 1 << 20, chunk_size: int = 16384):
+        self.max_tokens = max_tokens
+        self.max_part_bytes = max_part_bytes
+        # Whole base64 quanta, so chunks decode on their own
+        self.chunk_size = max(4, chunk_size - chunk_size % 4)
+
+    @classmethod
+    def from_env(cls) -> Optional['BodyExtractor']:
+        """Build the extractor configured by ``EMAIL_BODY_*`` variables, or None when disabled."""
+        max_tokens = int(os.getenv('EMAIL_BODY_TOKENS', '400'))
+        if max_tokens <= 0:
+            return None
+        return cls(max_tokens=max_tokens, max_part_bytes=int(os.getenv('EMAIL_BODY_MAX_BYTES', str(1 << 20))))
+
+    def extract(self, payload: Dict[str, Any],
+                fetch_attachment: Optional[Callable[[str], str]] = None) -> str:
+        """Get the body text of a payload, or an empty string when it has none."""
+        plain = html = None
+        for part in self._text_parts(payload):
+            if part['mimeType'].lower() == 'text/plain' and plain is None:
+                plain = part
+            elif part['mimeType'].lower() == 'text/html' and html is None:
+                html = part
+        part = plain or html
+        if part is None:
+            metrics.inc('email_bodies_total', source='none')
+            return ''
+
+        body = part.get('body', {})
+        data = body.get('data')
+        if data is None and body.get('attachmentId') and fetch_attachment is not None:
+            if body.get('size', 0) > self.max_part_bytes:
+                metrics.inc('email_bodies_total', source='too_large')
+                return ''
+            try:
+                data = fetch_attachment(body['attachmentId'])
+            except Exception as e:
+                print(f"Error fetching message body: {e}")
+        if not data:
+            metrics.inc('email_bodies_total', source='none')
+            return ''
+
+        collector = _Collector(self.max_tokens)
+        parser = _HTMLText() if part is html else None
+        decoder = self._decoder(self._charset(part))
+        for chunk in self._decode_base64(data):
+            text = decoder.decode(chunk)
+            if parser is not None:
+                parser.feed(text)
+                text = parser.take()
+            collector.feed(text)
+            if collector.done:
+                break
+        else:
+            text = decoder.decode(b'', final=True)
+            if parser is not None:
+                parser.feed(text)
+                parser.close()
+                text = parser.take()
+            collector.feed(text, final=True)
+
+        metrics.inc('email_bodies_total', source='html' if parser is not None else 'plain')
+        if collector.truncated:
+            metrics.inc('email_bodies_truncated_total')
+        return collector.text()
+
+    def _text_parts(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Yield the text parts of a payload in order, skipping attachments."""
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            if part.get('parts'):
+                stack.extend(reversed(part['parts']))
+                continue
+            if part.get('filename') or 'attachment' in self._header(part, 'content-disposition').lower():
+                continue
+            if part.get('mimeType', '').lower() in ('text/plain', 'text/html'):
+                yield part
+
+    def _decode_base64(self, data: str) -> Iterator[bytes]:
+        for start in range(0, len(data), self.chunk_size):
+            chunk = data[start:start + self.chunk_size]
+            yield base64.urlsafe_b64decode(chunk + '=' * (-len(chunk) % 4))
+
+    def _charset(self, part: Dict[str, Any]) -> str:
+        match = re.search(r'charset="?([\w.:-]+)', self._header(part, 'content-type'), re.IGNORECASE)
+        return match.group(1) if match else 'utf-8'
+
+    @staticmethod
+    def _decoder(charset: str) -> codecs.IncrementalDecoder:
+        try:
+            return codecs.getincrementaldecoder(charset)(errors='replace')
+        except LookupError:
+            return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    @staticmethod
+    def _header(part: Dict[str, Any], name: str) -> str:
+        return next((header['value'] for header in part.get('headers', []) if header['name'].lower() == name), '')
@@ -1,97 +1,361 @@
 import os
-from typing import List, Dict, Any
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from dotenv import load_dotenv
+from .body_extractor import BodyExtractor
+from .metrics import metrics
+
+# The google client libraries are imported where they are first used, since
+# importing them takes longer than everything else before the first poll
+
+def build_gmail_service(credentials=None, developer_key: Optional[str] = None, http=None):
+    """Build the Gmail service from a static discovery document, without network access.
+    
+    Uses the document at ``GMAIL_DISCOVERY_FILE`` when set, else the copy
+    bundled with google-api-python-client, and only falls back to fetching
+    it when neither exists.
+    """
+    from googleapiclient.discovery import build, build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+    
+    discovery_file = os.getenv('GMAIL_DISCOVERY_FILE')
+    if discovery_file and os.path.exists(discovery_file):
+        with open(discovery_file) as f:
+            document = f.read()
+    else:
+        document = get_static_doc('gmail', 'v1')
+    
+    if document is None:
+        return build('gmail', 'v1', credentials=credentials, developerKey=developer_key, http=http)
+    return build_from_document(document, credentials=credentials, developerKey=developer_key, http=http)
 
 class GmailClient:
     SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
+    METADATA_HEADERS = ['Subject', 'From', 'Date', 'Message-ID', 'References']
+    # Gmail recommends no more than 50 calls per batch request
+    BATCH_SIZE = 50
+    # Message fields fetched for bodies: the part tree down to four levels,
+    # where Gmail returns attachments as ids, never as data
+    PART_FIELDS = 'partId,mimeType,filename,headers,body'
+    BODY_FIELDS = f'id,payload({PART_FIELDS},parts({PART_FIELDS},parts({PART_FIELDS},parts({PART_FIELDS}))))'
     
-    def __init__(self):
+    def __init__(self, service=None, credentials_file: Optional[str] = None, token_file: Optional[str] = None,
+                 body_extractor: Optional[BodyExtractor] = None, interactive: bool = True):
         load_dotenv()
-        self.credentials_file = os.getenv('GMAIL_CREDENTIALS_FILE', 'credentials.json')
+        self.credentials_file = credentials_file or os.getenv('GMAIL_CREDENTIALS_FILE', 'credentials.json')
+        self.token_file = token_file or os.getenv('GMAIL_TOKEN_FILE', 'token.json')
         self.api_key = os.getenv('GMAIL_API_KEY')
-        self.service = self._get_gmail_service()
+        self.credentials = None
+        # Without a usable token, authorize in the browser; headless processes fail instead
+        self.interactive = interactive
+        # httplib2 connections are not thread-safe, so each sending thread keeps its own
+        self._local = threading.local()
+        # Message bodies are extracted for analysis unless EMAIL_BODY_TOKENS=0
+        self.body_extractor = body_extractor if body_extractor is not None else BodyExtractor.from_env()
+        self.service = service or self._get_gmail_service()
     
     def _get_gmail_service(self):
         if self.api_key:
-            return build('gmail', 'v1', developerKey=self.api_key)
+            return build_gmail_service(developer_key=self.api_key)
+        
+        from google.oauth2.credentials import Credentials
+        from google.auth.transport.requests import Request
         
         # Fallback to OAuth2 if no API key is provided
         creds = None
-        if os.path.exists('token.json'):
-            creds = Credentials.from_authorized_user_file('token.json', self.SCOPES)
+        if os.path.exists(self.token_file):
+            creds = Credentials.from_authorized_user_file(self.token_file, self.SCOPES)
         
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
                 creds.refresh(Request())
+            elif not self.interactive:
+                raise RuntimeError(f"No valid Gmail token in {self.token_file}; "
+                                   "run the agent once interactively to authorize the account")
             else:
+                from google_auth_oauthlib.flow import InstalledAppFlow
                 flow = InstalledAppFlow.from_client_secrets_file(
                     self.credentials_file, self.SCOPES)
                 creds = flow.run_local_server(port=0)
             
-            with open('token.json', 'w') as token:
+            with open(self.token_file, 'w') as token:
                 token.write(creds.to_json())
         
-        return build('gmail', 'v1', credentials=creds)
+        self.credentials = creds
+        return build_gmail_service(credentials=creds)
     
-    def get_unread_emails(self, max_results: int = 10) -> List[Dict[str, Any]]:
-        """Get unread emails from Gmail."""
+    def get_unread_emails(self, max_results: Optional[int] = None, page_size: int = 100,
+                          query: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get unread emails from Gmail.
+
+        Follows ``nextPageToken`` until ``max_results`` messages (or all
+        unread messages when ``None``) are listed, then fetches them in
+        batched requests. ``query`` narrows the listing with Gmail search
+        syntax, e.g. ``after:<unix time>``.
+        """
         try:
-            results = self.service.users().messages().list(
-                userId='me',
-                labelIds=['UNREAD'],
-                maxResults=max_results
-            ).execute()
-            
-            messages = results.get('messages', [])
-            emails = []
-            
-            for message in messages:
-                msg = self.service.users().messages().get(
-                    userId='me',
-                    id=message['id'],
-                    format='full'
-                ).execute()
-                
-                headers = msg['payload']['headers']
-                subject = next(h['value'] for h in headers if h['name'] == 'Subject')
-                sender = next(h['value'] for h in headers if h['name'] == 'From')
-                
-                emails.append({
-                    'id': message['id'],
-                    'subject': subject,
-                    'sender': sender,
-                    'snippet': msg['snippet']
-                })
-            
-            return emails
+            return self.get_emails(self.list_unread(max_results, page_size, query))
         except Exception as e:
             if "API key" in str(e):
                 print("Error: API key authentication is not sufficient for Gmail API operations.")
                 print("Please use OAuth2 authentication instead.")
             raise e
     
-    def send_email(self, to: str, subject: str, body: str) -> Dict[str, Any]:
-        """Send an email using Gmail API."""
+    def list_unread(self, max_results: Optional[int] = None, page_size: int = 100,
+                    query: Optional[str] = None) -> List[str]:
+        """List the ids of unread messages, as ``get_unread_emails`` does, without fetching them."""
+        return self._list_message_ids(['UNREAD'], max_results, page_size, query)
+    
+    def get_emails(self, message_ids: List[str]) -> List[Dict[str, Any]]:
+        """Fetch the metadata of the given messages in batches.
+        
+        Bodies are not fetched: use ``fetch_bodies`` for the emails that
+        will actually be analyzed. Messages that cannot be fetched are
+        reported and left out; use ``fetch_emails`` to get their ids.
+        """
+        emails, failed = self.fetch_emails(message_ids)
+        for message_id, error in failed.items():
+            print(f"Error fetching message {message_id}: {error}")
+        return emails
+    
+    def fetch_emails(self, message_ids: List[str]) -> Tuple[List[Dict[str, Any]], Dict[str, Exception]]:
+        """Fetch the metadata of the given messages, returning the emails and the errors of those that failed.
+        
+        Messages deleted since they were listed are left out of both.
+        """
+        emails: Dict[str, Dict[str, Any]] = {}
+        
+        def parse(message_id, response):
+            emails[message_id] = self._parse_message(response)
+        
+        failed = self._fetch_all(message_ids, parse, format='metadata', metadataHeaders=self.METADATA_HEADERS)
+        # A deleted message answers 404 and will never be fetched
+        failed = {message_id: error for message_id, error in failed.items()
+                  if getattr(getattr(error, 'resp', None), 'status', None) != 404}
+        return [emails[message_id] for message_id in message_ids if message_id in emails], failed
+    
+    def fetch_bodies(self, emails: List[Dict[str, Any]]) -> None:
+        """Add the extracted ``body`` to each email, when a body extractor is configured.
+        
+        Emails whose body cannot be fetched are left with their snippet.
+        """
+        if self.body_extractor is None or not emails:
+            return
+        by_id = {email['id']: email for email in emails}
+        
+        def extract(message_id, response):
+            # Extracted as it arrives, so at most one message's payload is held at a time
+            try:
+                by_id[message_id]['body'] = self.body_extractor.extract(
+                    response.get('payload', {}), lambda attachment_id: self._get_attachment(message_id, attachment_id))
+            except Exception as e:
+                print(f"Error extracting body of message {message_id}: {e}")
+        
+        failed = self._fetch_all(list(by_id), extract, format='full', fields=self.BODY_FIELDS)
+        for message_id, error in failed.items():
+            print(f"Error fetching body of message {message_id}: {error}")
+    
+    @metrics.timed('gmail_request_seconds', method='users.getProfile')
+    def get_history_id(self) -> str:
+        """Get the mailbox's current history id."""
+        return self.service.users().getProfile(userId='me').execute()['historyId']
+    
+    @metrics.timed('gmail_request_seconds', method='history.list')
+    def get_history(self, start_history_id: str) -> Tuple[List[str], str]:
+        """List ids of unread messages added since ``start_history_id``.
+        
+        Returns the message ids and the latest history id of the mailbox.
+        Raises the API's 404 error when ``start_history_id`` has expired.
+        """
+        message_ids: List[str] = []
+        seen = set()
+        history_id = start_history_id
+        page_token = None
+        
+        while True:
+            results = self.service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                labelId='UNREAD',
+                pageToken=page_token
+            ).execute()
+            
+            for record in results.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message_id = added['message']['id']
+                    if message_id not in seen:
+                        seen.add(message_id)
+                        message_ids.append(message_id)
+            
+            history_id = results.get('historyId', history_id)
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        
+        return message_ids, history_id
+    
+    def watch(self, topic_name: str, label_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Ask Gmail to publish mailbox changes to a Cloud Pub/Sub topic.
+        
+        The watch expires after seven days, see the returned ``expiration``.
+        """
+        return self.service.users().watch(
+            userId='me',
+            body={'topicName': topic_name, 'labelIds': label_ids or ['UNREAD']}
+        ).execute()
+    
+    def stop_watch(self) -> None:
+        """Stop push notifications for the mailbox."""
+        self.service.users().stop(userId='me').execute()
+    
+    @metrics.timed('gmail_request_seconds', method='messages.list')
+    def _list_message_ids(self, label_ids: List[str], max_results: Optional[int], page_size: int,
+                          query: Optional[str] = None) -> List[str]:
+        """List message ids carrying the given labels (and matching ``query``), following page tokens."""
+        message_ids: List[str] = []
+        page_token = None
+        
+        while max_results is None or len(message_ids) < max_results:
+            request_size = page_size if max_results is None else min(page_size, max_results - len(message_ids))
+            results = self.service.users().messages().list(
+                userId='me',
+                labelIds=label_ids,
+                maxResults=request_size,
+                pageToken=page_token,
+                q=query
+            ).execute()
+            
+            message_ids.extend(message['id'] for message in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        
+        return message_ids if max_results is None else message_ids[:max_results]
+    
+    def _fetch_all(self, message_ids: List[str], handle: Callable[[str, Dict[str, Any]], None],
+                   **params: Any) -> Dict[str, Exception]:
+        """Get messages with ``params`` in batches, passing each response to ``handle``.
+        
+        Returns the error of each message that still failed after a retry.
+        """
+        pending = list(message_ids)
+        
+        # Retry calls that failed inside a batch once before giving up on them
+        for attempt in range(2):
+            failed = []
+            for start in range(0, len(pending), self.BATCH_SIZE):
+                failed.extend(self._fetch_batch(pending[start:start + self.BATCH_SIZE], handle, params))
+            if not failed:
+                break
+            metrics.inc('gmail_fetch_retries_total', len(failed))
+            pending = [message_id for message_id, _ in failed]
+        
+        metrics.inc('gmail_fetch_errors_total', len(failed))
+        return dict(failed)
+    
+    @metrics.timed('gmail_request_seconds', method='messages.get.batch')
+    def _fetch_batch(self, message_ids: List[str], handle: Callable[[str, Dict[str, Any]], None],
+                     params: Dict[str, Any]) -> List[tuple]:
+        """Fetch one batch of messages, returning the (id, error) pairs that failed."""
+        failed = []
+        
+        def callback(request_id, response, exception):
+            if exception is not None:
+                failed.append((request_id, exception))
+            else:
+                handle(request_id, response)
+        
+        batch = self.service.new_batch_http_request(callback=callback)
+        messages = self.service.users().messages()
+        for message_id in message_ids:
+            batch.add(messages.get(userId='me', id=message_id, **params), request_id=message_id)
+        batch.execute()
+        
+        return failed
+    
+    @metrics.timed('gmail_request_seconds', method='messages.attachments.get')
+    def _get_attachment(self, message_id: str, attachment_id: str) -> str:
+        """Get the base64url data of a message part Gmail returned by id."""
+        return self.service.users().messages().attachments().get(
+            userId='me',
+            messageId=message_id,
+            id=attachment_id
+        ).execute()['data']
+    
+    def _parse_message(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a Gmail message resource into an email dict."""
+        payload = msg.get('payload', {})
+        headers = {h['name'].lower(): h['value'] for h in payload.get('headers', [])}
+        
+        email = {
+            'id': msg['id'],
+            'thread_id': msg.get('threadId', msg['id']),
+            'subject': headers.get('subject', ''),
+            'sender': headers.get('from', ''),
+            'date': headers.get('date', ''),
+            'snippet': msg.get('snippet', ''),
+            'message_id': headers.get('message-id', ''),
+            'reference_ids': headers.get('references', '')
+        }
+        if 'internalDate' in msg:
+            email['received_at'] = datetime.fromtimestamp(int(msg['internalDate']) / 1000)
+        
+        return email
+    
+    @metrics.timed('gmail_request_seconds', method='messages.send')
+    def send_email(self, to: str, subject: str, body: str, message_id: Optional[str] = None,
+                   thread_id: Optional[str] = None, in_reply_to: Optional[str] = None,
+                   references: Optional[str] = None) -> Dict[str, Any]:
+        """Send an email using Gmail API.
+        
+        ``message_id`` sets the RFC 822 Message-ID so the sent message can be
+        found again with ``find_sent_message``. ``thread_id`` adds the
+        message to an existing Gmail thread; ``in_reply_to`` and
+        ``references`` set the headers other mail clients thread replies by.
+        """
         try:
             message = {
-                'raw': self._create_message(to, subject, body)
+                'raw': self._create_message(to, subject, body, message_id, in_reply_to, references)
             }
+            if thread_id:
+                message['threadId'] = thread_id
             
             return self.service.users().messages().send(
                 userId='me',
                 body=message
-            ).execute()
+            ).execute(http=self._thread_http())
         except Exception as e:
             if "API key" in str(e):
                 print("Error: API key authentication is not sufficient for sending emails.")
                 print("Please use OAuth2 authentication instead.")
             raise e
     
-    def _create_message(self, to: str, subject: str, body: str) -> str:
+    @metrics.timed('gmail_request_seconds', method='messages.list.sent')
+    def find_sent_message(self, message_id: str) -> Optional[str]:
+        """Get the Gmail id of a sent message by its RFC 822 Message-ID, if any."""
+        results = self.service.users().messages().list(
+            userId='me',
+            q=f"in:sent rfc822msgid:{message_id}",
+            maxResults=1
+        ).execute(http=self._thread_http())
+        messages = results.get('messages', [])
+        return messages[0]['id'] if messages else None
+    
+    def _thread_http(self):
+        """Get this thread's authorized HTTP transport, reused across calls."""
+        if self.credentials is None:
+            return None
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            from google_auth_httplib2 import AuthorizedHttp
+            import httplib2
+            http = self._local.http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+        return http
+    
+    def _create_message(self, to: str, subject: str, body: str, message_id: Optional[str] = None,
+                        in_reply_to: Optional[str] = None, references: Optional[str] = None) -> str:
         """Create a base64 encoded email message."""
         import base64
         from email.mime.text import MIMEText
@@ -99,5 +363,11 @@ class GmailClient:
         message = MIMEText(body)
         message['to'] = to
         message['subject'] = subject
+        if message_id:
+            message['Message-ID'] = message_id
+        if in_reply_to:
+            message['In-Reply-To'] = in_reply_to
+        if references:
+            message['References'] = references
         
         return base64.urlsafe_b64encode(message.as_bytes()).decode() 
\ No newline at end of file
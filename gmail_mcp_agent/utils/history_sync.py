@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from .gmail_client import GmailClient
+from .metrics import metrics
+
+
+class HistorySync:
+    """Incremental mailbox sync driven by Gmail history ids.
+
+    The last seen ``historyId`` is persisted to ``state_file`` so that each
+    sync only fetches messages added since the previous one. When there is
+    no saved id, tracking starts from the current history id without
+    listing anything. When Gmail reports the saved id as expired, the
+    UNREAD label is listed back to the last sync only.
+
+    A sync's state is only saved by ``commit``, once its emails are stored,
+    so a crash in between lists the same messages again on restart.
+    Messages that could not be fetched are saved as pending and fetched
+    again by the next sync.
+    """
+
+    def __init__(self, gmail_client: GmailClient, state_file: Optional[str] = None):
+        self.gmail_client = gmail_client
+        self.state_file = state_file or os.getenv('GMAIL_SYNC_STATE_FILE', 'sync_state.json')
+        state = self._load_state()
+        self.history_id: Optional[str] = state.get('history_id')
+        # When the last sync started, as a Unix timestamp
+        self.synced_at: Optional[float] = state.get('synced_at')
+        # Listed messages that failed to fetch, retried by the next sync
+        self.pending_ids: List[str] = state.get('pending_ids', [])
+        # State of the last sync, saved by commit()
+        self._staged: Optional[Dict[str, Any]] = None
+
+    def sync(self, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Fetch emails added since the last sync.
+
+        ``since`` is the earliest arrival time of interest, e.g. when the
+        agent started; a resync never lists emails received before it.
+        Returns a dict with the fetched ``emails``, whether a ``full_resync``
+        was needed, the new ``history_id`` and the ``failed_ids`` of messages
+        that could not be fetched. Call ``commit`` once the emails are stored.
+        """
+        if not self.history_id:
+            return self.start_tracking()
+
+        started = time.time()
+        try:
+            message_ids, history_id = self.gmail_client.get_history(self.history_id)
+        except Exception as e:
+            if not self._is_expired(e):
+                raise e
+            print(f"History id {self.history_id} has expired, running a full resync.")
+            return self.full_resync(since)
+
+        return self._finish(message_ids, False, history_id, started)
+
+    def commit(self) -> None:
+        """Save the state of the last sync, once its emails are stored."""
+        if self._staged is None:
+            return
+        self.history_id = self._staged['history_id']
+        self.synced_at = self._staged['synced_at']
+        self.pending_ids = self._staged['pending_ids']
+        self._staged = None
+        self._save_state()
+
+    def start_tracking(self) -> Dict[str, Any]:
+        """Start history tracking from now, without fetching earlier emails."""
+        started = time.time()
+        return self._finish([], True, self.gmail_client.get_history_id(), started)
+
+    def full_resync(self, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """List unread emails received since the last sync (or ``since``, if later) and restart tracking.
+
+        Without either bound, tracking restarts from now as on a first sync.
+        """
+        bounds = [bound for bound in (self.synced_at, since.timestamp() if since else None) if bound is not None]
+        if not bounds:
+            return self.start_tracking()
+        # Read the history id before listing so nothing added meanwhile is missed
+        metrics.inc('gmail_full_resyncs_total')
+        started = time.time()
+        history_id = self.gmail_client.get_history_id()
+        message_ids = self.gmail_client.list_unread(query=f"after:{int(max(bounds))}")
+        return self._finish(message_ids, True, history_id, started)
+
+    def _finish(self, message_ids: List[str], full_resync: bool, history_id: str,
+                started: float) -> Dict[str, Any]:
+        """Fetch the listed and pending messages and stage the new state."""
+        listed = set(message_ids)
+        message_ids = [message_id for message_id in self.pending_ids if message_id not in listed] + message_ids
+        emails, failed = self.gmail_client.fetch_emails(message_ids) if message_ids else ([], {})
+        self._staged = {'history_id': history_id, 'synced_at': started, 'pending_ids': list(failed)}
+        return {
+            'emails': emails,
+            'full_resync': full_resync,
+            'history_id': history_id,
+            'failed_ids': list(failed)
+        }
+
+    def _is_expired(self, error: Exception) -> bool:
+        """Gmail answers 404 when the start history id is too old."""
+        resp = getattr(error, 'resp', None)
+        return getattr(resp, 'status', None) == 404
+
+    def _load_state(self) -> Dict[str, Any]:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading sync state, restarting history tracking: {e}")
+            return {}
+
+    def _save_state(self) -> None:
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump({'history_id': self.history_id, 'synced_at': self.synced_at,
+                       'pending_ids': self.pending_ids}, f)
+        os.replace(tmp_file, self.state_file)
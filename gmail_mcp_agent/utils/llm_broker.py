@@ -0,0 +1,159 @@
+import itertools
+import threading
+import uuid
+from concurrent.futures import Future
+from typing import List, Dict, Any, Tuple
+from .ollama_agent import OllamaAgent
+
+_STOP = None
+
+
+class LLMBroker:
+    """Serve LLM requests from many worker processes with one bounded pool.
+
+    Workers put ``(worker_index, request_id, method, args)`` on the shared
+    request queue; answers go back on the response queue currently at
+    ``response_queues[worker_index]``, so a restarted worker can be given a
+    fresh one. At most
+    ``concurrency`` requests reach Ollama at once, regardless of how many
+    mailboxes are being processed.
+    """
+
+    METHODS = ('analyze_email', 'generate_response', 'analyze_and_draft', 'embed', 'keep_warm')
+
+    def __init__(self, agent: OllamaAgent, request_queue, response_queues: List[Any], concurrency: int = 4):
+        self.agent = agent
+        self.request_queue = request_queue
+        self.response_queues = response_queues
+        self.concurrency = concurrency
+        self.served = 0
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> 'LLMBroker':
+        for _ in range(self.concurrency):
+            thread = threading.Thread(target=self._serve, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self.request_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def queue_depth(self) -> int:
+        try:
+            return self.request_queue.qsize()
+        except NotImplementedError:
+            # Not available on macOS
+            return -1
+
+    def _serve(self) -> None:
+        while True:
+            request = self.request_queue.get()
+            if request is _STOP:
+                return
+            worker_index, request_id, method, args = request
+            try:
+                if method not in self.METHODS:
+                    raise ValueError(f"unknown LLM method {method}")
+                response = (request_id, getattr(self.agent, method)(*args), None)
+            except Exception as e:
+                response = (request_id, None, str(e))
+            with self._lock:
+                self.served += 1
+            self.response_queues[worker_index].put(response)
+
+
+class RemoteOllamaAgent(OllamaAgent):
+    """OllamaAgent stand-in for worker processes that forwards calls to an LLMBroker.
+
+    Falls back to the default analysis and responses when the broker fails
+    or does not answer within ``timeout`` seconds. Request ids are prefixed
+    with a per-instance token, so a late answer to a request made by an
+    earlier incarnation of the worker is never taken for one of ours.
+    """
+
+    def __init__(self, worker_index: int, request_queue, response_queue, timeout: float = 300.0):
+        # Sets up the prompts and fallbacks; no Ollama client is ever created here
+        super().__init__()
+        self.worker_index = worker_index
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+        self.timeout = timeout
+        self._incarnation = uuid.uuid4().hex
+        self._ids = itertools.count()
+        self._pending: Dict[Tuple[str, int], Future] = {}
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_responses, daemon=True)
+        self._reader.start()
+
+    def analyze_email(self, subject: str, snippet: str) -> Dict[str, Any]:
+        try:
+            return self._call('analyze_email', subject, snippet)
+        except Exception as e:
+            print(f"Error in Ollama analysis: {e}")
+            return self._get_default_analysis()
+
+    def generate_response(self, email_data: Dict[str, Any]) -> str:
+        try:
+            return self._call('generate_response', email_data)
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            return self._get_default_response(email_data['category'])
+
+    def analyze_and_draft(self, subject: str, snippet: str) -> Dict[str, Any]:
+        try:
+            return self._call('analyze_and_draft', subject, snippet)
+        except Exception as e:
+            print(f"Error in Ollama analysis: {e}")
+            analysis = self._get_default_analysis()
+            analysis['reply'] = self._get_default_response(analysis['category'])
+            return analysis
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self._call('embed', texts)
+
+    def keep_warm(self) -> None:
+        """Ask the broker to warm the model up, without waiting for it."""
+        try:
+            self._post('keep_warm')
+        except Exception as e:
+            print(f"Error warming up Ollama model: {e}")
+
+    def _post(self, method: str, *args) -> Tuple[str, int]:
+        """Queue a request and return its id; its answer is dropped unless the id is pending."""
+        with self._lock:
+            request_id = (self._incarnation, next(self._ids))
+        self.request_queue.put((self.worker_index, request_id, method, args))
+        return request_id
+
+    def _call(self, method: str, *args) -> Any:
+        future: Future = Future()
+        with self._lock:
+            request_id = (self._incarnation, next(self._ids))
+            self._pending[request_id] = future
+        self.request_queue.put((self.worker_index, request_id, method, args))
+        try:
+            return future.result(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+    def _read_responses(self) -> None:
+        while True:
+            try:
+                request_id, result, error = self.response_queue.get()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                future = self._pending.get(request_id)
+            if future is None:
+                # The caller gave up on this request, or an earlier incarnation made it
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(result)
@@ -0,0 +1,274 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+# Latency buckets in seconds, from a fast Gmail call to a slow generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Bucketed observations plus a window of recent samples for quantiles."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, window: int = 1024):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: deque = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def quantiles(self) -> Dict[str, Optional[float]]:
+        """Get p50/p95/p99 over the recent sample window."""
+        samples = sorted(self.samples)
+        if not samples:
+            return {f"p{int(q * 100)}": None for q in QUANTILES}
+        return {f"p{int(q * 100)}": samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
+
+
+class _Timer:
+    def __init__(self, registry: 'MetricsRegistry', name: str, labels: LabelKey):
+        self._registry = registry
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self) -> '_Timer':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._registry._observe(self._name, self._labels, time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    def __enter__(self) -> '_NullTimer':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """Process-wide histograms, counters and gauges.
+
+    Every recording call returns immediately while the registry is disabled,
+    so instrumented code pays one attribute check. Metrics are identified by
+    name plus keyword labels, as in Prometheus.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, Callable[[], float]]] = {}
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Drop all recorded values and gauge callbacks."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record one observation in a histogram."""
+        if self.enabled:
+            self._observe(name, self._key(labels), value)
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add ``value`` to a counter."""
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def gauge(self, name: str, read: Callable[[], float], **labels: str) -> None:
+        """Register a gauge whose value is read from ``read`` at export time."""
+        with self._lock:
+            self._gauges.setdefault(name, {})[self._key(labels)] = read
+
+    def timer(self, name: str, **labels: str):
+        """Time a block into the ``name`` histogram, in seconds."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, self._key(labels))
+
+    def timed(self, name: str, **labels: str) -> Callable:
+        """Decorator that times every call into the ``name`` histogram.
+
+        Calls that raise are also counted in ``<name>_errors_total``.
+        """
+        key = self._key(labels)
+        errors_name = f"{name[:-len('_seconds')] if name.endswith('_seconds') else name}_errors_total"
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    self.inc(errors_name, **labels)
+                    raise
+                finally:
+                    self._observe(name, key, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get a JSON-serializable snapshot of every metric."""
+        with self._lock:
+            histograms = {name: [(key, h.count, h.sum, h.quantiles()) for key, h in series.items()]
+                          for name, series in self._histograms.items()}
+            counters = {name: list(series.items()) for name, series in self._counters.items()}
+            gauges = {name: list(series.items()) for name, series in self._gauges.items()}
+        return {
+            'timestamp': time.time(),
+            'histograms': {
+                name: [dict(labels=dict(key), count=count, sum=total, **quantiles)
+                       for key, count, total, quantiles in series]
+                for name, series in histograms.items()
+            },
+            'counters': {
+                name: [{'labels': dict(key), 'value': value} for key, value in series]
+                for name, series in counters.items()
+            },
+            'gauges': {
+                name: [{'labels': dict(key), 'value': self._read_gauge(read)} for key, read in series]
+                for name, series in gauges.items()
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{self._format_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{self._format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{self._format_labels(key)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{name}{self._format_labels(key)} {value}" for key, value in series.items())
+            gauges = sorted((name, list(series.items())) for name, series in self._gauges.items())
+        for name, series in gauges:
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{self._format_labels(key)} {self._read_gauge(read)}" for key, read in series)
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path: str) -> None:
+        """Write a snapshot to ``path``, replacing it atomically."""
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_file, path)
+
+    def _observe(self, name: str, key: LabelKey, value: float) -> None:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def _format_labels(self, key: LabelKey) -> str:
+        if not key:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+    def _read_gauge(self, read: Callable[[], float]) -> Optional[float]:
+        try:
+            return read()
+        except Exception as e:
+            print(f"Error reading gauge: {e}")
+            return None
+
+
+class MetricsServer:
+    """Serve a registry over HTTP.
+
+    ``/metrics`` answers in the Prometheus text format and ``/metrics.json``
+    with the JSON snapshot.
+    """
+
+    def __init__(self, registry: MetricsRegistry, port: int = 9108, host: str = '127.0.0.1'):
+        self.registry = registry
+        from http.server import ThreadingHTTPServer
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        from http.server import BaseHTTPRequestHandler
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    self._send(registry.to_prometheus(), 'text/plain; version=0.0.4')
+                elif self.path == '/metrics.json':
+                    self._send(json.dumps(registry.to_dict()), 'application/json')
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+
+            def _send(self, body: str, content_type: str) -> None:
+                data = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# Shared by all instrumented modules; main.py enables it when metrics are configured
+metrics = MetricsRegistry()
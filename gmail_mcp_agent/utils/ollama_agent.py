@@ -1,10 +1,108 @@
-from typing import Dict, Any, List
-import ollama
-from datetime import datetime
+from typing import Dict, Any, List, Iterator, Optional, Tuple
+from contextlib import closing
+import json
+import os
+import re
+import threading
+import time
+from .analysis_cache import AnalysisCache
+from .metrics import metrics
+
+def keep_alive_seconds(keep_alive: Any) -> Optional[float]:
+    """Convert an Ollama ``keep_alive`` (seconds or a duration like "1h30m") to seconds.
+    
+    Returns None when the model stays loaded indefinitely.
+    """
+    text = str(keep_alive).strip()
+    try:
+        seconds = float(text)
+    except ValueError:
+        parts = re.findall(r'(-?[\d.]+)(ms|s|m|h)', text)
+        if not parts or ''.join(number + unit for number, unit in parts) != text:
+            # Ollama's default
+            return 300.0
+        units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+        seconds = sum(float(number) * units[unit] for number, unit in parts)
+    return None if seconds < 0 else seconds
+
 
 class OllamaAgent:
-    def __init__(self, model_name: str = "gemma:3b"):
+    # Requests are chats that open with the system prompt, the operation's
+    # instructions and an acknowledgement, and end with the email. The opening
+    # is the same for every email, so Ollama reuses its evaluated tokens from
+    # the previous request and only evaluates the email.
+    ANALYSIS_INSTRUCTIONS = """Analyze the email I send you.
+
+Provide analysis in JSON format with these fields:
+- category: one of [urgent, meeting, inquiry, follow_up, general]
+- priority: number 0-3
+- requires_attention: boolean
+- intent: brief description of email's purpose
+- suggested_response: brief template for response"""
+
+    ANALYZE_AND_DRAFT_INSTRUCTIONS = """Analyze the email I send you and draft a reply.
+
+Respond with a single JSON object with these fields:
+- category: one of [urgent, meeting, inquiry, follow_up, general]
+- priority: number 0-3
+- requires_attention: boolean
+- intent: brief description of email's purpose
+- suggested_response: brief template for response
+- reply: a professional, concise reply that acknowledges the email's purpose,
+  matches its urgency and is specific to its category"""
+
+    DRAFT_INSTRUCTIONS = """Generate a response for the email I send you.
+
+Generate a professional, concise response that:
+1. Acknowledges the email's purpose
+2. Provides appropriate level of urgency
+3. Maintains professional tone
+4. Is specific to the email's category"""
+
+    ACKNOWLEDGEMENT = "Understood. Please send the email."
+
+    EMAIL_PROMPT = """Subject: {subject}
+Content: {snippet}"""
+
+    DRAFT_PROMPT = """Category: {category}
+Priority: {priority}
+Subject: {subject}
+Content: {snippet}"""
+
+    # Sent once per operation when warming up, so its shared opening is evaluated before the first email
+    WARMUP_EMAIL = EMAIL_PROMPT.format(subject="Warm-up", snippet="Ignore this message.")
+
+    # End of a sentence or paragraph, where a streamed reply can be cut
+    STOPPING_POINT = re.compile(r'[.!?]["\')\]]*(?=\s|$)|\n\s*\n')
+    # Streamed replies past this share of the token budget stop at the next stopping point
+    SOFT_BUDGET = 0.75
+    # Shorter cut-off replies are replaced by the default response
+    MIN_REPLY_WORDS = 5
+    # Analyses missing any of these are used but not cached
+    REQUIRED_FIELDS = ('category', 'priority', 'requires_attention')
+
+    def __init__(self, model_name: str = "gemma:3b", host: Optional[str] = None, timeout: Optional[float] = None,
+                 keep_alive: Optional[str] = None, cache: Optional[AnalysisCache] = None,
+                 stream_replies: Optional[bool] = None, reply_tokens: Optional[int] = None,
+                 reply_deadline: Optional[float] = None):
         self.model = model_name
+        self.cache = cache
+        self.host = host
+        self.timeout = timeout
+        self._client = None
+        self._client_lock = threading.Lock()
+        # How long Ollama keeps the model loaded after a request
+        self.keep_alive = keep_alive or os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+        # Replies are streamed with a token budget and a per-email deadline in seconds
+        if stream_replies is None:
+            stream_replies = os.getenv('OLLAMA_STREAM_REPLIES', '1').lower() not in ('0', 'false', 'no')
+        self.stream_replies = stream_replies
+        self.reply_tokens = reply_tokens or int(os.getenv('OLLAMA_REPLY_TOKENS', '256'))
+        self.reply_deadline = reply_deadline or float(os.getenv('OLLAMA_REPLY_DEADLINE', '30'))
+        # When the last request finished, to tell whether the model may have been unloaded
+        self._last_request = 0.0
+        self._warming = False
+        self._warm_lock = threading.Lock()
         self.system_prompt = """You are an intelligent email assistant. Your tasks are:
 1. Analyze email content for intent and urgency
 2. Categorize emails into: urgent, meeting, inquiry, follow_up, or general
@@ -14,79 +112,316 @@ class OllamaAgent:
 
 Be concise and accurate in your analysis."""
     
+    @property
+    def client(self):
+        """The Ollama client, created (and the library imported) on first use.
+        
+        The client is shared by analysis workers; ``timeout`` bounds each request.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import ollama
+                    self._client = ollama.Client(host=self.host, timeout=self.timeout)
+        return self._client
+    
     def analyze_email(self, subject: str, snippet: str) -> Dict[str, Any]:
         """Analyze email content using Ollama."""
-        prompt = f"""Analyze this email:
-Subject: {subject}
-Content: {snippet}
-
-Provide analysis in JSON format with these fields:
-- category: one of [urgent, meeting, inquiry, follow_up, general]
-- priority: number 0-3
-- requires_attention: boolean
-- intent: brief description of email's purpose
-- suggested_response: brief template for response"""
-
+        cache_key = self._cache_key(self.ANALYSIS_INSTRUCTIONS + self.EMAIL_PROMPT, subject, snippet)
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            return cached
+        
+        prompt = self.EMAIL_PROMPT.format(subject=subject, snippet=snippet)
         try:
-            response = ollama.generate(
-                model=self.model,
-                prompt=prompt,
-                system=self.system_prompt
-            )
+            response = self._generate('analyze', self.ANALYSIS_INSTRUCTIONS, prompt, format='json')
             
             # Extract JSON from response
-            analysis = self._parse_ollama_response(response['response'])
+            analysis, valid = self._parse_ollama_response(response['message']['content'])
+            # Fallbacks are used this once, never served from the cache
+            if valid:
+                self._put_cached(cache_key, analysis)
+            else:
+                metrics.inc('ollama_invalid_responses_total', operation='analyze')
             return analysis
         except Exception as e:
+            metrics.inc('ollama_errors_total', operation='analyze')
             print(f"Error in Ollama analysis: {e}")
             return self._get_default_analysis()
     
     def generate_response(self, email_data: Dict[str, Any]) -> str:
         """Generate a response using Ollama."""
-        prompt = f"""Generate a response for this email:
-Category: {email_data['category']}
-Priority: {email_data['priority']}
-Subject: {email_data['subject']}
-Content: {email_data['snippet']}
-
-Generate a professional, concise response that:
-1. Acknowledges the email's purpose
-2. Provides appropriate level of urgency
-3. Maintains professional tone
-4. Is specific to the email's category"""
+        prompt = self.DRAFT_PROMPT.format(**email_data)
 
         try:
-            response = ollama.generate(
-                model=self.model,
-                prompt=prompt,
-                system=self.system_prompt
-            )
-            return response['response'].strip()
+            if not self.stream_replies:
+                response = self._generate('draft', self.DRAFT_INSTRUCTIONS, prompt)
+                return response['message']['content'].strip()
+            reply, reason = self._stream_reply(prompt)
         except Exception as e:
+            metrics.inc('ollama_errors_total', operation='draft')
             print(f"Error generating response: {e}")
             return self._get_default_response(email_data['category'])
+        
+        if reason != 'done':
+            metrics.inc('ollama_reply_cutoffs_total', reason=reason)
+            reply = self._trim_reply(reply)
+        if len(reply.split()) < self.MIN_REPLY_WORDS:
+            metrics.inc('ollama_reply_fallbacks_total', reason=reason)
+            return self._get_default_response(email_data['category'])
+        return reply.strip()
+    
+    def analyze_and_draft(self, subject: str, snippet: str) -> Dict[str, Any]:
+        """Analyze an email and draft its reply in a single generation.
+        
+        Returns the analysis fields plus the drafted ``reply``.
+        """
+        cache_key = self._cache_key(self.ANALYZE_AND_DRAFT_INSTRUCTIONS + self.EMAIL_PROMPT, subject, snippet)
+        analysis = self._get_cached(cache_key)
+        
+        if analysis is None:
+            prompt = self.EMAIL_PROMPT.format(subject=subject, snippet=snippet)
+            try:
+                response = self._generate('analyze_and_draft', self.ANALYZE_AND_DRAFT_INSTRUCTIONS, prompt,
+                                          format='json')
+                analysis, valid = self._validate_analysis(response['message']['content'])
+                if valid:
+                    self._put_cached(cache_key, analysis)
+                else:
+                    metrics.inc('ollama_invalid_responses_total', operation='analyze_and_draft')
+            except Exception as e:
+                metrics.inc('ollama_errors_total', operation='analyze_and_draft')
+                print(f"Error in Ollama analysis: {e}")
+                analysis = self._get_default_analysis()
+        
+        if not analysis.get('reply'):
+            analysis['reply'] = self._get_default_response(analysis['category'])
+        return analysis
+    
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the ``EMBEDDING_MODEL`` Ollama model.
+        
+        Clients with the batch ``embed`` API (ollama>=0.3) send all texts in
+        one request; older ones send one request per text.
+        """
+        model = os.getenv('EMBEDDING_MODEL', 'nomic-embed-text')
+        with metrics.timer('ollama_request_seconds', operation='embed'):
+            if hasattr(self.client, 'embed'):
+                return [list(vector) for vector in
+                        self.client.embed(model=model, input=texts, keep_alive=self.keep_alive)['embeddings']]
+            return [self.client.embeddings(model=model, prompt=text, keep_alive=self.keep_alive)['embedding']
+                    for text in texts]
+    
+    def keep_warm(self) -> None:
+        """Warm the model up in the background if it may have been unloaded.
+        
+        Cheap enough to call every polling cycle: a request is only made when
+        the model has not been used yet, or has been idle for over half its
+        ``keep_alive``.
+        """
+        keep_alive = keep_alive_seconds(self.keep_alive)
+        if keep_alive == 0:
+            return
+        with self._warm_lock:
+            idle = time.monotonic() - self._last_request
+            if self._warming or (self._last_request and (keep_alive is None or idle < keep_alive / 2)):
+                return
+            self._warming = True
+        threading.Thread(target=self._warm_in_background, daemon=True, name='ollama-warm').start()
     
-    def _parse_ollama_response(self, response: str) -> Dict[str, Any]:
-        """Parse Ollama's response into structured data."""
+    def warm(self) -> None:
+        """Load the model and evaluate each operation's shared opening once."""
+        with metrics.timer('ollama_request_seconds', operation='load'):
+            # A request without a prompt only loads the model
+            response = self.client.generate(model=self.model, keep_alive=self.keep_alive)
+        self._record_usage('load', response)
+        for instructions in (self.ANALYZE_AND_DRAFT_INSTRUCTIONS, self.ANALYSIS_INSTRUCTIONS,
+                             self.DRAFT_INSTRUCTIONS):
+            self._generate('warm', instructions, self.WARMUP_EMAIL, options={'num_predict': 1})
+    
+    def _warm_in_background(self) -> None:
+        try:
+            self.warm()
+        except Exception as e:
+            metrics.inc('ollama_errors_total', operation='warm')
+            print(f"Error warming up Ollama model: {e}")
+        finally:
+            with self._warm_lock:
+                self._warming = False
+    
+    def _stream_reply(self, prompt: str) -> Tuple[str, str]:
+        """Stream a reply, stopping early past the soft budget or the deadline.
+        
+        Returns the text so far and why the stream ended: ``done``, ``budget``
+        (the token budget ran out), ``soft_budget`` or ``deadline``. The
+        deadline is checked as tokens arrive; a server that sends nothing is
+        bounded by the client ``timeout``.
+        """
+        deadline = time.monotonic() + self.reply_deadline
+        soft_limit = int(self.reply_tokens * self.SOFT_BUDGET)
+        parts: List[str] = []
+        tokens = 0
+        # Closing the stream early drops the connection, which stops the generation
+        with closing(self._stream('draft', self.DRAFT_INSTRUCTIONS, prompt,
+                                  options={'num_predict': self.reply_tokens})) as stream:
+            for chunk in stream:
+                text = chunk.get('message', {}).get('content', '')
+                parts.append(text)
+                if chunk.get('done'):
+                    if chunk.get('done_reason') == 'length' or chunk.get('eval_count', 0) >= self.reply_tokens:
+                        return ''.join(parts), 'budget'
+                    return ''.join(parts), 'done'
+                tokens += 1
+                if time.monotonic() > deadline:
+                    return ''.join(parts), 'deadline'
+                if tokens >= soft_limit and self.STOPPING_POINT.search(text):
+                    return ''.join(parts), 'soft_budget'
+        return ''.join(parts), 'done'
+    
+    def _trim_reply(self, reply: str) -> str:
+        """Cut a partial reply back to its last complete sentence or paragraph."""
+        end = 0
+        for match in self.STOPPING_POINT.finditer(reply):
+            end = match.end()
+        return reply[:end].strip()
+    
+    def _messages(self, instructions: str, prompt: str) -> List[Dict[str, str]]:
+        """Build a chat that opens the same way for every email given ``instructions``."""
+        return [
+            {'role': 'system', 'content': self.system_prompt},
+            {'role': 'user', 'content': instructions},
+            {'role': 'assistant', 'content': self.ACKNOWLEDGEMENT},
+            {'role': 'user', 'content': prompt}
+        ]
+    
+    def _generate(self, operation: str, instructions: str, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Run a chat request, recording latency and token usage."""
+        with metrics.timer('ollama_request_seconds', operation=operation):
+            response = self.client.chat(
+                model=self.model,
+                messages=self._messages(instructions, prompt),
+                keep_alive=self.keep_alive,
+                **kwargs
+            )
+        self._last_request = time.monotonic()
+        self._record_usage(operation, response)
+        return response
+    
+    def _stream(self, operation: str, instructions: str, prompt: str, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Stream a chat response chunk by chunk, recording latency and token usage."""
+        start = time.perf_counter()
+        chunks = self.client.chat(
+            model=self.model,
+            messages=self._messages(instructions, prompt),
+            keep_alive=self.keep_alive,
+            stream=True,
+            **kwargs
+        )
+        try:
+            for chunk in chunks:
+                if chunk.get('done'):
+                    self._record_usage(operation, chunk)
+                yield chunk
+        finally:
+            chunks.close()
+            self._last_request = time.monotonic()
+            metrics.observe('ollama_request_seconds', time.perf_counter() - start, operation=operation)
+    
+    def _record_usage(self, operation: str, response: Dict[str, Any]) -> None:
+        if metrics.enabled:
+            metrics.inc('ollama_tokens_total', response.get('prompt_eval_count', 0), kind='prompt', operation=operation)
+            metrics.inc('ollama_tokens_total', response.get('eval_count', 0), kind='eval', operation=operation)
+            # Ollama reports durations in nanoseconds
+            for field in ('load_duration', 'prompt_eval_duration', 'eval_duration'):
+                if response.get(field):
+                    metrics.observe(f"ollama_{field[:-len('_duration')]}_seconds", response[field] / 1e9,
+                                    operation=operation)
+    
+    def _cache_key(self, template: str, subject: str, snippet: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.make_key(self.model, self.system_prompt + template, subject, snippet)
+    
+    def _get_cached(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not cache_key:
+            return None
+        cached = self.cache.get(cache_key)
+        metrics.inc('analysis_cache_lookups_total', result='miss' if cached is None else 'hit')
+        return cached
+    
+    def _put_cached(self, cache_key: Optional[str], analysis: Dict[str, Any]) -> None:
+        if cache_key:
+            self.cache.put(cache_key, analysis)
+    
+    def _validate_analysis(self, response: str) -> Tuple[Dict[str, Any], bool]:
+        """Validate a JSON analysis against the schema, repairing it if needed.
+        
+        Returns the analysis and whether it was valid without repairs.
+        """
+        data = self._load_json(response)
+        if data is None:
+            raise ValueError("no JSON object found in response")
+        return self._coerce_analysis(data)
+    
+    def _coerce_analysis(self, data: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Validate parsed analysis data, keeping whichever fields are valid.
+        
+        Returns the analysis and whether ``data`` was valid as it is: every
+        value usable and the ``REQUIRED_FIELDS`` present.
+        """
+        from pydantic import ValidationError
+        from ..model.analysis import EmailAnalysis
+        
+        try:
+            analysis = EmailAnalysis.model_validate(data, context={'strict': True}).model_dump()
+            return analysis, all(field in data for field in self.REQUIRED_FIELDS)
+        except ValidationError:
+            analysis = EmailAnalysis().model_dump()
+            for field, value in data.items():
+                try:
+                    analysis.update(EmailAnalysis.model_validate({field: value}).model_dump(include={field}))
+                except ValidationError:
+                    pass
+            return analysis, False
+    
+    def _load_json(self, response: str) -> Optional[Dict[str, Any]]:
+        """Load a JSON object, tolerating code fences and text around it."""
+        text = response.strip()
+        try:
+            data = json.loads(text)
+            return data if isinstance(data, dict) else None
+        except ValueError:
+            pass
+        
+        # Decode the first complete object instead of guessing where it ends
+        decoder = json.JSONDecoder()
+        start = text.find('{')
+        while start != -1:
+            try:
+                data, _ = decoder.raw_decode(text, start)
+                if isinstance(data, dict):
+                    return data
+            except ValueError:
+                pass
+            start = text.find('{', start + 1)
+        return None
+    
+    def _parse_ollama_response(self, response: str) -> Tuple[Dict[str, Any], bool]:
+        """Parse Ollama's response into structured data.
+        
+        Returns the analysis and whether it is valid. Responses without a
+        valid JSON analysis are parsed line by line, or replaced by the
+        default analysis, and reported as invalid.
+        """
         try:
             # Extract JSON from response
-            import json
-            import re
-            
-            # Find JSON in the response
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
+            data = self._load_json(response)
+            if data is not None:
+                return self._coerce_analysis(data)
             
             # If no JSON found, parse the response manually
             lines = response.split('\n')
-            analysis = {
-                'category': 'general',
-                'priority': 0,
-                'requires_attention': False,
-                'intent': 'unknown',
-                'suggested_response': 'Thank you for your email.'
-            }
+            analysis = self._get_default_analysis()
             
             for line in lines:
                 if 'category:' in line.lower():
@@ -103,10 +438,11 @@ Generate a professional, concise response that:
                 elif 'suggested_response:' in line.lower():
                     analysis['suggested_response'] = line.split(':')[1].strip()
             
-            return analysis
+            analysis, _ = self._coerce_analysis(analysis)
+            return analysis, False
         except Exception as e:
             print(f"Error parsing Ollama response: {e}")
-            return self._get_default_analysis()
+            return self._get_default_analysis(), False
     
     def _get_default_analysis(self) -> Dict[str, Any]:
         """Return default analysis when Ollama fails."""
@@ -0,0 +1,341 @@
+import base64
+import copy
+import email
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Union
+
+
+class FakeHttpError(Exception):
+    """Stand-in for googleapiclient.errors.HttpError."""
+
+    def __init__(self, status: int, reason: str = ""):
+        super().__init__(f"<HttpError {status}: {reason}>")
+        self.resp = type('FakeResponse', (), {'status': status, 'reason': reason})()
+        self.status_code = status
+        self.reason = reason
+
+
+class _FakeRequest:
+    def __init__(self, service: 'FakeGmailService', handler: Callable[..., Dict[str, Any]], kwargs: Dict[str, Any],
+                 method: str = ''):
+        self._service = service
+        self._handler = handler
+        self._kwargs = kwargs
+        self.method = method
+
+    def _call(self) -> Dict[str, Any]:
+        response = self._handler(**self._kwargs)
+        with self._service._stats_lock:
+            self._service.stats['requests'] += 1
+            self._service.stats['bytes'] += len(json.dumps(response))
+        return response
+
+    def execute(self, http=None, num_retries: int = 0) -> Dict[str, Any]:
+        self._service._round_trip(self.method)
+        return self._call()
+
+
+class _FakeBatch:
+    MAX_BATCH_SIZE = 100
+
+    def __init__(self, service: 'FakeGmailService', callback: Optional[Callable] = None):
+        self._service = service
+        self._callback = callback
+        self._requests: List[Any] = []
+
+    def add(self, request: _FakeRequest, callback: Optional[Callable] = None, request_id: Optional[str] = None) -> None:
+        if len(self._requests) >= self.MAX_BATCH_SIZE:
+            raise ValueError(f"Batch requests are limited to {self.MAX_BATCH_SIZE} calls")
+        request_id = request_id or str(len(self._requests) + 1)
+        self._requests.append((request_id, request, callback or self._callback))
+
+    def execute(self, http=None) -> None:
+        self._service._round_trip('batch')
+        for request_id, request, callback in self._requests:
+            try:
+                response = request._call()
+            except Exception as e:
+                callback(request_id, None, e)
+            else:
+                callback(request_id, response, None)
+
+
+class _FakeMessages:
+    def __init__(self, service: 'FakeGmailService'):
+        self._service = service
+
+    def list(self, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._service, self._service._list_messages, kwargs, 'messages.list')
+
+    def get(self, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._service, self._service._get_message, kwargs, 'messages.get')
+
+    def send(self, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._service, self._service._send_message, kwargs, 'messages.send')
+
+    def attachments(self) -> '_FakeAttachments':
+        return _FakeAttachments(self._service)
+
+
+class _FakeAttachments:
+    def __init__(self, service: 'FakeGmailService'):
+        self._service = service
+
+    def get(self, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._service, self._service._get_attachment, kwargs, 'messages.attachments.get')
+
+
+class _FakeHistory:
+    def __init__(self, service: 'FakeGmailService'):
+        self._service = service
+
+    def list(self, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._service, self._service._list_history, kwargs, 'history.list')
+
+
+class _FakeUsers:
+    def __init__(self, service: 'FakeGmailService'):
+        self._service = service
+
+    def messages(self) -> _FakeMessages:
+        return _FakeMessages(self._service)
+
+    def history(self) -> _FakeHistory:
+        return _FakeHistory(self._service)
+
+    def getProfile(self, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._service, self._service._get_profile, kwargs, 'getProfile')
+
+    def watch(self, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._service, self._service._watch, kwargs, 'watch')
+
+    def stop(self, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._service, self._service._stop_watch, kwargs, 'stop')
+
+
+class FakeGmailService:
+    """In-memory stand-in for the discovery-built Gmail service.
+
+    Counts HTTP round trips and response bytes so fetch strategies can be
+    compared without a live account. ``latency`` is seconds per round trip,
+    or a callable mapping a method name such as ``messages.list`` (or
+    ``batch``) to seconds. While a watch is active, ``on_notify``
+    is called with a Gmail push notification for every added message.
+
+    Sends can be throttled: more than ``send_rate_limit`` sends per second
+    answer 429, a ``send_error_rate`` fraction answer 503 without sending,
+    and a ``lost_response_rate`` fraction send but still answer 503.
+
+    Messages can be added with a MIME ``payload`` tree. As in Gmail, parts
+    with a file name, and parts over ``INLINE_PART_BYTES``, are returned
+    with an ``attachmentId`` instead of their data.
+    """
+
+    INLINE_PART_BYTES = 4 << 20
+
+    def __init__(self, latency: Union[float, Callable[[str], float]] = 0.0, on_notify: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 send_rate_limit: Optional[float] = None, send_error_rate: float = 0.0,
+                 lost_response_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.on_notify = on_notify
+        self.watching = False
+        self.send_rate_limit = send_rate_limit
+        self.send_error_rate = send_error_rate
+        self.lost_response_rate = lost_response_rate
+        self._random = random.Random(seed)
+        self._send_times: List[float] = []
+        self._send_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.attachments: Dict[str, str] = {}
+        self.sent: List[Dict[str, Any]] = []
+        self.stats = {'round_trips': 0, 'requests': 0, 'bytes': 0}
+        self.history: List[Dict[str, Any]] = []
+        self.history_id = 1000
+        self._min_history_id = self.history_id
+        self._next_id = 1
+
+    def users(self) -> _FakeUsers:
+        return _FakeUsers(self)
+
+    def new_batch_http_request(self, callback: Optional[Callable] = None) -> _FakeBatch:
+        return _FakeBatch(self, callback)
+
+    def reset_stats(self) -> None:
+        self.stats = {'round_trips': 0, 'requests': 0, 'bytes': 0}
+
+    def add_message(self, sender: str, subject: str, snippet: str, body: str = "",
+                    labels: Optional[List[str]] = None, thread_id: Optional[str] = None,
+                    received_at: Optional[datetime] = None, payload: Optional[Dict[str, Any]] = None,
+                    references: Optional[str] = None) -> Dict[str, Any]:
+        """Add a message to the fake mailbox and return its full resource."""
+        message_id = f"{self._next_id:016x}"
+        self._next_id += 1
+        received_at = received_at or datetime.now()
+        body = body or snippet
+        if payload is None:
+            payload = {
+                'mimeType': 'text/plain',
+                'body': {
+                    'size': len(body),
+                    'data': base64.urlsafe_b64encode(body.encode()).decode(),
+                },
+            }
+        payload = dict(payload, headers=[
+            {'name': 'From', 'value': sender},
+            {'name': 'To', 'value': 'me@example.com'},
+            {'name': 'Subject', 'value': subject},
+            {'name': 'Date', 'value': received_at.strftime('%a, %d %b %Y %H:%M:%S +0000')},
+            {'name': 'Message-ID', 'value': f"<{message_id}@mail.example.com>"},
+        ] + ([{'name': 'References', 'value': references}] if references else [])
+            + list(payload.get('headers', [])))
+        size = self._store_attachments(message_id, payload)
+        message = {
+            'id': message_id,
+            'threadId': thread_id or message_id,
+            'labelIds': list(labels or ['INBOX', 'UNREAD']),
+            'snippet': snippet,
+            'internalDate': str(int(received_at.timestamp() * 1000)),
+            'sizeEstimate': size,
+            'payload': payload,
+        }
+        self.messages[message_id] = message
+        self.history_id += 1
+        message['historyId'] = str(self.history_id)
+        self.history.append({
+            'id': str(self.history_id),
+            'messagesAdded': [{'message': {
+                'id': message_id,
+                'threadId': message['threadId'],
+                'labelIds': list(message['labelIds']),
+            }}],
+        })
+        if self.watching and self.on_notify:
+            self.on_notify({'emailAddress': 'me@example.com', 'historyId': self.history_id})
+        return message
+
+    def _store_attachments(self, message_id: str, part: Dict[str, Any]) -> int:
+        """Replace the data of attachment parts with ids, returning the size of the part tree."""
+        if part.get('parts'):
+            part['parts'] = [dict(child) for child in part['parts']]
+            return sum(self._store_attachments(message_id, child) for child in part['parts'])
+        body = dict(part.get('body') or {})
+        data = body.get('data')
+        if data is not None and (part.get('filename') or len(data) > self.INLINE_PART_BYTES):
+            attachment_id = f"{message_id}-{len(self.attachments)}"
+            self.attachments[attachment_id] = body.pop('data')
+            body['attachmentId'] = attachment_id
+        part['body'] = body
+        return body.get('size', 0)
+
+    def expire_history(self) -> None:
+        """Drop all history records, as Gmail does after roughly a week."""
+        self.history = []
+        self._min_history_id = self.history_id
+
+    def _round_trip(self, method: str = '') -> None:
+        with self._stats_lock:
+            self.stats['round_trips'] += 1
+        delay = self.latency(method) if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+
+    def _list_messages(self, userId: str, labelIds: Optional[List[str]] = None,
+                       maxResults: int = 100, pageToken: Optional[str] = None, q: Optional[str] = None,
+                       **kwargs) -> Dict[str, Any]:
+        q = q or ""
+        if 'rfc822msgid:' in q:
+            wanted = q.split('rfc822msgid:')[1].split()[0]
+            with self._send_lock:
+                found = [s['response'] for s in self.sent if s['message_id'] == wanted]
+            return {'messages': found[:maxResults], 'resultSizeEstimate': len(found)}
+        labels = set(labelIds or [])
+        # Only the after:<unix time> search operator is supported
+        after = re.search(r'\bafter:(\d+)', q)
+        matching = [m for m in reversed(list(self.messages.values()))
+                    if labels.issubset(m['labelIds'])
+                    and (after is None or int(m['internalDate']) // 1000 > int(after.group(1)))]
+        start = int(pageToken or 0)
+        end = start + min(maxResults, 500)
+        response = {
+            'messages': [{'id': m['id'], 'threadId': m['threadId']} for m in matching[start:end]],
+            'resultSizeEstimate': len(matching),
+        }
+        if end < len(matching):
+            response['nextPageToken'] = str(end)
+        return response
+
+    def _get_message(self, userId: str, id: str, format: str = 'full',
+                     metadataHeaders: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        if id not in self.messages:
+            raise FakeHttpError(404, "Requested entity was not found.")
+        message = copy.deepcopy(self.messages[id])
+        if format == 'minimal':
+            del message['payload']
+        elif format == 'metadata':
+            wanted = {h.lower() for h in metadataHeaders or []}
+            headers = message['payload']['headers']
+            message['payload'] = {
+                'mimeType': message['payload']['mimeType'],
+                'headers': [h for h in headers if not wanted or h['name'].lower() in wanted],
+            }
+        return message
+
+    def _get_attachment(self, userId: str, messageId: str, id: str, **kwargs) -> Dict[str, Any]:
+        if id not in self.attachments:
+            raise FakeHttpError(404, "Requested entity was not found.")
+        return {'attachmentId': id, 'size': len(self.attachments[id]) * 3 // 4, 'data': self.attachments[id]}
+
+    def _send_message(self, userId: str, body: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        with self._send_lock:
+            now = time.time()
+            if self.send_rate_limit is not None:
+                self._send_times = [t for t in self._send_times if now - t < 1.0]
+                if len(self._send_times) >= self.send_rate_limit:
+                    raise FakeHttpError(429, "User-rate limit exceeded")
+                self._send_times.append(now)
+            if self._random.random() < self.send_error_rate:
+                raise FakeHttpError(503, "Backend Error")
+
+            message_id = f"sent{len(self.sent) + 1:012x}"
+            sent = {'id': message_id, 'threadId': body.get('threadId', message_id), 'labelIds': ['SENT']}
+            raw = email.message_from_bytes(base64.urlsafe_b64decode(body['raw']))
+            self.sent.append({'response': sent, 'body': body, 'message_id': raw['Message-ID'], 'sent_at': now})
+            if self._random.random() < self.lost_response_rate:
+                raise FakeHttpError(503, "Backend Error")
+        return sent
+
+    def _get_profile(self, userId: str, **kwargs) -> Dict[str, Any]:
+        return {
+            'emailAddress': 'me@example.com',
+            'messagesTotal': len(self.messages),
+            'historyId': str(self.history_id),
+        }
+
+    def _watch(self, userId: str, body: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        self.watching = True
+        expiration = int((time.time() + 7 * 24 * 3600) * 1000)
+        return {'historyId': str(self.history_id), 'expiration': str(expiration)}
+
+    def _stop_watch(self, userId: str, **kwargs) -> Dict[str, Any]:
+        self.watching = False
+        return {}
+
+    def _list_history(self, userId: str, startHistoryId: str, labelId: Optional[str] = None,
+                      historyTypes: Optional[List[str]] = None, maxResults: int = 100,
+                      pageToken: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        if int(startHistoryId) < self._min_history_id:
+            raise FakeHttpError(404, "Requested entity was not found.")
+        records = [r for r in self.history if int(r['id']) > int(startHistoryId)
+                   and (not labelId or any(labelId in a['message']['labelIds'] for a in r['messagesAdded']))]
+        start = int(pageToken or 0)
+        end = start + min(maxResults, 500)
+        response = {'history': records[start:end], 'historyId': str(self.history_id)}
+        if end < len(records):
+            response['nextPageToken'] = str(end)
+        return response
@@ -0,0 +1,235 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from gmail_mcp_agent.utils.ollama_agent import keep_alive_seconds
+
+
+class FakeOllamaServer:
+    """Local HTTP stand-in for the Ollama API with configurable latency.
+
+    Answers ``/api/generate`` and ``/api/chat`` with a canned analysis (for
+    prompts asking for JSON) or a short reply, after sleeping ``latency``
+    seconds plus up to ``jitter`` seconds, ``prompt_token_latency`` per
+    evaluated prompt token (default ``token_latency``) and ``token_latency``
+    per generated token. Token counts are approximated by word counts, and
+    ``options.num_predict`` caps the generated tokens. A ``ramble`` share of
+    replies run on for ``ramble_tokens``. Streaming requests get one NDJSON
+    chunk per token; a client that disconnects stops the generation.
+
+    The model is loaded on the first request, taking ``load_latency``, and
+    unloaded once idle for the request's ``keep_alive``; a generate request
+    without a prompt only loads it. With ``prompt_cache``, each of
+    ``parallel`` slots keeps the tokens of its last request, and a request
+    only evaluates the tokens past its longest common prefix with a slot,
+    like Ollama's runner.
+    """
+
+    REPLY = "Thank you for your email. I will get back to you soon."
+    RAMBLE = ("I also wanted to share some further thoughts on the points you raised. "
+              "There are several considerations we should keep in mind going forward. ")
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, token_latency: float = 0.0,
+                 port: int = 0, seed: Optional[int] = None, ramble: float = 0.0, ramble_tokens: int = 500,
+                 prompt_token_latency: Optional[float] = None, load_latency: float = 0.0,
+                 prompt_cache: bool = False, parallel: int = 4):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.prompt_token_latency = token_latency if prompt_token_latency is None else prompt_token_latency
+        self.load_latency = load_latency
+        self.prompt_cache = prompt_cache
+        self.parallel = parallel
+        self.loads = 0
+        self._loaded = False
+        self._loaded_until: Optional[float] = None
+        self._ready_at = 0.0
+        self._slots: List[List[str]] = []
+        self.ramble = ramble
+        self.ramble_tokens = ramble_tokens
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.eval_tokens = 0
+        self.cancelled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> 'FakeOllamaServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'FakeOllamaServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _delay(self, response: Dict[str, Any]) -> float:
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += response.get('prompt_eval_count', 0)
+            self.eval_tokens += response.get('eval_count', 0)
+            return (self.latency + self._random.uniform(0, self.jitter) + response['load_duration'] / 1e9
+                    + response['prompt_eval_duration'] / 1e9 + response.get('eval_count', 0) * self.token_latency)
+
+    def _evaluate(self, tokens: List[str], keep_alive: Any) -> Tuple[float, int]:
+        """Load the model if needed and count the prompt tokens not already in a slot's cache.
+
+        Returns the time spent loading, or waiting for a load in progress,
+        and the number of tokens to evaluate.
+        """
+        now = time.monotonic()
+        with self._lock:
+            load = max(0.0, self._ready_at - now)
+            if not self._loaded or (self._loaded_until is not None and now > self._loaded_until):
+                load = self.load_latency
+                self.loads += 1
+                self._loaded = True
+                self._ready_at = now + load
+                self._slots.clear()
+            seconds = keep_alive_seconds('5m' if keep_alive is None else keep_alive)
+            self._loaded_until = None if seconds is None else now + load + seconds
+            if not self.prompt_cache or not tokens:
+                return load, len(tokens)
+
+            def common(slot: List[str]) -> int:
+                length = 0
+                for cached, token in zip(slot, tokens):
+                    if cached != token:
+                        break
+                    length += 1
+                return length
+
+            best = max(range(len(self._slots)), key=lambda i: common(self._slots[i]), default=None)
+            reused = common(self._slots[best]) if best is not None else 0
+            if best is not None and (reused or len(self._slots) >= self.parallel):
+                self._slots.pop(best)
+            self._slots.append(tokens)
+            # The last prompt token is always evaluated
+            return load, max(1, len(tokens) - reused)
+
+    def generate(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the response body for a generate or chat request."""
+        if 'messages' in request:
+            prompt = '\n'.join(f"<{message['role']}> {message['content']}" for message in request['messages'])
+        else:
+            prompt = request.get('prompt', '')
+            if not prompt:
+                load, _ = self._evaluate([], request.get('keep_alive'))
+                return {'model': request.get('model', ''), 'response': '', 'done': True, 'done_reason': 'load',
+                        'load_duration': int(load * 1e9), 'prompt_eval_duration': 0}
+            prompt = request.get('system', '') + ' ' + prompt
+        load, prompt_tokens = self._evaluate(prompt.split(), request.get('keep_alive'))
+        reply = self.REPLY
+        with self._lock:
+            rambling = self._random.random() < self.ramble
+        if 'JSON' in prompt or request.get('format') == 'json':
+            analysis = {
+                'category': 'general',
+                'priority': 1,
+                'requires_attention': False,
+                'intent': 'informational',
+                'suggested_response': 'Thank you for your email.',
+            }
+            if 'reply' in prompt:
+                analysis['reply'] = reply
+            text = json.dumps(analysis)
+        else:
+            text = reply
+            if rambling:
+                words = (self.RAMBLE * (self.ramble_tokens // len(self.RAMBLE.split()) + 1)).split()
+                text = reply + ' ' + ' '.join(words[:self.ramble_tokens])
+        words = text.split(' ')
+        limit = (request.get('options') or {}).get('num_predict')
+        done_reason = 'stop'
+        if limit and limit > 0 and len(words) > limit:
+            words, done_reason = words[:limit], 'length'
+        body = {
+            'model': request.get('model', ''),
+            'response': ' '.join(words),
+            'done': True,
+            'done_reason': done_reason,
+            'load_duration': int(load * 1e9),
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': int(prompt_tokens * self.prompt_token_latency * 1e9),
+            'eval_count': len(words),
+        }
+        if 'messages' in request:
+            body['message'] = {'role': 'assistant', 'content': body.pop('response')}
+        return body
+
+    def _stream(self, handler: BaseHTTPRequestHandler, body: Dict[str, Any], start: float) -> None:
+        """Send a generation as NDJSON, one token per chunk."""
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += body['prompt_eval_count']
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        time.sleep(delay + (body['load_duration'] + body['prompt_eval_duration']) / 1e9)
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/x-ndjson')
+        handler.end_headers()
+        chat = 'message' in body
+        try:
+            for i, word in enumerate((body['message']['content'] if chat else body['response']).split(' ')):
+                time.sleep(self.token_latency)
+                text = word if i == 0 else ' ' + word
+                chunk = {'model': body['model'], 'done': False}
+                chunk.update({'message': {'role': 'assistant', 'content': text}} if chat else {'response': text})
+                handler.wfile.write(json.dumps(chunk).encode() + b'\n')
+                handler.wfile.flush()
+                with self._lock:
+                    self.eval_tokens += 1
+            final = dict(body, total_duration=int((time.perf_counter() - start) * 1e9))
+            final.update({'message': {'role': 'assistant', 'content': ''}} if chat else {'response': ''})
+            handler.wfile.write(json.dumps(final).encode() + b'\n')
+        except (BrokenPipeError, ConnectionResetError):
+            with self._lock:
+                self.cancelled += 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                start = time.perf_counter()
+
+                if self.path in ('/api/generate', '/api/chat') and request.get('stream'):
+                    server._stream(self, server.generate(request), start)
+                elif self.path in ('/api/generate', '/api/chat'):
+                    body = server.generate(request)
+                    time.sleep(server._delay(body))
+                    body['total_duration'] = int((time.perf_counter() - start) * 1e9)
+                    self._send(200, body)
+                else:
+                    self._send(404, {'error': f"unknown endpoint {self.path}"})
+
+            def _send(self, status: int, body: Dict[str, Any]) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,474 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Iterable, Optional
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+
+
+class Sanitizer:
+    """Deterministic pseudonymization of email text for fixtures.
+
+    Every word, in any script, becomes an ASCII pseudo-word of the same
+    length, every run of digits other digits (so codes and phone numbers
+    keep their shape) and every address a
+    ``user-<hash>@<hash>.example.com`` address, keyed on a salt that is never
+    written out. Fixtures keep the shape and repetition of the mailbox (the
+    same sender or word always maps to the same token) but not its content.
+    Words in ``keep``, such as the rule classifier's keywords, and role
+    addresses like ``noreply@`` pass through so rules behave the same on replay.
+    """
+
+    TOKEN = re.compile(r"(?P<address>[\w.+-]+@[\w-]+(?:\.[\w-]+)+)|(?P<word>[^\W\d_]+)|(?P<number>\d+)",
+                       re.UNICODE)
+    ROLE_ADDRESS = re.compile(r"^(no-?reply|do-?not-?reply|notifications?|mailer-daemon|newsletters?)$", re.IGNORECASE)
+
+    def __init__(self, keep: Iterable[str] = (), salt: Optional[bytes] = None):
+        self.keep = {word.lower() for word in keep}
+        self._salt = salt or secrets.token_bytes(16)
+
+    def text(self, value: str) -> str:
+        return self.TOKEN.sub(self._replace, value or '')
+
+    def _replace(self, match: 're.Match') -> str:
+        if match.group('address'):
+            local, domain = match.group('address').split('@', 1)
+            if not self.ROLE_ADDRESS.match(local):
+                local = f"user-{self._digest(local.lower())[:8]}"
+            return f"{local}@{self._digest(domain.lower())[:8]}.example.com"
+        number = match.group('number')
+        if number:
+            return self._scramble(number, '0', 10)
+        word = match.group('word')
+        if word.lower() in self.keep:
+            return word
+        pseudo = self._scramble(word.lower(), 'a', 26)
+        return pseudo.capitalize() if word[0].isupper() else pseudo
+
+    def _scramble(self, token: str, first: str, size: int) -> str:
+        """Map ``token`` to as many characters from ``first`` on, never to itself."""
+        digest = bytes.fromhex(self._digest(token, len(token)))
+        # Digests are at most 64 bytes, so longer tokens reuse them
+        codes = [digest[i % len(digest)] % size for i in range(len(token))]
+        pseudo = ''.join(chr(ord(first) + code) for code in codes)
+        if pseudo == token:
+            pseudo = ''.join(chr(ord(first) + (code + 1) % size) for code in codes)
+        return pseudo
+
+    def _digest(self, value: str, size: int = 8) -> str:
+        return hashlib.blake2b(value.encode(), key=self._salt, digest_size=max(1, min(size, 64))).hexdigest()
+
+
+class Recorder:
+    """Append fixture entries to a JSON-lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, **entry: Any) -> None:
+        line = json.dumps({'kind': kind, **entry}, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class _RecordingRequest:
+    def __init__(self, request, method: str, recording: 'RecordingGmailService'):
+        self.request = request
+        self.method = method
+        self._recording = recording
+
+    def execute(self, *args, **kwargs) -> Dict[str, Any]:
+        start = time.perf_counter()
+        status = 200
+        try:
+            response = self.request.execute(*args, **kwargs)
+            self._recording.record_response(self.method, response)
+            return response
+        except Exception as e:
+            status = getattr(getattr(e, 'resp', None), 'status', None)
+            raise
+        finally:
+            self._recording.recorder.record(
+                'gmail', method=self.method, latency=time.perf_counter() - start, status=status)
+
+
+class _RecordingBatch:
+    def __init__(self, batch, recording: 'RecordingGmailService', callback: Optional[Callable]):
+        self.batch = batch
+        self._recording = recording
+        self._callback = callback
+        self._size = 0
+
+    def add(self, request: _RecordingRequest, callback: Optional[Callable] = None,
+            request_id: Optional[str] = None) -> None:
+        callback = callback or self._callback
+
+        def record(request_id, response, exception):
+            if exception is None:
+                self._recording.record_response(request.method, response)
+            callback(request_id, response, exception)
+
+        self._size += 1
+        self.batch.add(request.request, callback=record, request_id=request_id)
+
+    def execute(self, *args, **kwargs) -> None:
+        start = time.perf_counter()
+        try:
+            self.batch.execute(*args, **kwargs)
+        finally:
+            self._recording.recorder.record(
+                'gmail', method='batch', latency=time.perf_counter() - start, status=200, size=self._size)
+
+
+class RecordingGmailService:
+    """Proxy for a Gmail service that records call latencies and fetched messages.
+
+    Messages are recorded sanitized, with their Subject/From headers, snippet,
+    labels, thread and arrival time; message bodies are never recorded.
+    """
+
+    def __init__(self, service, recorder: Recorder, sanitizer: Sanitizer, _path: str = ''):
+        self._service = service
+        self.recorder = recorder
+        self.sanitizer = sanitizer
+        self._path = _path
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._service, name)
+        if not callable(attr):
+            return attr
+        # Named like FakeGmailService methods: users().messages().get is messages.get
+        method = f"{self._path}.{name}" if self._path and self._path != 'users' else name
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if name == 'new_batch_http_request':
+                return _RecordingBatch(result, self, kwargs.get('callback'))
+            if hasattr(result, 'execute'):
+                return _RecordingRequest(result, method, self)
+            child = RecordingGmailService(result, self.recorder, self.sanitizer, method)
+            child._seen, child._lock = self._seen, self._lock
+            return child
+
+        return call
+
+    def record_response(self, method: str, response: Dict[str, Any]) -> None:
+        if method != 'messages.get' or 'id' not in response:
+            return
+        with self._lock:
+            if response['id'] in self._seen:
+                return
+            self._seen.add(response['id'])
+        headers = {h['name'].lower(): h['value'] for h in response.get('payload', {}).get('headers', [])}
+        self.recorder.record(
+            'message',
+            id=response['id'],
+            thread_id=response.get('threadId', response['id']),
+            labels=response.get('labelIds', []),
+            received_at=int(response.get('internalDate', time.time() * 1000)) / 1000,
+            sender=self.sanitizer.text(headers.get('from', '')),
+            subject=self.sanitizer.text(headers.get('subject', '')),
+            snippet=self.sanitizer.text(response.get('snippet', ''))
+        )
+
+
+class RecordingOllamaAgent(OllamaAgent):
+    """Wrap an OllamaAgent, recording each call's sanitized inputs, result and latency."""
+
+    def __init__(self, agent: OllamaAgent, recorder: Recorder, sanitizer: Sanitizer):
+        # Sets up the prompts and fallbacks; calls go to the wrapped agent and its own cache
+        super().__init__(model_name=agent.model, host=agent.host, timeout=agent.timeout, keep_alive=agent.keep_alive)
+        self.agent = agent
+        self.recorder = recorder
+        self.sanitizer = sanitizer
+
+    def analyze_email(self, subject: str, snippet: str) -> Dict[str, Any]:
+        return self._record('analyze_email', subject, snippet, self.agent.analyze_email, subject, snippet)
+
+    def generate_response(self, email_data: Dict[str, Any]) -> str:
+        return self._record('generate_response', email_data['subject'], email_data['snippet'],
+                            self.agent.generate_response, email_data)
+
+    def analyze_and_draft(self, subject: str, snippet: str) -> Dict[str, Any]:
+        return self._record('analyze_and_draft', subject, snippet, self.agent.analyze_and_draft, subject, snippet)
+
+    def keep_warm(self) -> None:
+        self.agent.keep_warm()
+
+    def _record(self, method: str, subject: str, snippet: str, call: Callable, *args) -> Any:
+        start = time.perf_counter()
+        result = call(*args)
+        latency = time.perf_counter() - start
+        if isinstance(result, dict):
+            recorded = dict(result)
+            for field in ('intent', 'suggested_response', 'reply'):
+                if isinstance(recorded.get(field), str):
+                    recorded[field] = self.sanitizer.text(recorded[field])
+        else:
+            recorded = self.sanitizer.text(result)
+        self.recorder.record('ollama', method=method, latency=latency, result=recorded,
+                             subject=self.sanitizer.text(subject), snippet=self.sanitizer.text(snippet))
+        return result
+
+
+class Fixture:
+    """Recorded or synthetic mailbox contents, LLM results and latencies."""
+
+    def __init__(self, messages: Optional[List[Dict[str, Any]]] = None):
+        self.messages = messages or []
+        self.gmail_latencies: Dict[str, List[float]] = {}
+        self.ollama_calls: List[Dict[str, Any]] = []
+        self.ollama_results: Dict[tuple, Any] = {}
+        self.ollama_latencies: Dict[str, List[float]] = {}
+
+    @classmethod
+    def load(cls, path: str) -> 'Fixture':
+        fixture = cls()
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    fixture.add(json.loads(line))
+        # Replay messages in arrival order
+        fixture.messages.sort(key=lambda m: m['received_at'])
+        return fixture
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        kind = entry.pop('kind')
+        if kind == 'message':
+            self.messages.append(entry)
+        elif kind == 'gmail':
+            self.gmail_latencies.setdefault(entry['method'], []).append(entry['latency'])
+        elif kind == 'ollama':
+            self.ollama_calls.append(entry)
+            self.ollama_results[(entry['method'], entry['subject'], entry['snippet'])] = entry['result']
+            self.ollama_latencies.setdefault(entry['method'], []).append(entry['latency'])
+
+    def save(self, path: str) -> None:
+        recorder = Recorder(path)
+        for message in self.messages:
+            recorder.record('message', **message)
+        for method, latencies in self.gmail_latencies.items():
+            for latency in latencies:
+                recorder.record('gmail', method=method, latency=latency)
+        for call in self.ollama_calls:
+            recorder.record('ollama', **call)
+        recorder.close()
+
+
+class LatencyModel:
+    """Per-method latency sampler for replays.
+
+    Draws from recorded samples when there are any for the method, otherwise
+    from a log-normal distribution with the given median and p95 (seconds).
+    ``scale`` multiplies every draw, e.g. to compress a replay.
+    """
+
+    def __init__(self, samples: Optional[Dict[str, List[float]]] = None, median: float = 0.05,
+                 p95: float = 0.2, scale: float = 1.0, seed: Optional[int] = None):
+        self.samples = samples or {}
+        self.scale = scale
+        self._mu = math.log(median)
+        # The 95th percentile of a standard normal is 1.645 standard deviations out
+        self._sigma = math.log(p95 / median) / 1.645 if p95 > median else 0.0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, method: str = '') -> float:
+        with self._lock:
+            samples = self.samples.get(method)
+            if samples:
+                return self._random.choice(samples) * self.scale
+            return self._random.lognormvariate(self._mu, self._sigma) * self.scale
+
+
+class ReplayOllamaAgent(OllamaAgent):
+    """OllamaAgent stand-in answering from a fixture after a sampled latency.
+
+    Inputs missing from the fixture get the default analysis and response
+    after a sampled latency, and are counted in ``misses``.
+    """
+
+    def __init__(self, fixture: Fixture, latency: Optional[LatencyModel] = None):
+        # Sets up the prompts and fallbacks; no Ollama client is ever created here
+        super().__init__()
+        self.fixture = fixture
+        self.latency = latency or LatencyModel(fixture.ollama_latencies, median=0.5, p95=2.0)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def analyze_email(self, subject: str, snippet: str) -> Dict[str, Any]:
+        return self._replay('analyze_email', subject, snippet, self._get_default_analysis)
+
+    def generate_response(self, email_data: Dict[str, Any]) -> str:
+        return self._replay('generate_response', email_data['subject'], email_data['snippet'],
+                            lambda: self._get_default_response(email_data['category']))
+
+    def analyze_and_draft(self, subject: str, snippet: str) -> Dict[str, Any]:
+        def default():
+            analysis = self._get_default_analysis()
+            analysis['reply'] = self._get_default_response(analysis['category'])
+            return analysis
+        return self._replay('analyze_and_draft', subject, snippet, default)
+
+    def keep_warm(self) -> None:
+        pass
+
+    def _replay(self, method: str, subject: str, snippet: str, default: Callable[[], Any]) -> Any:
+        result = self.fixture.ollama_results.get((method, subject, snippet))
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        time.sleep(self.latency(method))
+        if result is None:
+            return default()
+        return dict(result) if isinstance(result, dict) else result
+
+
+def deliver_messages(service, messages: List[Dict[str, Any]], speed: float = 1.0,
+                     stop: Optional[threading.Event] = None) -> Dict[str, float]:
+    """Add fixture messages to a FakeGmailService at their recorded pace.
+
+    Arrival gaps are divided by ``speed``. Returns the wall-clock arrival
+    time of each added message, keyed by its new Gmail id.
+    """
+    arrivals: Dict[str, float] = {}
+    if not messages:
+        return arrivals
+    first = messages[0]['received_at']
+    start = time.time()
+    for message in messages:
+        delay = start + (message['received_at'] - first) / speed - time.time()
+        if delay > 0 and (stop.wait(delay) if stop is not None else time.sleep(delay)):
+            break
+        added = service.add_message(
+            message['sender'], message['subject'], message['snippet'],
+            labels=message.get('labels') or ['INBOX', 'UNREAD'],
+            thread_id=message.get('thread_id'),
+            received_at=datetime.now()
+        )
+        arrivals[added['id']] = time.time()
+    return arrivals
+
+
+# (category, subject templates, snippet templates) for synthetic inboxes
+CORPUS_TEMPLATES = [
+    ('urgent', ["URGENT: {topic} is down", "Action needed immediately on {topic}", "Important: {topic} deadline today"],
+     ["Please look at {topic} asap, customers are affected.", "We need a decision on {topic} immediately."]),
+    ('meeting', ["Meeting about {topic}", "Can we schedule a call on {topic}?", "Invitation: {topic} review"],
+     ["Would Tuesday work for a meeting about {topic}?", "Sending a calendar invite to discuss {topic}."]),
+    ('inquiry', ["Question about {topic}", "How to configure {topic}", "Help with {topic}"],
+     ["I have a question about {topic}: what is the recommended setup?", "Could you help me understand {topic}?"]),
+    ('follow_up', ["Following up on {topic}", "Reminder: {topic}", "Checking in about {topic}"],
+     ["Just checking in on {topic} from last week.", "Friendly reminder about {topic}."]),
+    ('general', ["Notes from {topic}", "Thoughts on {topic}", "Your weekly {topic} digest", "Re: {topic}"],
+     ["Sharing a few thoughts on {topic} when you have a moment.", "Here is this week's summary of {topic}.",
+      "Thanks for the update on {topic}, looks good to me."]),
+]
+CORPUS_WEIGHTS = [0.08, 0.15, 0.17, 0.1, 0.5]
+CORPUS_TOPICS = ["billing", "the roadmap", "onboarding", "the Q3 budget", "the API migration", "hiring",
+                 "the release", "security review", "the offsite", "customer feedback", "the dashboard", "invoices"]
+ROLE_SENDERS = ["noreply@updates.example.com", "notifications@ci.example.com", "newsletter@news.example.com"]
+
+
+def make_corpus(count: int, seed: int = 11, mean_gap: float = 30.0, senders: int = 200,
+                thread_reply_rate: float = 0.2) -> Fixture:
+    """Generate a synthetic inbox of ``count`` messages.
+
+    Categories follow a realistic mix, senders a skewed popularity with some
+    automated role senders, a fraction of messages continue an earlier
+    thread, and arrivals are a Poisson process with occasional bursts.
+    """
+    rng = random.Random(seed)
+    people = [f"Person {i} <person{i}@example{i % 7}.com>" for i in range(senders)]
+    threads: List[tuple] = []
+    messages = []
+    clock = datetime(2024, 1, 1, 8).timestamp()
+    for i in range(count):
+        # One in fifty arrivals starts a burst of closely spaced messages
+        clock += rng.expovariate(1 / mean_gap) if rng.random() > 0.02 else 0.5
+        if threads and rng.random() < thread_reply_rate:
+            thread_id, subject, category = rng.choice(threads)
+            subject = subject if subject.startswith("Re: ") else f"Re: {subject}"
+        else:
+            category, subjects, _ = rng.choices(CORPUS_TEMPLATES, CORPUS_WEIGHTS)[0]
+            subject = rng.choice(subjects).format(topic=rng.choice(CORPUS_TOPICS))
+            thread_id = f"thread-{i:08x}"
+            threads.append((thread_id, subject, category))
+        snippets = next(templates[2] for templates in CORPUS_TEMPLATES if templates[0] == category)
+        automated = category == 'general' and rng.random() < 0.3
+        messages.append({
+            'id': f"synthetic-{i:08x}",
+            'thread_id': thread_id,
+            'labels': ['INBOX', 'UNREAD'],
+            'received_at': clock,
+            'sender': rng.choice(ROLE_SENDERS) if automated else people[int(rng.paretovariate(1.2)) % senders],
+            'subject': subject,
+            'snippet': rng.choice(snippets).format(topic=rng.choice(CORPUS_TOPICS)),
+            'category': category,
+        })
+    return Fixture(messages=messages)
+
+
+def record_session(path: str, max_messages: Optional[int] = 100) -> Dict[str, int]:
+    """Record a sanitized fixture from the live mailbox and Ollama.
+
+    Fetches up to ``max_messages`` unread messages and analyzes them, but
+    sends nothing and leaves the agent's own sync state and store untouched.
+    """
+    from gmail_mcp_agent.model.email_model import EmailModel, Email
+    from gmail_mcp_agent.model.email_store import EmailStore
+    from gmail_mcp_agent.utils.gmail_client import GmailClient
+
+    recorder = Recorder(path)
+    model = EmailModel(store=EmailStore(Email), ollama_agent=OllamaAgent(
+        model_name="gemma3:4b", timeout=float(os.getenv('OLLAMA_TIMEOUT', '120'))))
+    keep = {word for keywords in model.category_keywords.values()
+            for keyword in keywords for word in re.split(r'[\s-]+', keyword)}
+    sanitizer = Sanitizer(keep=keep)
+    model.ollama_agent = RecordingOllamaAgent(model.ollama_agent, recorder, sanitizer)
+
+    client = GmailClient()
+    # Fixtures only keep snippets, so the recorded analyses must be of snippets too
+    client.body_extractor = None
+    client.service = RecordingGmailService(client.service, recorder, sanitizer)
+    emails = client.get_unread_emails(max_results=max_messages)
+    analyzed = sum(1 for _ in model.add_emails(emails))
+    recorder.close()
+    return {'messages': len(emails), 'analyzed': analyzed}
+
+
+def main():
+    usage = ("Usage: python -m tests.replay record <fixture.jsonl> [max_messages]\n"
+             "       python -m tests.replay synth <fixture.jsonl> <count>")
+    if len(sys.argv) < 3 or sys.argv[1] not in ('record', 'synth'):
+        print(usage)
+        sys.exit(2)
+    if sys.argv[1] == 'record':
+        result = record_session(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 100)
+        print(f"Recorded {result['messages']} messages and {result['analyzed']} analyses to {sys.argv[2]}")
+    else:
+        count = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+        make_corpus(count).save(sys.argv[2])
+        print(f"Wrote {count} synthetic messages to {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
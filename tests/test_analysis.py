@@ -0,0 +1,39 @@
+import pytest
+from pydantic import ValidationError
+
+from gmail_mcp_agent.model.analysis import EmailAnalysis
+
+
+@pytest.mark.parametrize('value, expected', [
+    (2, 2), ('3', 3), (2.7, 2), (-1, 0), (7, 3),
+    ('high', 0), (None, 0), ([], 0),
+    ('nan', 0), ('inf', 0), ('-inf', 0), (float('inf'), 0), ('1e999', 0),
+])
+def test_priority_is_clamped_to_the_default_range(value, expected):
+    assert EmailAnalysis.model_validate({'priority': value}).priority == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('Urgent', 'urgent'), ('follow-up', 'follow_up'), ('Follow Up', 'follow_up'), ('spam', 'general'), (None, 'general'),
+])
+def test_category_is_normalized(value, expected):
+    assert EmailAnalysis.model_validate({'category': value}).category == expected
+
+
+def test_requires_attention_and_text_fields_are_coerced():
+    analysis = EmailAnalysis.model_validate({'requires_attention': 'yes', 'intent': None, 'reply': '  Thanks!  '})
+
+    assert analysis.requires_attention is True
+    assert analysis.intent == ''
+    assert analysis.reply == 'Thanks!'
+
+
+@pytest.mark.parametrize('data', [
+    {'category': 'spam'}, {'priority': 'high'}, {'priority': 'inf'},
+    {'requires_attention': 'maybe'}, {'requires_attention': [True]}, {'intent': {'text': 'hi'}},
+])
+def test_strict_validation_rejects_values_it_would_replace(data):
+    with pytest.raises(ValidationError):
+        EmailAnalysis.model_validate(data, context={'strict': True})
+    # Without the strict context they fall back to the defaults
+    EmailAnalysis.model_validate(data)
@@ -0,0 +1,124 @@
+import base64
+
+import pytest
+
+from gmail_mcp_agent.utils.body_extractor import TOKEN, BodyExtractor
+
+
+def encode(data) -> str:
+    return base64.urlsafe_b64encode(data.encode() if isinstance(data, str) else data).decode()
+
+
+def text_part(mime_type: str, text: str, charset: str = 'UTF-8'):
+    data = text.encode(charset)
+    return {'mimeType': mime_type, 'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="{charset}"'}],
+            'body': {'size': len(data), 'data': encode(data)}}
+
+
+def no_fetch(attachment_id):
+    raise AssertionError(f"attachment {attachment_id} was fetched")
+
+
+def test_long_body_is_cut_at_the_token_budget():
+    text = "word " * 5000
+    body = BodyExtractor(max_tokens=50, chunk_size=64).extract(text_part('text/plain', text))
+
+    assert len(TOKEN.findall(body)) == 50
+    assert body == ' '.join(['word'] * 50)
+
+
+def test_decoding_stops_once_the_budget_is_spent():
+    # Everything past the first chunk is invalid base64, so reading it would fail
+    part = text_part('text/plain', "one two three four five six seven eight\n" * 4)
+    part['body']['data'] = part['body']['data'][:64] + '!' * 100000
+
+    body = BodyExtractor(max_tokens=5, chunk_size=64).extract(part)
+
+    assert body == "one two three four five"
+
+
+def test_quoted_history_and_signature_are_dropped():
+    text = ("Can we move the review to Thursday?\n\n"
+            "On Mon, Mar 4, 2024 at 9:12 AM Sam <sam@example.com> wrote:\n"
+            "> The review is on Wednesday.\n")
+    assert BodyExtractor().extract(text_part('text/plain', text)) == "Can we move the review to Thursday?"
+
+    signed = "Thanks for the update.\n-- \nRobin\nSent from the office"
+    assert BodyExtractor().extract(text_part('text/plain', signed)) == "Thanks for the update."
+
+
+def test_wrapped_reply_header_is_dropped():
+    text = ("Sounds good.\n"
+            "On Mon, Mar 4, 2024 at 9:12 AM Sam Example\n"
+            "<sam@example.com> wrote:\n"
+            "> Shall we ship?\n")
+    assert BodyExtractor().extract(text_part('text/plain', text)) == "Sounds good."
+
+
+def test_html_is_reduced_to_visible_text():
+    html = ("<html><head><title>Newsletter</title><style>p{margin:0}</style></head><body>"
+            "<script>track()</script><p>Hello&nbsp;there,</p><p>The <b>release</b> is out.</p>"
+            "<div class=\"gmail_quote\"><blockquote>Old thread</blockquote></div></body></html>")
+
+    body = BodyExtractor(chunk_size=16).extract(text_part('text/html', html))
+
+    assert body == "Hello there,\n\nThe release is out."
+
+
+def test_plain_text_is_preferred_over_html():
+    payload = {'mimeType': 'multipart/alternative', 'parts': [
+        text_part('text/html', "<p>HTML version</p>"),
+        text_part('text/plain', "Plain version"),
+    ]}
+    assert BodyExtractor().extract(payload) == "Plain version"
+
+
+def test_multibyte_characters_split_across_chunks_decode():
+    text = "Grüße aus Köln, ünd €uro — " * 20
+    body = BodyExtractor(chunk_size=8).extract(text_part('text/plain', text))
+
+    assert body == ' '.join(text.split())
+
+
+def test_declared_charset_is_used():
+    body = BodyExtractor().extract(text_part('text/plain', "Café à Zürich", charset='iso-8859-1'))
+
+    assert body == "Café à Zürich"
+
+
+def test_attachments_are_never_fetched():
+    payload = {'mimeType': 'multipart/mixed', 'parts': [
+        text_part('text/plain', "Report attached."),
+        {'mimeType': 'application/pdf', 'filename': 'report.pdf', 'body': {'attachmentId': 'a1', 'size': 10 << 20}},
+        {'mimeType': 'text/plain', 'filename': 'notes.txt', 'body': {'attachmentId': 'a2', 'size': 100}},
+    ]}
+    assert BodyExtractor().extract(payload, no_fetch) == "Report attached."
+
+
+def test_text_part_served_by_id_is_fetched_up_to_the_size_limit():
+    fetched = []
+
+    def fetch(attachment_id):
+        fetched.append(attachment_id)
+        return encode("Large but allowed body")
+
+    small = {'mimeType': 'text/plain', 'body': {'attachmentId': 'small', 'size': 1000}}
+    large = {'mimeType': 'text/plain', 'body': {'attachmentId': 'large', 'size': 2000}}
+    extractor = BodyExtractor(max_part_bytes=1500)
+
+    assert extractor.extract(small, fetch) == "Large but allowed body"
+    assert extractor.extract(large, fetch) == ""
+    assert fetched == ['small']
+
+
+def test_payload_without_text_has_no_body():
+    payload = {'mimeType': 'multipart/mixed', 'parts': [
+        {'mimeType': 'image/png', 'filename': 'logo.png', 'body': {'attachmentId': 'a1', 'size': 100}}]}
+    assert BodyExtractor().extract(payload, no_fetch) == ""
+
+
+@pytest.mark.parametrize('value, expected', [('0', None), ('-1', None), ('120', 120)])
+def test_from_env(monkeypatch, value, expected):
+    monkeypatch.setenv('EMAIL_BODY_TOKENS', value)
+    extractor = BodyExtractor.from_env()
+    assert (extractor.max_tokens if extractor else None) == expected
@@ -0,0 +1,87 @@
+import json
+from datetime import datetime
+
+import pytest
+from pydantic import ValidationError
+
+from gmail_mcp_agent.model.email import Email
+
+DATA = {'id': 'msg-1', 'thread_id': 'thread-1', 'sender': 'Sam <sam@example.com>', 'subject': 'Invoice 7',
+        'snippet': 'The totals differ.', 'received_at': '2024-05-01T09:30:00',
+        'message_id': '<abc@mail.example.com>', 'reference_ids': '<root@mail.example.com>'}
+
+
+def test_from_data_validates_and_converts_gmail_data():
+    email = Email.from_data(DATA)
+
+    assert email.id == 'msg-1' and email.thread_id == 'thread-1'
+    assert email.received_at == datetime(2024, 5, 1, 9, 30)
+    assert email.message_id == '<abc@mail.example.com>'
+    assert email.reference_ids == '<root@mail.example.com>'
+    assert not email.is_processed and email.category == 'general' and email.ai_analysis == {}
+
+
+def test_from_data_fills_missing_optional_fields():
+    email = Email.from_data({'id': 'msg-2', 'sender': 'kim@example.com', 'subject': 'Hi', 'snippet': ''})
+
+    # A message without a thread is a thread of its own
+    assert email.thread_id == 'msg-2'
+    assert email.message_id == '' and email.reference_ids == ''
+    assert isinstance(email.received_at, datetime)
+
+
+def test_from_data_rejects_incomplete_data():
+    with pytest.raises(ValidationError):
+        Email.from_data({'id': 'msg-3', 'subject': 'No sender', 'snippet': ''})
+
+
+def test_stored_analysis_is_parsed_only_when_read():
+    analysis = {'category': 'urgent', 'priority': 3}
+    email = Email('msg-1', 'Subject', 'sam@example.com', 'Snippet', ai_analysis=json.dumps(analysis))
+
+    assert email._analysis is None
+    # Writing it back needs no parse
+    assert json.loads(email.analysis_json()) == analysis
+    assert email._analysis is None
+
+    assert email.ai_analysis == analysis
+    assert email._analysis_json is None
+
+
+def test_analysis_json_reflects_changes_after_reading():
+    email = Email('msg-1', 'Subject', 'sam@example.com', 'Snippet', ai_analysis='{"category": "general"}')
+
+    email.ai_analysis['intent'] = 'lunch'
+
+    assert json.loads(email.analysis_json()) == {'category': 'general', 'intent': 'lunch'}
+
+
+def test_empty_analysis_round_trips():
+    email = Email('msg-1', 'Subject', 'sam@example.com', 'Snippet', ai_analysis='')
+
+    assert email.analysis_json() == '{}'
+    assert email.ai_analysis == {}
+
+
+def test_shared_strings_are_interned():
+    first = Email('msg-1', 'A', 'a@example.com', '', category=''.join(['meet', 'ing']), intent=''.join(['sche', 'dule']))
+    second = Email('msg-2', 'B', 'b@example.com', '', category='meeting', intent='schedule')
+
+    assert first.category is second.category and first.intent is second.intent
+
+
+def test_records_have_no_instance_dict():
+    email = Email('msg-1', 'Subject', 'sam@example.com', 'Snippet')
+
+    assert not hasattr(email, '__dict__')
+    with pytest.raises(AttributeError):
+        email.unknown_field = 1
+
+
+def test_to_dict_includes_every_public_field():
+    email = Email.from_data(DATA)
+
+    data = email.to_dict()
+
+    assert set(data) == {field for field in Email.__slots__ if not field.startswith('_')} | {'ai_analysis'}
+    assert data['subject'] == 'Invoice 7' and data['ai_analysis'] == {}
@@ -0,0 +1,184 @@
+import base64
+import email
+from datetime import datetime, timedelta
+
+import pytest
+
+from gmail_mcp_agent.controller.email_controller import EmailController
+from gmail_mcp_agent.controller.send_queue import SendQueue
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from gmail_mcp_agent.utils.body_extractor import BodyExtractor
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+from tests.fake_gmail import FakeGmailService
+from tests.fake_ollama import FakeOllamaServer
+
+DRAFT = "Thanks for flagging this. I will check invoice 7 against the purchase order today."
+
+
+@pytest.fixture
+def server():
+    with FakeOllamaServer(latency=0) as server:
+        server.REPLY = DRAFT
+        yield server
+
+
+def make_controller(service, agent, tmp_path):
+    client = GmailClient(service=service, body_extractor=None)
+    store = EmailStore(Email)
+    controller = EmailController(
+        model=EmailModel(ollama_agent=agent, analysis_workers=1, store=store),
+        gmail_client=client,
+        history_sync=HistorySync(client, state_file=str(tmp_path / 'state.json')),
+        send_queue=SendQueue(client, store, quota_units_per_second=1e6)
+    )
+    # Start tracking the empty mailbox
+    controller.fetch_new_emails()
+    return controller
+
+
+def sent_bodies(service):
+    return [email.message_from_bytes(base64.urlsafe_b64decode(sent['body']['raw'])).get_payload(decode=True).decode()
+            for sent in service.sent]
+
+
+def test_streamed_draft_reaches_the_send_queue(server, tmp_path, monkeypatch):
+    monkeypatch.setenv('OLLAMA_SINGLE_CALL', '0')
+    service = FakeGmailService()
+    agent = OllamaAgent(host=server.host, keep_alive='5m', stream_replies=True)
+    controller = make_controller(service, agent, tmp_path)
+    service.add_message("Sam <sam@example.com>", "Invoice 7 does not match the purchase order",
+                        "The latest invoice lists a different total than we agreed on.")
+
+    results = list(controller.reply_as_analyzed(controller.stream_new_emails()))
+    controller.close()
+
+    assert not controller.model.single_call
+    assert [result['response_sent'] for result in results] == [True]
+    assert sent_bodies(service) == [DRAFT]
+    # The analysis and the streamed draft are separate generations
+    assert server.requests >= 2
+
+
+def test_single_call_draft_is_sent(server, tmp_path, monkeypatch):
+    monkeypatch.delenv('OLLAMA_SINGLE_CALL', raising=False)
+    service = FakeGmailService()
+    controller = make_controller(service, OllamaAgent(host=server.host, keep_alive='5m'), tmp_path)
+    service.add_message("Sam <sam@example.com>", "Invoice 7 does not match the purchase order",
+                        "The latest invoice lists a different total than we agreed on.")
+
+    list(controller.reply_as_analyzed(controller.stream_new_emails()))
+    controller.close()
+
+    assert controller.model.single_call
+    assert sent_bodies(service) == [DRAFT]
+
+
+def test_emails_without_a_draft_get_the_category_template(server, tmp_path):
+    service = FakeGmailService()
+    controller = make_controller(service, OllamaAgent(host=server.host, keep_alive='5m'), tmp_path)
+    service.add_message("Sam <sam@example.com>", "URGENT: checkout is down", "Please look at this asap")
+
+    list(controller.reply_as_analyzed(controller.stream_new_emails()))
+    controller.close()
+
+    assert sent_bodies(service) == [f"URGENT: {controller.model.get_response_template('urgent')}"]
+
+
+def sent_headers(service):
+    return [email.message_from_bytes(base64.urlsafe_b64decode(sent['body']['raw'])) for sent in service.sent]
+
+
+@pytest.mark.parametrize('subject, expected', [
+    ("Invoice 7 does not match the purchase order", "Re: Invoice 7 does not match the purchase order"),
+    ("RE: Invoice 7 does not match the purchase order", "RE: Invoice 7 does not match the purchase order"),
+])
+def test_reply_is_threaded_by_its_headers(server, tmp_path, subject, expected):
+    service = FakeGmailService()
+    controller = make_controller(service, OllamaAgent(host=server.host, keep_alive='5m'), tmp_path)
+    received = service.add_message("Sam <sam@example.com>", subject,
+                                   "The latest invoice lists a different total than we agreed on.",
+                                   thread_id='thread-1', references="<first@mail.example.com>")
+
+    list(controller.reply_as_analyzed(controller.stream_new_emails()))
+    controller.close()
+
+    message_id = f"<{received['id']}@mail.example.com>"
+    reply, = sent_headers(service)
+    assert reply['In-Reply-To'] == message_id
+    assert reply['References'] == f"<first@mail.example.com> {message_id}"
+    assert reply['Subject'] == expected
+    assert service.sent[0]['response']['threadId'] == 'thread-1'
+
+
+def test_threading_headers_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'emails.sqlite3')
+    store = EmailStore(Email, path=path)
+    store.add(Email.from_data({'id': 'm1', 'sender': 'sam@example.com', 'subject': 'Hi', 'snippet': 'Hello',
+                               'message_id': '<m1@mail.example.com>', 'reference_ids': '<m0@mail.example.com>'}))
+    store.close()
+
+    email = EmailStore(Email, path=path).get('m1')
+
+    assert (email.message_id, email.reference_ids) == ('<m1@mail.example.com>', '<m0@mail.example.com>')
+
+
+def test_bodies_are_fetched_only_for_the_latest_email_of_each_thread(server, tmp_path):
+    service = FakeGmailService()
+    controller = make_controller(service, OllamaAgent(host=server.host, keep_alive='5m'), tmp_path)
+    controller.gmail_client.body_extractor = BodyExtractor()
+    fetched = []
+    fetch_bodies = controller.gmail_client.fetch_bodies
+
+    def record(emails):
+        fetched.extend(email['id'] for email in emails)
+        fetch_bodies(emails)
+
+    controller.gmail_client.fetch_bodies = record
+    now = datetime.now()
+    thread = [service.add_message("Sam <sam@example.com>", "Invoice 7 does not match", f"Message {i}",
+                                  thread_id='thread-1', received_at=now + timedelta(seconds=i)) for i in range(3)]
+    single = service.add_message("Kim <kim@example.com>", "Quarterly numbers", "Attached are the numbers",
+                                 received_at=now + timedelta(seconds=5))
+
+    emails = list(controller.stream_new_emails())
+    controller.close()
+
+    assert sorted(fetched) == sorted([thread[-1]['id'], single['id']])
+    assert len(emails) == 4
+
+
+def test_sync_state_advances_only_once_new_emails_are_stored(server, tmp_path):
+    service = FakeGmailService()
+    controller = make_controller(service, OllamaAgent(host=server.host), tmp_path)
+    history_id = controller.history_sync.history_id
+    service.add_message("Sam <sam@example.com>", "Invoice 7", "The totals differ.")
+    service.add_message("Kim <kim@example.com>", "Lunch", "Are you free on Friday?")
+
+    # Stopping after the first email, as a crash would, leaves the sync where it was
+    stream = controller.stream_new_emails()
+    next(stream)
+    stream.close()
+    assert controller.history_sync.history_id == history_id
+
+    assert len(controller.fetch_new_emails()) == 1
+    controller.close()
+    assert controller.history_sync.history_id == str(service.history_id)
+
+
+def test_no_reply_senders_are_not_answered(server, tmp_path):
+    service = FakeGmailService()
+    controller = make_controller(service, OllamaAgent(host=server.host), tmp_path)
+    service.add_message("GitHub <noreply@github.com>", "Your weekly digest", "Three new issues were opened.")
+    service.add_message("Sam <sam@example.com>", "Invoice 7", "The totals differ.")
+
+    results = list(controller.reply_as_analyzed(controller.stream_new_emails()))
+    results.extend(controller.process_emails_by_priority())
+    controller.close()
+
+    assert len(results) == 1 and results[0]['response_sent']
+    assert [email.message_from_bytes(base64.urlsafe_b64decode(sent['body']['raw']))['To'] for sent in service.sent] \
+        == ['sam@example.com']
+    assert controller.model.store.count_unprocessed() == 0
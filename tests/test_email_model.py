@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from gmail_mcp_agent.utils.metrics import metrics
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+from tests.fake_ollama import FakeOllamaServer
+
+START = datetime(2024, 5, 1, 9, 0)
+
+
+@pytest.fixture
+def server():
+    with FakeOllamaServer(latency=0) as server:
+        yield server
+
+
+@pytest.fixture
+def recorded_metrics():
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.reset()
+
+
+def make_model(server, monkeypatch):
+    """Build a model whose LLM calls are recorded as ``(subject, content)`` pairs."""
+    agent = OllamaAgent(host=server.host)
+    calls = []
+    analyze_and_draft = agent.analyze_and_draft
+
+    def recording(subject, snippet):
+        calls.append((subject, snippet))
+        return analyze_and_draft(subject, snippet)
+
+    monkeypatch.setattr(agent, 'analyze_and_draft', recording)
+    model = EmailModel(ollama_agent=agent, analysis_workers=1, single_call=True, store=EmailStore(Email))
+    return model, calls
+
+
+def message(id, thread_id, sender, snippet, minutes):
+    return {'id': id, 'thread_id': thread_id, 'sender': sender, 'subject': "Quarterly numbers",
+            'snippet': snippet, 'received_at': START + timedelta(minutes=minutes)}
+
+
+def test_a_thread_is_analyzed_once_through_its_latest_message(server, monkeypatch, recorded_metrics):
+    model, calls = make_model(server, monkeypatch)
+    emails = [
+        message('m2', 't1', "Bo <bo@example.com>", "Here are the revised figures.", 20),
+        message('m1', 't1', "Ana <ana@example.com>", "Could you send the revised figures?", 0),
+        message('m3', 't1', "Ana <ana@example.com>", "Thanks, these look right.", 40),
+    ]
+
+    added = list(model.add_emails(emails))
+    model.close()
+
+    assert calls == [("Quarterly numbers", "Thanks, these look right.\n\nEarlier in this thread:\n"
+                                           "- Ana: Could you send the revised figures?\n"
+                                           "- Bo: Here are the revised figures.")]
+    # Earlier messages are yielded first, with a copy of the latest one's analysis
+    assert [email.id for email in added] == ['m1', 'm2', 'm3']
+    latest = model.store.get('m3')
+    for id in ('m1', 'm2'):
+        earlier = model.store.get(id)
+        assert earlier.category == latest.category and earlier.response_template == latest.response_template
+        assert earlier.ai_analysis == dict(latest.ai_analysis, thread_latest='m3')
+    assert recorded_metrics.to_dict()['counters']['emails_coalesced_total'] == [{'labels': {}, 'value': 2}]
+
+
+def test_separate_threads_are_analyzed_separately(server, monkeypatch):
+    model, calls = make_model(server, monkeypatch)
+    emails = [
+        message('m1', 't1', "Ana <ana@example.com>", "Could you send the revised figures?", 0),
+        message('m2', 't2', "Bo <bo@example.com>", "The venue is booked for Friday.", 10),
+    ]
+
+    list(model.add_emails(emails))
+    model.close()
+
+    # No thread context is added to single messages
+    assert sorted(calls) == [("Quarterly numbers", "Could you send the revised figures?"),
+                             ("Quarterly numbers", "The venue is booked for Friday.")]
+    assert 'thread_latest' not in model.store.get('m1').ai_analysis
+
+
+def test_thread_context_keeps_only_the_most_recent_earlier_messages(server, monkeypatch):
+    model, calls = make_model(server, monkeypatch)
+    emails = [message(f'm{i}', 't1', "Ana <ana@example.com>", f"Draft number {i} attached.", i) for i in range(6)]
+
+    list(model.add_emails(emails))
+    model.close()
+
+    (_, content), = calls
+    assert content.splitlines()[2:] == ["Earlier in this thread:", "(2 earlier messages omitted)",
+                                        "- Ana: Draft number 2 attached.", "- Ana: Draft number 3 attached.",
+                                        "- Ana: Draft number 4 attached."]
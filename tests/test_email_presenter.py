@@ -0,0 +1,91 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from gmail_mcp_agent.controller.email_controller import EmailController
+from gmail_mcp_agent.model.email_model import EmailModel, Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from gmail_mcp_agent.presenter.email_presenter import EmailPresenter
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+from tests.fake_gmail import FakeGmailService
+
+
+def make_email(i, category):
+    return Email(id=f"msg-{i}", subject=f"Subject {i}", sender=f"sender{i}@example.com", snippet="Snippet",
+                 received_at=datetime(2024, 1, 1) + timedelta(seconds=i), priority=i % 4, category=category,
+                 requires_attention=category == 'urgent')
+
+
+@pytest.fixture
+def store():
+    store = EmailStore(Email)
+    for i in range(6):
+        store.add(make_email(i, ('urgent', 'meeting')[i % 2]))
+    return store
+
+
+def make_presenter(store, tmp_path, output_format):
+    client = GmailClient(service=FakeGmailService(), body_extractor=None)
+    controller = EmailController(
+        model=EmailModel(ollama_agent=OllamaAgent(), store=store, analysis_workers=1),
+        gmail_client=client,
+        history_sync=HistorySync(client, state_file=str(tmp_path / 'state.json'))
+    )
+    return EmailPresenter(controller=controller, top_n=2, output_format=output_format)
+
+
+def test_unchanged_categories_collapse_to_one_line(store, tmp_path):
+    presenter = make_presenter(store, tmp_path, 'text')
+    first = presenter.get_email_summary()
+
+    second = presenter.get_email_summary()
+    store.add(make_email(10, 'meeting'))
+    third = presenter.get_email_summary()
+
+    assert first.startswith("Email Summary: 6 unprocessed")
+    assert "URGENT Emails: 3" in first and "showing 1-2 of 3" in first
+    assert second.count(" - unchanged") == 2 and "Subject" not in second
+    # Only the category that changed is rendered again
+    assert "URGENT Emails: 3 (P2: 1, P0: 2) - unchanged" in third
+    assert third.count(" - unchanged") == 1 and "MEETING Emails: 4" in third
+
+
+def test_summary_pages_through_a_category(store, tmp_path):
+    presenter = make_presenter(store, tmp_path, 'text')
+
+    summary = presenter.get_email_summary(page=1)
+
+    assert "showing 3-3 of 3" in summary
+
+
+def test_empty_backlog_summary(tmp_path):
+    presenter = make_presenter(EmailStore(Email), tmp_path, 'text')
+
+    assert presenter.get_email_summary() == "No unprocessed emails."
+
+
+def test_jsonl_output_is_one_json_object_per_line(store, tmp_path):
+    presenter = make_presenter(store, tmp_path, 'jsonl')
+
+    status = json.loads(presenter.display_processing_status())
+    first = [json.loads(line) for line in presenter.get_email_summary().splitlines()]
+    second = [json.loads(line) for line in presenter.get_email_summary().splitlines()]
+
+    assert status['event'] == 'status' and status['unprocessed_count'] == 6
+    assert first[0] == {'event': 'summary', 'unprocessed': 6, 'attention_required': 3,
+                        'added': 0, 'replied': 0, 'failed': 0}
+    categories = {record['category']: record for record in first[1:]}
+    assert categories['urgent']['changed'] and len(categories['urgent']['emails']) == 2
+    assert categories['urgent']['emails'][0]['received_at'] == '2024-01-01T00:00:02'
+    # Unchanged categories carry counts only
+    assert all(not record['changed'] and 'emails' not in record for record in second[1:])
+
+
+def test_jsonl_cycle_without_mail_prints_no_text(tmp_path):
+    presenter = make_presenter(EmailStore(Email), tmp_path, 'jsonl')
+
+    assert presenter.process_new_emails() == []
+    presenter.controller.close()
@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from gmail_mcp_agent.model.email_model import Email
+from gmail_mcp_agent.model.email_store import EmailStore
+
+
+def make_email(i: int, priority: int = 0, category: str = 'general', requires_attention: bool = False) -> Email:
+    return Email(id=f"msg-{i}", subject=f"Subject {i}", sender=f"sender{i}@example.com", snippet="Snippet",
+                 received_at=datetime(2024, 1, 1) + timedelta(minutes=i), priority=priority,
+                 category=category, requires_attention=requires_attention)
+
+
+@pytest.fixture
+def store():
+    store = EmailStore(Email)
+    yield store
+    store.close()
+
+
+def ids(emails):
+    return [email.id for email in emails]
+
+
+def test_emails_are_ordered_by_priority_then_age(store):
+    for i, priority in enumerate([1, 3, 1, 0, 3]):
+        store.add(make_email(i, priority))
+
+    assert ids(store.get_by_priority()) == ['msg-1', 'msg-4', 'msg-0', 'msg-2', 'msg-3']
+
+
+def test_orderings_follow_changes_and_processing(store):
+    for i in range(4):
+        store.add(make_email(i, priority=1, category='inquiry'))
+    email = store.get('msg-3')
+    email.priority, email.category, email.requires_attention = 3, 'urgent', True
+    store.save(email)
+    store.mark_as_processed('msg-0')
+
+    assert ids(store.get_by_priority()) == ['msg-3', 'msg-1', 'msg-2']
+    assert ids(store.get_top('inquiry', 10)) == ['msg-1', 'msg-2']
+    assert ids(store.get_requiring_attention()) == ['msg-3']
+    assert store.summary()['attention_required'] == 1
+
+    store.mark_as_processed('msg-3')
+
+    assert store.get_requiring_attention() == []
+    assert store.summary() == {'unprocessed': 2, 'attention_required': 0,
+                               'categories': {'inquiry': {'count': 2, 'by_priority': {1: 2}}}}
+
+
+def test_attention_emails_are_ordered_by_priority(store):
+    store.add(make_email(0, priority=1, requires_attention=True))
+    store.add(make_email(1, priority=2))
+    store.add(make_email(2, priority=3, requires_attention=True))
+
+    assert ids(store.get_requiring_attention()) == ['msg-2', 'msg-0']
+
+
+def test_orderings_are_rebuilt_on_reopen(tmp_path):
+    path = str(tmp_path / 'emails.sqlite3')
+    store = EmailStore(Email, path=path)
+    store.add(make_email(0, priority=0, requires_attention=True))
+    store.add(make_email(1, priority=2))
+    store.close()
+
+    store = EmailStore(Email, path=path)
+
+    assert ids(store.get_by_priority()) == ['msg-1', 'msg-0']
+    assert ids(store.get_requiring_attention()) == ['msg-0']
+    store.close()
+
+
+def test_compaction_keeps_reply_markers(store, monkeypatch):
+    store.add(make_email(0))
+    store.record_reply('msg-0', '<reply-msg-0@gmail-mcp-agent>')
+    store.mark_as_processed('msg-0')
+    later = time.time() + 31 * 86400
+    monkeypatch.setattr(time, 'time', lambda: later)
+
+    assert store.compact(force=True) == 1
+    assert 'msg-0' not in store
+    assert store.get_reply('msg-0') == '<reply-msg-0@gmail-mcp-agent>'
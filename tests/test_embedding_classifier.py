@@ -0,0 +1,139 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from gmail_mcp_agent.model.embedding_classifier import EmbeddingClassifier, HashingEmbedder, VectorIndex
+
+
+class FakeEmbedder:
+    """Embed texts as the vectors given for their subjects, counting calls."""
+
+    name = 'fake'
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        return [self.vectors[text.split('\n')[0]] for text in texts]
+
+
+def label(category, priority=1, requires_attention=False, intent=''):
+    return {'category': category, 'priority': priority, 'requires_attention': requires_attention, 'intent': intent}
+
+
+def make_classifier(vectors, **kwargs):
+    kwargs.setdefault('min_examples', 1)
+    kwargs.setdefault('neighbors', 3)
+    kwargs.setdefault('threshold', 0.9)
+    return EmbeddingClassifier(FakeEmbedder(vectors), **kwargs)
+
+
+VECTORS = {
+    'invoice a': [1.0, 0.0, 0.0],
+    'invoice b': [0.99, 0.1, 0.0],
+    'invoice c': [0.98, 0.0, 0.15],
+    'lunch': [0.0, 1.0, 0.0],
+    'query': [1.0, 0.05, 0.05],
+    'unrelated': [0.0, 0.0, 1.0],
+}
+
+
+def test_close_agreeing_neighbors_classify_the_email():
+    classifier = make_classifier(VECTORS)
+    classifier.learn('invoice a', '', label('urgent', 3, True, 'pay invoice'))
+    classifier.learn('invoice b', '', label('urgent', 2, True))
+    classifier.learn('lunch', '', label('general', 0))
+
+    analysis = classifier.classify('query', '')
+
+    assert analysis['category'] == 'urgent' and analysis['source'] == 'embedding'
+    # Weighted by similarity between 3 and 2, attention by weighted majority
+    assert analysis['priority'] in (2, 3) and analysis['requires_attention']
+    assert analysis['intent'] == 'pay invoice'
+    assert analysis['similarity'] > 0.99
+    assert classifier.stats() == {'matched': 1, 'escalated': 0, 'indexed': 3}
+
+
+def test_neighbors_below_the_threshold_escalate():
+    classifier = make_classifier(VECTORS)
+    classifier.learn('lunch', '', label('general', 0))
+
+    assert classifier.classify('unrelated', '') is None
+    assert classifier.stats()['escalated'] == 1
+
+
+def test_split_vote_escalates():
+    classifier = make_classifier(VECTORS)
+    classifier.learn('invoice a', '', label('urgent', 3))
+    classifier.learn('invoice b', '', label('inquiry', 1))
+    classifier.learn('invoice c', '', label('meeting', 2))
+
+    # Each category backs about a third of the similarity, below MIN_AGREEMENT
+    assert classifier.classify('query', '') is None
+
+
+def test_too_few_examples_escalate_without_searching():
+    classifier = make_classifier(VECTORS, min_examples=2)
+    classifier.learn('invoice a', '', label('urgent', 3))
+
+    assert classifier.classify('query', '') is None
+
+
+def test_learning_an_escalated_email_reuses_its_embedding():
+    classifier = make_classifier(VECTORS)
+    classifier.classify('invoice a', '')
+    calls = classifier.embed.calls
+
+    classifier.learn('invoice a', '', label('urgent', 3))
+
+    assert classifier.embed.calls == calls
+    assert len(classifier.index) == 1
+
+
+def test_index_round_trips_through_its_file(tmp_path):
+    path = str(tmp_path / 'index.npz')
+    classifier = make_classifier(VECTORS, path=path)
+    classifier.learn('invoice a', '', label('urgent', 3, True, 'pay invoice'))
+    classifier.learn('lunch', '', label('general', 0))
+    classifier.save()
+
+    reloaded = make_classifier(VECTORS, path=path)
+
+    assert len(reloaded.index) == 2
+    assert reloaded.classify('query', '')['intent'] == 'pay invoice'
+    # Labels added after loading extend the loaded index
+    reloaded.learn('invoice b', '', label('urgent', 2))
+    assert len(reloaded.index) == 3
+
+
+def test_index_from_another_embedding_model_is_discarded(tmp_path):
+    path = str(tmp_path / 'index.npz')
+    classifier = make_classifier(VECTORS, path=path)
+    classifier.learn('invoice a', '', label('urgent', 3))
+    classifier.save()
+
+    other = make_classifier(VECTORS, path=path, name='other-model')
+
+    assert len(other.index) == 0
+
+
+def test_full_index_overwrites_the_oldest_entries():
+    index = VectorIndex(max_entries=2)
+    index.add([1.0, 0.0], label('urgent'))
+    index.add([0.0, 1.0], label('general'))
+    index.add([0.9, 0.1], label('meeting'))
+
+    results, = index.search([1.0, 0.0], k=2)
+
+    assert len(index) == 2
+    assert [entry['category'] for _, entry in results] == ['meeting', 'general']
+
+
+def test_hashing_embedder_is_deterministic_and_wording_sensitive():
+    embed = HashingEmbedder(dim=256)
+    same, again, other = embed(["Invoice 7 is overdue", "Invoice 7 is overdue", "Lunch on Friday?"])
+
+    assert np.array_equal(same, again)
+    assert not np.array_equal(same, other)
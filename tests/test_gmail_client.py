@@ -0,0 +1,172 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from gmail_mcp_agent.utils.body_extractor import BodyExtractor
+from gmail_mcp_agent.utils.gmail_client import GmailClient, build_gmail_service
+from tests.fake_gmail import FakeGmailService, FakeHttpError
+
+
+def test_emails_are_fetched_without_bodies():
+    service = FakeGmailService()
+    for i in range(3):
+        service.add_message(f"sender{i}@example.com", f"Subject {i}", "Snippet", body="Full body " * 100)
+    client = GmailClient(service=service, body_extractor=BodyExtractor())
+    service.reset_stats()
+
+    emails = client.get_unread_emails()
+
+    assert len(emails) == 3 and not any('body' in email for email in emails)
+    assert all(email['message_id'].endswith('@mail.example.com>') for email in emails)
+    # One list call and one metadata batch
+    assert service.stats['round_trips'] == 2
+
+
+def test_bodies_are_fetched_for_the_given_emails_only():
+    service = FakeGmailService()
+    for i in range(3):
+        service.add_message(f"sender{i}@example.com", f"Subject {i}", "Snippet", body=f"Body of message {i}.")
+    client = GmailClient(service=service, body_extractor=BodyExtractor())
+    emails = client.get_unread_emails()
+    service.reset_stats()
+
+    client.fetch_bodies(emails[:1])
+
+    assert emails[0]['body'] == f"Body of {emails[0]['subject'].replace('Subject', 'message')}."
+    assert 'body' not in emails[1] and 'body' not in emails[2]
+    assert service.stats['round_trips'] == 1
+
+
+def test_no_bodies_are_fetched_without_an_extractor():
+    service = FakeGmailService()
+    service.add_message("sender@example.com", "Subject", "Snippet", body="Body.")
+    client = GmailClient(service=service)
+    # As with EMAIL_BODY_TOKENS=0
+    client.body_extractor = None
+    emails = client.get_unread_emails()
+    service.reset_stats()
+
+    client.fetch_bodies(emails)
+
+    assert 'body' not in emails[0]
+    assert service.stats['round_trips'] == 0
+
+
+def test_headless_client_without_a_token_fails_instead_of_opening_a_browser(tmp_path, monkeypatch):
+    monkeypatch.delenv('GMAIL_API_KEY', raising=False)
+
+    with pytest.raises(RuntimeError, match='token'):
+        GmailClient(credentials_file=str(tmp_path / 'credentials.json'), token_file=str(tmp_path / 'token.json'),
+                    body_extractor=None, interactive=False)
+
+
+def test_importing_the_agent_loads_no_heavy_dependencies():
+    heavy = ('googleapiclient', 'google.oauth2', 'google_auth_oauthlib', 'ollama', 'pydantic', 'numpy', 'http.server')
+    script = f"import sys, gmail_mcp_agent.main; print([m for m in {heavy!r} if m in sys.modules])"
+
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+
+    assert output.strip() == '[]'
+
+
+def no_network_build(*args, **kwargs):
+    pytest.fail("the discovery document was fetched")
+
+
+def test_service_is_built_from_the_pinned_discovery_file(tmp_path, monkeypatch):
+    from googleapiclient import discovery
+    from googleapiclient.discovery_cache import get_static_doc
+    discovery_file = tmp_path / 'gmail.v1.json'
+    discovery_file.write_text(get_static_doc('gmail', 'v1'))
+    monkeypatch.setenv('GMAIL_DISCOVERY_FILE', str(discovery_file))
+    monkeypatch.setattr(discovery, 'build', no_network_build)
+
+    service = build_gmail_service(developer_key='test-key')
+
+    assert service.users().messages().list(userId='me').uri.startswith('https://gmail.googleapis.com/')
+
+
+def test_service_falls_back_to_the_bundled_document(monkeypatch):
+    from googleapiclient import discovery
+    monkeypatch.delenv('GMAIL_DISCOVERY_FILE', raising=False)
+    monkeypatch.setattr(discovery, 'build', no_network_build)
+
+    assert build_gmail_service(developer_key='test-key').users() is not None
+
+
+def test_service_is_fetched_only_without_any_document(monkeypatch):
+    from googleapiclient import discovery, discovery_cache
+    monkeypatch.delenv('GMAIL_DISCOVERY_FILE', raising=False)
+    monkeypatch.setattr(discovery_cache, 'get_static_doc', lambda service, version: None)
+    monkeypatch.setattr(discovery, 'build', lambda *args, **kwargs: 'fetched')
+
+    assert build_gmail_service(developer_key='test-key') == 'fetched'
+
+
+def fill(service, count):
+    return [service.add_message(f"sender{i}@example.com", f"Subject {i}", "Snippet")['id'] for i in range(count)]
+
+
+def test_unread_listing_follows_page_tokens_and_fetches_in_batches():
+    service = FakeGmailService()
+    ids = fill(service, 230)
+    client = GmailClient(service=service, body_extractor=None)
+    service.reset_stats()
+
+    emails = client.get_unread_emails(page_size=100)
+
+    # Newest first, as Gmail lists them
+    assert [email['id'] for email in emails] == ids[::-1]
+    # Three list pages, then batches of 50
+    assert service.stats['round_trips'] == 3 + 5
+
+
+def test_unread_listing_stops_at_max_results():
+    service = FakeGmailService()
+    fill(service, 230)
+    client = GmailClient(service=service, body_extractor=None)
+    service.reset_stats()
+
+    emails = client.get_unread_emails(max_results=120, page_size=100)
+
+    assert len(emails) == 120
+    assert service.stats['round_trips'] == 2 + 3
+
+
+def flaky(service, failures):
+    """Make each listed message id fail ``failures[id]`` times before it is served."""
+    get_message = service._get_message
+
+    def get(id, **kwargs):
+        if failures.get(id, 0) > 0:
+            failures[id] -= 1
+            raise FakeHttpError(500, "Backend Error")
+        return get_message(id=id, **kwargs)
+
+    service._get_message = get
+
+
+def test_calls_failing_inside_a_batch_are_retried_once():
+    service = FakeGmailService()
+    ids = fill(service, 3)
+    flaky(service, {ids[1]: 1})
+    client = GmailClient(service=service, body_extractor=None)
+
+    emails, failed = client.fetch_emails(ids)
+
+    assert [email['id'] for email in emails] == ids and failed == {}
+
+
+def test_calls_failing_twice_are_returned_as_failed():
+    service = FakeGmailService()
+    ids = fill(service, 3)
+    flaky(service, {ids[1]: 2})
+    client = GmailClient(service=service, body_extractor=None)
+
+    emails, failed = client.fetch_emails(ids)
+
+    assert [email['id'] for email in emails] == [ids[0], ids[2]]
+    assert list(failed) == [ids[1]] and failed[ids[1]].resp.status == 500
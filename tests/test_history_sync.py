@@ -0,0 +1,158 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from gmail_mcp_agent.utils.history_sync import HistorySync
+from tests.fake_gmail import FakeGmailService, FakeHttpError
+
+
+@pytest.fixture
+def service():
+    return FakeGmailService()
+
+
+@pytest.fixture
+def sync(service, tmp_path):
+    return HistorySync(GmailClient(service=service, body_extractor=None), state_file=str(tmp_path / 'state.json'))
+
+
+def test_first_sync_starts_tracking_without_listing(service, sync, tmp_path):
+    for i in range(120):
+        service.add_message(f"sender{i}@example.com", f"Backlog {i}", "Old unread mail")
+    service.reset_stats()
+
+    result = sync.sync()
+    sync.commit()
+
+    assert result['emails'] == []
+    assert result['history_id'] == str(service.history_id)
+    # Only the profile is read: nothing is listed or fetched
+    assert service.stats['round_trips'] == 1
+    with open(tmp_path / 'state.json') as f:
+        assert json.load(f)['history_id'] == str(service.history_id)
+
+
+def test_incremental_sync_fetches_only_new_messages(service, sync):
+    service.add_message("old@example.com", "Before", "Already there")
+    sync.sync()
+    sync.commit()
+    added = service.add_message("new@example.com", "After", "Arrived since")
+
+    result = sync.sync()
+
+    assert not result['full_resync']
+    assert [email['id'] for email in result['emails']] == [added['id']]
+
+
+def test_expired_history_lists_only_mail_since_the_last_sync(service, sync):
+    now = datetime.now()
+    old = service.add_message("old@example.com", "Old", "Before the last sync", received_at=now - timedelta(days=9))
+    sync.sync()
+    sync.commit()
+    sync.synced_at = (now - timedelta(days=8)).timestamp()
+    missed = service.add_message("missed@example.com", "Missed", "While offline", received_at=now - timedelta(days=1))
+    service.expire_history()
+
+    result = sync.sync()
+
+    assert result['full_resync']
+    assert [email['id'] for email in result['emails']] == [missed['id']]
+    assert old['id'] not in {email['id'] for email in result['emails']}
+    assert result['history_id'] == str(service.history_id)
+
+
+def test_expired_history_is_bounded_by_since_when_later(service, sync):
+    now = datetime.now()
+    sync.sync()
+    sync.commit()
+    sync.synced_at = (now - timedelta(days=8)).timestamp()
+    service.add_message("before@example.com", "Before start", "Too old", received_at=now - timedelta(hours=2))
+    after = service.add_message("after@example.com", "After start", "Wanted", received_at=now + timedelta(minutes=1))
+    service.expire_history()
+
+    result = sync.sync(since=now)
+
+    assert [email['id'] for email in result['emails']] == [after['id']]
+
+
+def test_expired_history_without_a_bound_restarts_tracking(service, tmp_path):
+    state_file = tmp_path / 'state.json'
+    # A state file written before sync times were saved
+    state_file.write_text(json.dumps({'history_id': '1000'}))
+    service.add_message("sender@example.com", "Unread", "Old mail")
+    service.expire_history()
+    sync = HistorySync(GmailClient(service=service, body_extractor=None), state_file=str(state_file))
+    service.reset_stats()
+
+    result = sync.sync()
+
+    assert result['emails'] == []
+    assert result['history_id'] == str(service.history_id)
+    # The failed history.list and the profile read
+    assert service.stats['round_trips'] == 2
+
+
+def test_other_history_errors_are_raised(service, sync, monkeypatch):
+    sync.sync()
+    sync.commit()
+
+    def fail(start_history_id):
+        raise FakeHttpError(500, "Backend Error")
+
+    monkeypatch.setattr(sync.gmail_client, 'get_history', fail)
+    with pytest.raises(FakeHttpError):
+        sync.sync()
+    sync.commit()
+
+
+def test_state_is_saved_only_on_commit(service, sync, tmp_path):
+    sync.sync()
+    sync.commit()
+    added = service.add_message("new@example.com", "After", "Arrived since")
+
+    sync.sync()
+    # Restarting before the emails were stored lists them again
+    restarted = HistorySync(sync.gmail_client, state_file=str(tmp_path / 'state.json'))
+
+    assert [email['id'] for email in restarted.sync()['emails']] == [added['id']]
+
+
+def test_messages_that_failed_to_fetch_are_fetched_by_the_next_sync(service, sync, monkeypatch):
+    sync.sync()
+    sync.commit()
+    failing = service.add_message("flaky@example.com", "Flaky", "Fails to fetch")
+    fetched = service.add_message("fine@example.com", "Fine", "Fetches")
+    get_message = service._get_message
+
+    def fail_one(id, **kwargs):
+        if id == failing['id']:
+            raise FakeHttpError(500, "Backend Error")
+        return get_message(id=id, **kwargs)
+
+    monkeypatch.setattr(service, '_get_message', fail_one)
+    result = sync.sync()
+    sync.commit()
+
+    assert [email['id'] for email in result['emails']] == [fetched['id']]
+    assert result['failed_ids'] == [failing['id']]
+    assert sync.history_id == str(service.history_id)
+
+    monkeypatch.setattr(service, '_get_message', get_message)
+    result = sync.sync()
+    sync.commit()
+
+    assert [email['id'] for email in result['emails']] == [failing['id']]
+    assert sync.pending_ids == []
+
+
+def test_deleted_messages_are_not_kept_pending(service, sync):
+    sync.sync()
+    sync.commit()
+    deleted = service.add_message("gone@example.com", "Gone", "Deleted before the fetch")
+    del service.messages[deleted['id']]
+
+    result = sync.sync()
+
+    assert result['emails'] == [] and result['failed_ids'] == []
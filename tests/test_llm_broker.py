@@ -0,0 +1,56 @@
+import queue
+import time
+
+from gmail_mcp_agent.utils.llm_broker import LLMBroker, RemoteOllamaAgent
+
+
+class EchoAgent:
+    def analyze_email(self, subject, snippet):
+        return {'category': 'inquiry', 'intent': subject}
+
+
+def test_late_answer_to_an_earlier_incarnation_is_dropped():
+    requests, responses = queue.Queue(), queue.Queue()
+    # An answer to the first request of a worker that has since been restarted
+    responses.put((('previous-incarnation', 0), {'category': 'urgent', 'intent': 'stale'}, None))
+    broker = LLMBroker(EchoAgent(), requests, [responses], concurrency=1).start()
+    agent = RemoteOllamaAgent(0, requests, responses, timeout=5)
+
+    try:
+        analysis = agent.analyze_email("Invoice", "Which total is right?")
+    finally:
+        broker.stop()
+
+    assert analysis == {'category': 'inquiry', 'intent': 'Invoice'}
+
+
+def test_broker_answers_on_the_current_response_queue():
+    requests, stale, fresh = queue.Queue(), queue.Queue(), queue.Queue()
+    response_queues = [stale]
+    broker = LLMBroker(EchoAgent(), requests, response_queues, concurrency=1).start()
+    # The supervisor swaps in a fresh queue when it restarts the worker
+    response_queues[0] = fresh
+    agent = RemoteOllamaAgent(0, requests, fresh, timeout=5)
+
+    try:
+        analysis = agent.analyze_email("Invoice", "Which total is right?")
+    finally:
+        broker.stop()
+
+    assert analysis['intent'] == 'Invoice'
+    assert stale.empty()
+
+
+def test_keep_warm_does_not_wait_for_the_broker():
+    requests, responses = queue.Queue(), queue.Queue()
+    # No broker is serving, so waiting for an answer would block until the timeout
+    agent = RemoteOllamaAgent(0, requests, responses, timeout=30)
+
+    start = time.monotonic()
+    agent.keep_warm()
+
+    assert time.monotonic() - start < 1
+    worker_index, request_id, method, args = requests.get_nowait()
+    assert (worker_index, method, args) == (0, 'keep_warm', ())
+    # Nothing waits for its answer, which the reader drops
+    assert request_id not in agent._pending
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from gmail_mcp_agent.model.llm_scheduler import LLMScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = LLMScheduler(workers=1)
+    yield scheduler
+    scheduler.close()
+
+
+def block(scheduler):
+    """Occupy the only worker until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def wait():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(wait, priority=3)
+    assert started.wait(5)
+    return release
+
+
+def test_jobs_run_highest_priority_first(scheduler):
+    release = block(scheduler)
+    order = []
+    futures = [scheduler.submit(order.append, priority, priority=priority) for priority in (0, 3, 1, 2)]
+
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert order == [3, 2, 1, 0]
+
+
+def test_jobs_of_one_priority_run_in_submission_order(scheduler):
+    release = block(scheduler)
+    order = []
+    futures = [scheduler.submit(order.append, i, priority=1) for i in range(5)]
+
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert order == list(range(5))
+
+
+def test_waiting_low_priority_job_runs_before_later_urgent_ones(scheduler):
+    release = block(scheduler)
+    order = []
+    # Submitted long enough ago that its deadline has come before an urgent job's
+    aged = scheduler.submit(order.append, 'aged', priority=0,
+                            deadline=scheduler.deadline_for(0, time.monotonic() - scheduler.targets[0]))
+    urgent = scheduler.submit(order.append, 'urgent', priority=3)
+
+    release.set()
+    aged.result(timeout=5)
+    urgent.result(timeout=5)
+
+    assert order == ['aged', 'urgent']
+
+
+def test_explicit_deadline_overrides_priority(scheduler):
+    release = block(scheduler)
+    order = []
+    draft = scheduler.submit(order.append, 'draft', priority=0, deadline=time.monotonic())
+    analysis = scheduler.submit(order.append, 'analysis', priority=3)
+
+    release.set()
+    draft.result(timeout=5)
+    analysis.result(timeout=5)
+
+    assert order == ['draft', 'analysis']
+
+
+def test_errors_are_set_on_the_future(scheduler):
+    def fail():
+        raise ValueError("model unavailable")
+
+    with pytest.raises(ValueError):
+        scheduler.submit(fail).result(timeout=5)
+    # The worker survives the error
+    assert scheduler.submit(lambda: 'ok').result(timeout=5) == 'ok'
+
+
+def test_close_finishes_queued_jobs_and_rejects_new_ones():
+    scheduler = LLMScheduler(workers=2)
+    futures = [scheduler.submit(time.sleep, 0.01, priority=i % 4) for i in range(8)]
+
+    scheduler.close()
+
+    assert all(future.done() for future in futures)
+    assert scheduler.pending == 0
+    with pytest.raises(RuntimeError):
+        scheduler.submit(time.sleep, 0)
+
+
+def test_close_with_cancel_drops_queued_jobs_but_finishes_running_ones():
+    scheduler = LLMScheduler(workers=1)
+    release = block(scheduler)
+    running = scheduler.submit(lambda: 'running')
+    queued = [scheduler.submit(time.sleep, 0, priority=i % 4) for i in range(4)]
+    closer = threading.Thread(target=scheduler.close, kwargs={'cancel': True})
+
+    closer.start()
+    release.set()
+    closer.join(5)
+
+    assert all(future.cancelled() for future in queued)
+    # Queued behind the blocking job, so cancelled as well
+    assert running.cancelled()
+    assert scheduler.pending == 0
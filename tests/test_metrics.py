@@ -0,0 +1,99 @@
+import json
+import urllib.request
+
+import pytest
+
+from gmail_mcp_agent.utils.metrics import Histogram, MetricsRegistry, MetricsServer
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry(enabled=True)
+
+
+def test_quantiles_over_the_sample_window():
+    histogram = Histogram()
+    for value in range(100, 0, -1):
+        histogram.observe(value)
+
+    assert histogram.quantiles() == {'p50': 51, 'p95': 96, 'p99': 100}
+    assert histogram.count == 100 and histogram.sum == 5050
+
+
+def test_quantiles_only_cover_recent_samples():
+    histogram = Histogram(window=10)
+    for value in [1000] * 50 + [1] * 10:
+        histogram.observe(value)
+
+    assert histogram.quantiles()['p99'] == 1
+    # Buckets and totals still count every observation
+    assert histogram.count == 60
+
+
+def test_empty_histogram_has_no_quantiles():
+    assert Histogram().quantiles() == {'p50': None, 'p95': None, 'p99': None}
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry()
+    registry.observe('latency_seconds', 1.0)
+    registry.inc('requests_total')
+    with registry.timer('block_seconds'):
+        pass
+
+    assert registry.to_prometheus() == "\n"
+
+
+def test_prometheus_text_format(registry):
+    registry.observe('gmail_request_seconds', 0.005, method='messages.list')
+    registry.observe('gmail_request_seconds', 0.2, method='messages.list')
+    registry.inc('emails_synced_total', 3)
+    registry.gauge('email_backlog', lambda: 7)
+
+    lines = registry.to_prometheus().splitlines()
+
+    assert "# TYPE gmail_request_seconds histogram" in lines
+    # Buckets are cumulative and a value on a bound falls in that bucket
+    assert 'gmail_request_seconds_bucket{method="messages.list",le="0.005"} 1' in lines
+    assert 'gmail_request_seconds_bucket{method="messages.list",le="0.1"} 1' in lines
+    assert 'gmail_request_seconds_bucket{method="messages.list",le="0.25"} 2' in lines
+    assert 'gmail_request_seconds_bucket{method="messages.list",le="+Inf"} 2' in lines
+    assert 'gmail_request_seconds_count{method="messages.list"} 2' in lines
+    sum_line = next(line for line in lines if line.startswith('gmail_request_seconds_sum{method="messages.list"} '))
+    assert float(sum_line.split()[-1]) == pytest.approx(0.205)
+    assert lines[lines.index("# TYPE emails_synced_total counter") + 1] == "emails_synced_total 3"
+    assert lines[lines.index("# TYPE email_backlog gauge") + 1] == "email_backlog 7"
+
+
+def test_timed_counts_errors(registry):
+    @registry.timed('stage_seconds', stage='analyze')
+    def fail():
+        raise ValueError("bad output")
+
+    with pytest.raises(ValueError):
+        fail()
+
+    snapshot = registry.to_dict()
+    assert snapshot['counters']['stage_errors_total'] == [{'labels': {'stage': 'analyze'}, 'value': 1}]
+    assert snapshot['histograms']['stage_seconds'][0]['count'] == 1
+
+
+def test_failing_gauge_reads_as_none(registry):
+    registry.gauge('broken', lambda: 1 / 0)
+
+    assert registry.to_dict()['gauges']['broken'] == [{'labels': {}, 'value': None}]
+
+
+def test_server_exposes_both_formats(registry):
+    registry.inc('requests_total', method='send')
+    server = MetricsServer(registry, port=0)
+    try:
+        with urllib.request.urlopen(server.url, timeout=5) as response:
+            text = response.read().decode()
+        with urllib.request.urlopen(server.url + '.json', timeout=5) as response:
+            snapshot = json.loads(response.read())
+    finally:
+        server.close()
+
+    assert 'requests_total{method="send"} 1' in text
+    assert snapshot['counters']['requests_total'][0]['value'] == 1
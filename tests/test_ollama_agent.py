@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from gmail_mcp_agent.utils.analysis_cache import AnalysisCache
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+
+VALID = json.dumps({'category': 'meeting', 'priority': 2, 'requires_attention': True,
+                    'intent': 'schedule a review', 'suggested_response': 'Tuesday works.',
+                    'reply': 'Tuesday at 10 works for me, see you then.'})
+
+
+class StubClient:
+    """Ollama client answering every chat with the next canned content."""
+
+    def __init__(self, *contents):
+        self.contents = list(contents)
+        self.calls = 0
+
+    def chat(self, **kwargs):
+        self.calls += 1
+        content = self.contents.pop(0)
+        if isinstance(content, Exception):
+            raise content
+        return {'message': {'role': 'assistant', 'content': content}}
+
+
+def make_agent(*contents, tmp_path=None):
+    cache = AnalysisCache(path=str(tmp_path / 'cache.sqlite3') if tmp_path else None)
+    agent = OllamaAgent(cache=cache, keep_alive='5m')
+    agent._client = StubClient(*contents)
+    return agent
+
+
+@pytest.mark.parametrize('method', ['analyze_email', 'analyze_and_draft'])
+def test_valid_analysis_is_cached(method):
+    agent = make_agent(VALID)
+
+    first = getattr(agent, method)("Review", "Can we meet Tuesday?")
+    second = getattr(agent, method)("Review", "Can we meet Tuesday?")
+
+    assert first['category'] == second['category'] == 'meeting'
+    assert agent.client.calls == 1
+    assert agent.cache.stats()['entries'] == 1
+
+
+@pytest.mark.parametrize('content', [
+    'category: urgent\npriority: 3\nintent: outage',
+    'I cannot help with that.',
+    '{"category": "meeting", "priority": {"level": 2}}',
+])
+def test_fallback_analysis_is_not_cached(content):
+    agent = make_agent(content, VALID)
+
+    fallback = agent.analyze_email("Review", "Can we meet Tuesday?")
+    retried = agent.analyze_email("Review", "Can we meet Tuesday?")
+
+    assert retried['category'] == 'meeting'
+    assert agent.client.calls == 2
+    assert agent.cache.stats()['entries'] == 1
+    assert fallback['category'] in ('urgent', 'meeting', 'general')
+
+
+def test_line_parsed_category_is_validated():
+    agent = make_agent('category: Definitely Spam\npriority: 9')
+
+    analysis = agent.analyze_email("Offer", "Buy now")
+
+    assert analysis['category'] == 'general'
+    assert analysis['priority'] == 3
+
+
+@pytest.mark.parametrize('content', [
+    'Sure! Here is my analysis.',
+    '{"category": "urgent", "priority": [1, 2]}',
+    RuntimeError("connection refused"),
+])
+def test_failed_analyze_and_draft_is_not_cached(content, tmp_path):
+    agent = make_agent(content, VALID, tmp_path=tmp_path)
+
+    fallback = agent.analyze_and_draft("Review", "Can we meet Tuesday?")
+    agent.cache.close()
+
+    assert fallback['reply']
+    # Nothing reached the file a restarted agent would load
+    assert AnalysisCache(path=str(tmp_path / 'cache.sqlite3')).stats()['entries'] == 0
+
+
+def test_repaired_analysis_keeps_its_valid_fields():
+    agent = make_agent('{"category": "urgent", "priority": [1], "intent": "outage"}')
+
+    analysis = agent.analyze_email("Down", "Checkout is failing")
+
+    assert analysis['category'] == 'urgent'
+    assert analysis['intent'] == 'outage'
+    assert analysis['priority'] == 0
+
+
+def test_analysis_missing_required_fields_is_not_cached():
+    agent = make_agent('{"intent": "newsletter"}', VALID)
+
+    agent.analyze_email("Digest", "This week's news")
+    analysis = agent.analyze_email("Digest", "This week's news")
+
+    assert analysis['category'] == 'meeting'
+    assert agent.client.calls == 2
@@ -0,0 +1,63 @@
+import re
+
+import pytest
+
+from gmail_mcp_agent.utils.ollama_agent import OllamaAgent
+from tests.replay import Fixture, Recorder, RecordingOllamaAgent, ReplayOllamaAgent, Sanitizer
+
+TEXT = "Your code is 483920, call +1 (415) 555-0199 or write to Jane.Doe@acme.io. Привет Иван, 東京 4 u"
+TOKENS = re.compile(r"[^\W\d_]+|\d+")
+
+
+@pytest.fixture
+def sanitizer():
+    return Sanitizer(salt=b'fixed test salt')
+
+
+def test_no_original_token_survives(sanitizer):
+    sanitized = sanitizer.text(TEXT)
+
+    address = re.search(r"user-[0-9a-f]{8}@[0-9a-f]{8}\.example\.com", sanitized)
+    assert address
+    originals = {token.lower() for token in TOKENS.findall(TEXT)}
+    # The address is all hex digests, so only the rest is compared token by token
+    rest = sanitized.replace(address.group(0), '')
+    assert not originals & {token.lower() for token in TOKENS.findall(rest)}
+    assert sanitized.isascii()
+
+
+def test_shape_is_kept(sanitizer):
+    sanitized = sanitizer.text("Call +1 (415) 555-0199, Иван")
+
+    assert re.fullmatch(r"[A-Z][a-z]{3} \+\d \(\d{3}\) \d{3}-\d{4}, [A-Z][a-z]{3}", sanitized)
+
+
+def test_mapping_is_deterministic_per_salt(sanitizer):
+    assert sanitizer.text("Иван 483920 Jane") == sanitizer.text("Иван 483920 Jane")
+    assert Sanitizer(salt=b'other salt').text("Иван 483920 Jane") != sanitizer.text("Иван 483920 Jane")
+
+
+def test_single_characters_never_map_to_themselves(sanitizer):
+    for token in [str(digit) for digit in range(10)] + [chr(ord('a') + i) for i in range(26)]:
+        assert sanitizer.text(token) != token
+
+
+def test_kept_words_and_role_addresses_pass_through():
+    sanitizer = Sanitizer(keep=['urgent', 'meeting'])
+
+    sanitized = sanitizer.text("Urgent meeting from noreply@github.com")
+
+    assert sanitized.startswith("Urgent meeting ")
+    assert sanitized.endswith(" noreply@" + sanitized.split('@')[1])
+    assert 'github' not in sanitized
+
+
+def test_replay_agents_are_fully_initialized_ollama_agents(tmp_path):
+    replay = ReplayOllamaAgent(Fixture())
+    recording = RecordingOllamaAgent(OllamaAgent(model_name="gemma3:4b", keep_alive='5m'),
+                                     Recorder(str(tmp_path / 'session.jsonl')), Sanitizer())
+
+    for agent in (replay, recording):
+        assert agent.cache is None and agent.system_prompt
+        assert agent.reply_tokens > 0 and agent.keep_alive
+    assert recording.model == "gemma3:4b" and recording.keep_alive == '5m'
@@ -0,0 +1,76 @@
+import pytest
+
+from gmail_mcp_agent.model.rule_classifier import RuleClassifier
+
+KEYWORDS = {
+    "urgent": ["urgent", "asap", "immediately"],
+    "meeting": ["meeting", "schedule", "calendar"],
+    "follow_up": ["follow up", "checking in"],
+}
+
+
+@pytest.fixture
+def classifier():
+    return RuleClassifier(KEYWORDS, threshold=0.75)
+
+
+def test_subject_keywords_classify_confidently(classifier):
+    analysis = classifier.classify("URGENT: server down", "Please fix this asap")
+
+    assert analysis['category'] == 'urgent' and analysis['priority'] == 3
+    assert analysis['requires_attention'] and analysis['source'] == 'rules'
+    # Subject (2) and snippet (1) out of 3, plus one point of doubt
+    assert analysis['confidence'] == pytest.approx(3 / 4)
+
+
+def test_mixed_keywords_below_the_threshold_escalate(classifier):
+    assert classifier.classify("Urgent meeting", "") is None
+    assert classifier.stats() == {'matched': 0, 'escalated': 1}
+
+
+def test_a_single_snippet_match_escalates(classifier):
+    # 1 / (1 + 1) is below 0.75
+    assert classifier.classify("Hello", "Can we schedule something?") is None
+
+
+def test_threshold_is_configurable():
+    lenient = RuleClassifier(KEYWORDS, threshold=0.5)
+
+    assert lenient.classify("Hello", "Can we schedule something?")['category'] == 'meeting'
+
+
+def test_multi_word_keywords_match_across_spaces_and_hyphens(classifier):
+    assert classifier.classify("Follow-up on the proposal", "Just checking   in")['category'] == 'follow_up'
+
+
+def test_keywords_match_whole_words_only(classifier):
+    assert classifier.classify("Scheduled maintenance", "") is None
+
+
+@pytest.mark.parametrize('sender', ["GitHub <noreply@github.com>", "do-not-reply@bank.example.com",
+                                    "MAILER-DAEMON@mail.example.com", "notifications@ci.example.com",
+                                    "newsletter@news.example.com"])
+def test_automated_senders_are_general_and_no_reply(classifier, sender):
+    analysis = classifier.classify("Your weekly digest", "", sender)
+
+    assert analysis['category'] == 'general' and analysis['priority'] == 0
+    assert analysis['confidence'] == 0.9
+    assert classifier.is_no_reply(sender)
+
+
+def test_people_are_not_no_reply(classifier):
+    assert not classifier.is_no_reply("Sam Reply <sam.reply@example.com>")
+    assert classifier.classify("Lunch?", "", "Sam <sam@example.com>") is None
+
+
+def test_more_confident_keywords_beat_the_sender_rule(classifier):
+    # 10 / 11 is above the sender rule's 0.9
+    analysis = classifier.classify("URGENT urgent asap", "asap immediately, urgent, urgent", "noreply@alerts.example.com")
+
+    assert analysis['category'] == 'urgent'
+
+
+def test_priority_estimate_prefers_sender_rules_then_keywords(classifier):
+    assert classifier.estimate_priority("Urgent meeting", "", "noreply@example.com") == 0
+    assert classifier.estimate_priority("Urgent meeting", "") == 3
+    assert classifier.estimate_priority("Hello", "") == 1
@@ -0,0 +1,124 @@
+import base64
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from gmail_mcp_agent.controller.scheduler import (AdaptiveBackoff, HttpNotificationSource,
+                                                  QueueNotificationSource, Scheduler)
+
+
+def push(url, notification, path=''):
+    """POST a Pub/Sub push envelope and return the response status."""
+    data = base64.b64encode(json.dumps(notification).encode()).decode()
+    body = json.dumps({'message': {'data': data, 'messageId': '1'}, 'subscription': 'sub'}).encode()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url + path, data=body, method='POST'), timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_backoff_grows_while_idle_up_to_the_maximum():
+    backoff = AdaptiveBackoff(min_interval=10, max_interval=50, factor=2)
+
+    assert [backoff.record(0) for _ in range(4)] == [20, 40, 50, 50]
+
+
+def test_backoff_resets_when_mail_arrives():
+    backoff = AdaptiveBackoff(min_interval=10, max_interval=300)
+    for _ in range(5):
+        backoff.record(0)
+
+    assert backoff.record(3) == 10
+    assert backoff.record(0) == 20
+
+
+def test_notification_starts_a_cycle_before_the_poll_interval():
+    source = QueueNotificationSource()
+    cycles = threading.Semaphore(0)
+
+    def run_cycle():
+        cycles.release()
+        return 0
+
+    scheduler = Scheduler(run_cycle, source=source, backoff=AdaptiveBackoff(min_interval=60, max_interval=60))
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    assert cycles.acquire(timeout=5)
+
+    source.notify({'historyId': '42'})
+    assert cycles.acquire(timeout=5)
+
+    scheduler.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert scheduler.cycles >= 2
+
+
+def test_failing_cycle_does_not_stop_the_scheduler():
+    calls = []
+
+    def run_cycle():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("Gmail unavailable")
+        scheduler.stop()
+        return 0
+
+    scheduler = Scheduler(run_cycle, backoff=AdaptiveBackoff(min_interval=0, max_interval=0))
+    scheduler.run()
+
+    assert len(calls) == 2
+
+
+def test_watch_is_renewed_only_when_close_to_expiry():
+    renewals = []
+
+    def renew_watch():
+        renewals.append(1)
+        # Expires in a week, in milliseconds as Gmail returns it
+        return {'expiration': str(int((time.time() + 7 * 86400) * 1000))}
+
+    def run_cycle():
+        if scheduler.cycles == 2:
+            scheduler.stop()
+        return 0
+
+    scheduler = Scheduler(run_cycle, backoff=AdaptiveBackoff(min_interval=0, max_interval=0),
+                          renew_watch=renew_watch)
+    scheduler.run()
+
+    assert scheduler.cycles == 3 and len(renewals) == 1
+
+
+@pytest.fixture
+def http_source():
+    source = HttpNotificationSource(port=0, token='s3cret')
+    yield source
+    source.close()
+
+
+def test_push_delivery_with_the_token_is_acknowledged(http_source):
+    assert push(http_source.url, {'emailAddress': 'me@example.com', 'historyId': 42}, '?token=s3cret') == 204
+
+    assert http_source.wait(timeout=5) == {'emailAddress': 'me@example.com', 'historyId': 42}
+
+
+@pytest.mark.parametrize('path', ['', '?token=wrong'])
+def test_push_delivery_without_the_token_is_rejected(http_source, path):
+    assert push(http_source.url, {'historyId': 42}, path) == 403
+
+    assert http_source.wait(timeout=0.1) is None
+
+
+def test_malformed_push_delivery_is_rejected(http_source):
+    request = urllib.request.Request(http_source.url + '?token=s3cret', data=b'not json', method='POST')
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(request, timeout=5)
+
+    assert error.value.code == 400
@@ -0,0 +1,137 @@
+import pytest
+
+from gmail_mcp_agent.controller.send_queue import SendQueue
+from gmail_mcp_agent.model.email_model import Email
+from gmail_mcp_agent.model.email_store import EmailStore
+from gmail_mcp_agent.utils.gmail_client import GmailClient
+from tests.fake_gmail import FakeGmailService, FakeHttpError
+
+REPLY = {'email_id': 'msg-1', 'to': 'sender@example.com', 'subject': 'Re: Review', 'body': 'Tuesday works.'}
+
+
+def make_queue(service, store=None):
+    return SendQueue(GmailClient(service=service, body_extractor=None), store or EmailStore(Email),
+                     quota_units_per_second=1e6, base_delay=0)
+
+
+def deliver_then_fail(client, error):
+    """Make the first send go through but report ``error`` to the caller."""
+    send = client.send_email
+    calls = []
+
+    def send_email(**kwargs):
+        calls.append(kwargs)
+        response = send(**kwargs)
+        if len(calls) == 1:
+            raise error
+        return response
+
+    client.send_email = send_email
+    return calls
+
+
+@pytest.mark.parametrize('error', [TimeoutError("The read operation timed out"), FakeHttpError(503, "Backend Error")])
+def test_send_that_failed_after_delivery_is_not_sent_twice(error):
+    service = FakeGmailService()
+    queue = make_queue(service)
+    calls = deliver_then_fail(queue.gmail_client, error)
+
+    result, = queue.send_all([REPLY])
+    queue.close()
+
+    assert result['sent'] and result['error'] is None
+    assert len(calls) == 1
+    assert len(service.sent) == 1
+    assert result['message_id'] == service.sent[0]['response']['id']
+    assert queue.store.get_reply('msg-1') == result['message_id']
+
+
+def test_throttled_send_is_retried_without_a_sent_lookup(monkeypatch):
+    service = FakeGmailService(send_rate_limit=0)
+    queue = make_queue(service)
+    monkeypatch.setattr(queue.gmail_client, 'find_sent_message',
+                        lambda message_id: pytest.fail("a throttled send was looked up"))
+    send = queue.gmail_client.send_email
+
+    def send_once_allowed(**kwargs):
+        # The first attempt hits the rate limit, which rejects it before delivery
+        try:
+            return send(**kwargs)
+        finally:
+            service.send_rate_limit = None
+
+    queue.gmail_client.send_email = send_once_allowed
+
+    result, = queue.send_all([REPLY])
+    queue.close()
+
+    assert result['sent'] and result['attempts'] == 2
+    assert len(service.sent) == 1
+
+
+def test_reply_recorded_in_the_store_is_not_sent_again():
+    service = FakeGmailService()
+    store = EmailStore(Email)
+    make_queue(service, store).send_all([REPLY]).__next__()
+
+    result, = make_queue(service, store).send_all([REPLY])
+
+    assert result['sent'] and result['duplicate']
+    assert len(service.sent) == 1
+
+
+def test_failed_sent_lookup_is_retried():
+    service = FakeGmailService()
+    queue = make_queue(service)
+    deliver_then_fail(queue.gmail_client, FakeHttpError(503, "Backend Error"))
+    find_sent_message = queue.gmail_client.find_sent_message
+    lookups = []
+
+    def flaky_lookup(message_id):
+        lookups.append(message_id)
+        if len(lookups) == 1:
+            raise TimeoutError("The read operation timed out")
+        return find_sent_message(message_id)
+
+    queue.gmail_client.find_sent_message = flaky_lookup
+
+    result, = queue.send_all([REPLY])
+    queue.close()
+
+    assert result['sent'] and len(lookups) == 2
+    assert len(service.sent) == 1
+
+
+def test_sent_lookup_that_keeps_failing_returns_an_error():
+    service = FakeGmailService()
+    queue = make_queue(service)
+    queue.max_retries = 2
+    deliver_then_fail(queue.gmail_client, FakeHttpError(503, "Backend Error"))
+
+    def fail(message_id):
+        raise FakeHttpError(500, "Backend Error")
+
+    queue.gmail_client.find_sent_message = fail
+
+    result, = queue.send_all([REPLY])
+    queue.close()
+
+    assert not result['sent'] and 'Backend Error' in result['error']
+    assert len(service.sent) == 1
+
+
+def test_next_cycle_checks_the_sent_folder_after_an_ambiguous_last_attempt():
+    service = FakeGmailService()
+    store = EmailStore(Email)
+    queue = make_queue(service, store)
+    queue.max_retries = 0
+    deliver_then_fail(queue.gmail_client, TimeoutError("The read operation timed out"))
+
+    result, = queue.send_all([REPLY])
+    assert not result['sent']
+
+    result, = make_queue(service, store).send_all([REPLY])
+
+    assert result['sent'] and result['attempts'] == 0
+    assert len(service.sent) == 1
+    assert store.get_reply('msg-1') == service.sent[0]['response']['id']
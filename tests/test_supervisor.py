@@ -0,0 +1,24 @@
+import queue
+import threading
+
+import pytest
+
+from gmail_mcp_agent import supervisor
+from gmail_mcp_agent.supervisor import run_worker
+
+
+def test_worker_whose_accounts_all_fail_setup_exits_non_zero(tmp_path, monkeypatch):
+    monkeypatch.delenv('GMAIL_API_KEY', raising=False)
+    monkeypatch.setattr(supervisor.signal, 'signal', lambda signum, handler: None)
+    accounts = [{'name': name, 'state_dir': str(tmp_path / name), 'token_file': str(tmp_path / name / 'token.json'),
+                 'credentials_file': str(tmp_path / 'credentials.json')} for name in ('alice', 'bob')]
+    status_queue = queue.Queue()
+    options = {'llm_timeout': 1.0, 'analysis_workers': 1, 'min_interval': 1.0, 'max_interval': 1.0}
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_worker(0, accounts, queue.Queue(), queue.Queue(), status_queue, threading.Event(), options)
+
+    assert exit_info.value.code == 1
+    statuses = [status_queue.get_nowait() for _ in accounts]
+    assert [status['account'] for status in statuses] == ['alice', 'bob']
+    assert all('No valid Gmail token' in status['last_error'] for status in statuses)